@@ -0,0 +1,96 @@
+# Employee import throughput and peak memory for a generated CSV file, with
+# a share of the rows updating employees that already exist.
+# Runs against a throwaway test database.
+# python benchmarks/bench_import.py --rows 50000
+# python benchmarks/bench_import.py --rows 50000 --existing 1000000
+
+import os
+import sys
+import django
+import csv
+import io
+import random
+import tempfile
+import tracemalloc
+from datetime import date
+from decimal import Decimal
+
+# Add the project directory to the Python path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pappulse.settings')
+
+try:
+    django.setup()
+except Exception as e:
+    print(f"Error setting up Django environment: {str(e)}")
+    sys.exit(1)
+
+from django.conf import settings
+from django.db import connection
+
+from payroll.employee_import import DEFAULT_BATCH_SIZE, import_employees
+from payroll.models import Employee
+
+
+def write_csv(path, rows, seed=0):
+    rng = random.Random(seed)
+    departments = [dept[0] for dept in Employee.DEPARTMENT_CHOICES]
+    with open(path, 'w', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(['first_name', 'last_name', 'email', 'phone_number', 'hire_date', 'department', 'salary'])
+        for i in range(rows):
+            # About one row in a hundred has a bad salary
+            salary = 'n/a' if rng.random() < 0.01 else rng.randint(30000, 150000)
+            writer.writerow([
+                f"First{i}", f"Last{i}", f"employee{i}@example.com", f"07{i:08d}",
+                date(2020, 1, 1) + (date(2020, 1, 2) - date(2020, 1, 1)) * (i % 1000),
+                rng.choice(departments), salary,
+            ])
+
+
+def seed_existing(count):
+    Employee.objects.bulk_create([
+        Employee(
+            first_name=f"First{i}", last_name=f"Old{i}", email=f"employee{i}@example.com",
+            hire_date=date(2020, 1, 1), department='engineering', salary=Decimal(50000),
+        )
+        for i in range(count)
+    ], batch_size=5000)
+
+
+def run_benchmark(rows, existing, batch_size=DEFAULT_BATCH_SIZE):
+    # The DEBUG query log would keep every INSERT and skew the memory peak
+    settings.DEBUG = False
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed_existing(existing)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'employees.csv')
+            write_csv(path, rows)
+            tracemalloc.start()
+            with open(path, 'rb') as file:
+                result = import_employees(file, path, io.StringIO(), batch_size=batch_size)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return result, peak
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure employee import throughput.')
+    parser.add_argument('--rows', type=int, default=50000, help='Rows in the generated file')
+    parser.add_argument('--existing', type=int, default=10000, help='Rows matching employees already stored')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per batch')
+
+    args = parser.parse_args()
+
+    result, peak = run_benchmark(args.rows, args.existing, args.batch_size)
+    print(f"{result.rows} rows in {result.elapsed:.1f}s ({result.rows_per_minute:,.0f} rows/min): "
+          f"{result.created} created, {result.updated} updated, {result.rejected} rejected; "
+          f"peak Python memory {peak / 1024 / 1024:.1f} MB")
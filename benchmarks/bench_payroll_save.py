@@ -0,0 +1,111 @@
+# CPU time and UPDATE size of Payroll.save() for status flips, with every
+# column recalculated and written versus only the changed ones.
+# Runs against a throwaway test database.
+# python benchmarks/bench_payroll_save.py --payrolls 2000
+
+import os
+import sys
+import django
+import random
+import time
+from datetime import date
+from decimal import Decimal
+
+# Add the project directory to the Python path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pappulse.settings')
+
+try:
+    django.setup()
+except Exception as e:
+    print(f"Error setting up Django environment: {str(e)}")
+    sys.exit(1)
+
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+from payroll.models import Employee, Payroll
+from payroll.summaries import rebuild_summaries
+
+
+def seed(count, seed=0):
+    rng = random.Random(seed)
+    employees = Employee.objects.bulk_create([
+        Employee(
+            first_name=f"Employee{i}",
+            last_name="Bench",
+            email=f"employee{i}@example.com",
+            hire_date=date(2020, 1, 1),
+            department=rng.choice(Employee.DEPARTMENT_CHOICES)[0],
+            salary=Decimal(rng.randint(30000, 150000)),
+        )
+        for i in range(count)
+    ])
+    Payroll.objects.bulk_create([
+        Payroll(
+            reference_id=f"BENCH-{employee.pk}",
+            employee=employee,
+            pay_period=date(2024, 1, 25),
+            gross_salary=employee.salary,
+            net_salary=employee.salary,
+            tax_rate=Decimal('16'),
+            retirement_rate=Decimal('5'),
+            health_insurance=Decimal('1500'),
+        )
+        for employee in employees
+    ])
+    rebuild_summaries()
+
+
+def flip_statuses(full_writes):
+    """Marks every payroll paid with save(); returns CPU seconds and the columns written per UPDATE."""
+    Payroll.objects.update(payment_status='pending', payment_date=None)
+    rebuild_summaries()
+    payrolls = list(Payroll.objects.select_related('employee'))
+    for payroll in payrolls:
+        payroll.payment_status = 'paid'
+        if full_writes:
+            # Without a snapshot save() recalculates and writes every column, as it used to
+            del payroll._loaded_values
+
+    last = payrolls.pop()
+    started = time.process_time()
+    for payroll in payrolls:
+        payroll.save()
+    cpu = time.process_time() - started
+
+    reset_queries()
+    with CaptureQueriesContext(connection) as context:
+        last.save()
+    update = next(q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE "payroll_payroll"'))
+    columns = update.split(' SET ')[1].split(' WHERE ')[0].count(' = ')
+    return cpu, columns, len(update)
+
+
+def run_benchmark(payrolls):
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(payrolls)
+        return {
+            'full': flip_statuses(full_writes=True),
+            'dirty': flip_statuses(full_writes=False),
+        }
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure Payroll.save() for status-only updates.')
+    parser.add_argument('--payrolls', type=int, default=2000, help='Payrolls to flip to paid')
+
+    args = parser.parse_args()
+
+    results = run_benchmark(args.payrolls)
+    for mode, (cpu, columns, sql_bytes) in results.items():
+        print(f"{mode:5} {cpu:6.2f} s CPU ({cpu / args.payrolls * 1e6:5.0f} us/save)  "
+              f"{columns:2d} columns, {sql_bytes} bytes of SQL per UPDATE")
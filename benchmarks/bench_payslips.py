@@ -0,0 +1,99 @@
+# Payslip rendering throughput. Payrolls are built in memory, so no database is needed.
+# python benchmarks/bench_payslips.py --count 2000  # One process
+# python benchmarks/bench_payslips.py --count 20000 --processes 16 --format zip
+
+import os
+import sys
+import django
+import random
+from datetime import date
+from decimal import Decimal
+from io import BytesIO
+
+# Add the project directory to the Python path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pappulse.settings')
+
+try:
+    django.setup()
+except Exception as e:
+    print(f"Error setting up Django environment: {str(e)}")
+    sys.exit(1)
+
+from payroll.calculations import calculate_payroll
+from payroll.models import Employee, Payroll
+from payroll.payslips import DEFAULT_CHUNK_SIZE, render_payslips
+
+
+def build_payrolls(count, seed=0):
+    """Unsaved payrolls with their employees attached, as the batch engine receives them"""
+    rng = random.Random(seed)
+    departments = [dept[0] for dept in Employee.DEPARTMENT_CHOICES]
+    payrolls = []
+    for i in range(count):
+        employee = Employee(
+            id=i + 1,
+            first_name=f"First{i}",
+            last_name=f"Last{i}",
+            email=f"employee{i}@example.com",
+            department=rng.choice(departments),
+            salary=Decimal(rng.randint(30000, 150000)),
+        )
+        amounts = calculate_payroll(employee.salary, allowances=Decimal('2500.00'))
+        payroll = Payroll(
+            id=i + 1,
+            employee=employee,
+            pay_period=date(2030, 1, 31),
+            gross_salary=employee.salary,
+            total_allowances=Decimal('2500.00'),
+            total_deductions=Decimal('0.00'),
+            tax_rate=Decimal('30.00'),
+            retirement_rate=Decimal('5.00'),
+            tax_amount=amounts['tax_amount'],
+            health_insurance=amounts['health_insurance'],
+            retirement_amount=amounts['retirement_amount'],
+            net_salary=amounts['net_salary'],
+            payment_status='paid' if i % 2 else 'pending',
+        )
+        payrolls.append(payroll)
+    return payrolls
+
+
+def run_benchmark(count, processes=1, output_format='pdf', chunk_size=DEFAULT_CHUNK_SIZE):
+    payrolls = build_payrolls(count)
+    output = BytesIO()
+    result = render_payslips(
+        payrolls, output,
+        output_format=output_format,
+        workers=processes,
+        chunk_size=chunk_size,
+        company_name='PayPulse',
+    )
+    return {
+        'count': result.count,
+        'processes': processes,
+        'format': output_format,
+        'seconds': round(result.elapsed, 3),
+        'payslips_per_second': round(result.payslips_per_second, 1),
+        'payslips_per_second_per_process': round(result.payslips_per_second / processes, 1),
+        'output_bytes': output.tell(),
+    }
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure batch payslip rendering throughput.')
+    parser.add_argument('--count', type=int, default=2000, help='Number of payslips to render')
+    parser.add_argument('--processes', type=int, default=1, help='Rendering processes')
+    parser.add_argument('--format', choices=['pdf', 'zip'], default='pdf', help='Output format')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Payslips per process task')
+
+    args = parser.parse_args()
+
+    stats = run_benchmark(args.count, args.processes, args.format, args.chunk_size)
+    for key, value in stats.items():
+        print(f"{key}: {value}")
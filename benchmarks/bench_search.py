@@ -0,0 +1,98 @@
+# Employee autocomplete latency, from the database and from the in-process name index.
+# Runs against a throwaway test database.
+# python benchmarks/bench_search.py --employees 100000
+
+import os
+import sys
+import django
+import random
+import statistics
+import time
+from datetime import date
+from decimal import Decimal
+
+# Add the project directory to the Python path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pappulse.settings')
+
+try:
+    django.setup()
+except Exception as e:
+    print(f"Error setting up Django environment: {str(e)}")
+    sys.exit(1)
+
+from django.db import connection
+
+from payroll.models import Employee
+from payroll.autocomplete import build_name_index
+from payroll.search import autocomplete_employees
+
+FIRST_NAMES = ['James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'David',
+               'Elizabeth', 'Wanjiru', 'Otieno', 'Achieng', 'Kamau', 'Njeri', 'Mwangi', 'Akinyi', 'Kiptoo']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rotich',
+              'Kiprono', 'Ochieng', 'Mutua', 'Wambui', 'Chebet', 'Kariuki', 'Odhiambo', 'Njoroge', 'Cheruiyot']
+
+QUERIES = ['j', 'ja', 'jam', 'james', 'james sm', 'rot', 'mu', 'kip', 'wanjiru k', 'zz', 'e', 'employee12']
+
+
+def seed(count, seed=0):
+    rng = random.Random(seed)
+    departments = [dept[0] for dept in Employee.DEPARTMENT_CHOICES]
+    batch = []
+    for i in range(count):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        batch.append(Employee(
+            first_name=first,
+            last_name=last,
+            email=f"{first.lower()}.{last.lower()}{i}@example.com",
+            hire_date=date(2020, 1, 1),
+            department=rng.choice(departments),
+            salary=Decimal(rng.randint(30000, 150000)),
+        ))
+        if len(batch) == 5000:
+            Employee.objects.bulk_create(batch)
+            batch = []
+    Employee.objects.bulk_create(batch)
+
+
+def median_ms(func, query, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        func(query)
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def run_benchmark(employees, repeats=20):
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        seed(employees)
+        started = time.perf_counter()
+        index = build_name_index()
+        build_ms = (time.perf_counter() - started) * 1000
+        timings = {
+            query: (median_ms(autocomplete_employees, query, repeats), median_ms(index.search, query, repeats))
+            for query in QUERIES
+        }
+        return build_ms, timings
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Measure employee autocomplete latency.')
+    parser.add_argument('--employees', type=int, default=100000, help='Employees to seed')
+    parser.add_argument('--repeats', type=int, default=20, help='Runs per query')
+
+    args = parser.parse_args()
+
+    build_ms, timings = run_benchmark(args.employees, args.repeats)
+    print(f"name index built in {build_ms:.0f} ms")
+    for query, (database_ms, index_ms) in timings.items():
+        print(f"{query!r:14} database {database_ms:7.2f} ms  index {index_ms * 1000:7.1f} us")
@@ -0,0 +1,308 @@
+# Benchmark suite for the hot views, the report builders, payslip rendering
+# and the payroll math, over synthetic fixtures of several sizes.
+# Every case records wall time, query count, peak Python memory and rows/sec;
+# results are written as JSON and can be compared against an earlier run.
+# Runs against a throwaway test database.
+# python benchmarks/run_benchmarks.py --sizes 1000,10000 --output bench.json
+# python benchmarks/run_benchmarks.py --sizes 1000,10000 --compare bench.json --threshold 0.10
+
+import os
+import sys
+import django
+import json
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timezone
+from io import BytesIO
+
+# Add the project directory to the Python path
+project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(project_dir)
+
+# Setup Django environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'pappulse.settings')
+
+try:
+    django.setup()
+except Exception as e:
+    print(f"Error setting up Django environment: {str(e)}")
+    sys.exit(1)
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+
+from payroll.calculations import calculate_payroll, calculate_payroll_batch, to_cents_array
+from payroll.models import Employee, Payroll, Report
+from payroll.payroll_runs import run_payroll
+from payroll.payslips import pay_run_payrolls, render_payslips
+from payroll.report_jobs import REPORT_BUILDERS, report_file_name
+from payroll.summaries import month_start, next_month
+from payroll.synthetic_data import build_fixtures, pay_periods
+
+DEFAULT_SIZES = (1000, 10000)
+END = date(2025, 12, 25)
+
+# Relative slowdown (or memory growth) beyond which a case counts as a regression
+DEFAULT_THRESHOLD = 0.10
+# Wall time differences below this are noise whatever the ratio
+MIN_DELTA_MS = 2.0
+
+
+class Case:
+    """One measured operation. ``run`` returns the number of rows it handled."""
+
+    def __init__(self, name, run, setup=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+
+
+class QueryCounter:
+    """
+    ``execute_wrapper`` counting queries. The query log can't be used:
+    every request served through the test client resets it.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def measure(case, repeats):
+    """
+    Runs ``case`` once with tracemalloc for the memory peak and query count,
+    then ``repeats`` times untraced for wall time. Caches are cleared before
+    every run so each one takes the cold path.
+    """
+    def run_once():
+        cache.clear()
+        if case.setup:
+            case.setup()
+        return case.run()
+
+    queries = QueryCounter()
+    tracemalloc.start()
+    with connection.execute_wrapper(queries):
+        rows = run_once()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run_once()
+        timings.append(time.perf_counter() - started)
+
+    wall = statistics.median(timings)
+    return {
+        'wall_ms': round(wall * 1000, 2),
+        'wall_ms_min': round(min(timings) * 1000, 2),
+        'queries': queries.count,
+        'peak_kib': round(peak / 1024, 1),
+        'rows': rows,
+        'rows_per_second': round(rows / wall, 1) if wall else 0.0,
+    }
+
+
+def view_case(client, name, url, rows):
+    def run():
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"{url} returned {response.status_code}")
+        # Streamed responses only do their work when consumed
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return rows
+    return Case(f'view:{name}', run)
+
+
+def report_case(report_type, report_format, start, end, rows):
+    builder = REPORT_BUILDERS[(report_type, report_format)]
+
+    def run():
+        report = Report(
+            name=report_file_name(report_type, report_format, start, end),
+            type=report_type, format=report_format, period_start=start, period_end=end,
+        )
+        builder(report)
+        if report.file:
+            report.file.delete(save=False)
+        return rows
+    return Case(f'report:{report_type}:{report_format}', run)
+
+
+def build_cases(client, payslip_count, report_months):
+    """The cases for the fixture currently in the database."""
+    periods = pay_periods(END, report_months)
+    start, end = month_start(periods[0]), END
+    last_run = pay_run_payrolls(END)
+    employees = Employee.objects.count()
+    in_range = Payroll.objects.filter(pay_period__gte=start, pay_period__lt=next_month(end)).count()
+    payroll_id = last_run.values_list('id', flat=True).first()
+
+    # Rows of a view are the rows on the page it renders
+    cases = [
+        view_case(client, 'dashboard', reverse('index'), 1),
+        view_case(client, 'employee_list', reverse('employee_list'), 10),
+        view_case(client, 'employee_search', reverse('employee_list') + '?search=mar', 10),
+        view_case(client, 'employee_autocomplete', reverse('search_employees') + '?q=ma', 20),
+        view_case(client, 'payroll_form', reverse('payroll'), 1),
+        view_case(client, 'payroll_list', reverse('payroll_list'), 15),
+        view_case(client, 'paid_payroll_list', reverse('paid_payroll_list'), 15),
+        view_case(client, 'pending_payroll_list', reverse('pending_payroll_list'), 15),
+        view_case(client, 'reports', reverse('reports'), 10),
+        view_case(client, 'payroll_pdf', reverse('generate_payroll_pdf', args=[payroll_id]), 1),
+    ]
+
+    for report_type in ('payroll', 'tax', 'employee', 'department'):
+        for report_format in ('excel', 'pdf'):
+            rows = employees if report_type == 'employee' else in_range
+            cases.append(report_case(report_type, report_format, start, end, rows))
+
+    def payslips():
+        result = render_payslips(last_run[:payslip_count], BytesIO())
+        return result.count
+    cases.append(Case('payslips:pdf', payslips))
+
+    def payroll_run():
+        # A dry run computes the next month's rows without writing them
+        return run_payroll(next_month(END), dry_run=True).created
+    cases.append(Case('payroll_run:dry_run', payroll_run))
+
+    gross = to_cents_array(Payroll.objects.values_list('gross_salary', flat=True))
+    sample = list(Payroll.objects.values_list('gross_salary', flat=True)[:10000])
+
+    def math_batch():
+        calculate_payroll_batch(gross)
+        return len(gross)
+    cases.append(Case('math:calculate_payroll_batch', math_batch))
+
+    def math_scalar():
+        for value in sample:
+            calculate_payroll(value)
+        return len(sample)
+    cases.append(Case('math:calculate_payroll', math_scalar))
+
+    return cases
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=project_dir, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(sizes=DEFAULT_SIZES, months=12, repeats=3, payslip_count=500, report_months=1, only=None):
+    # The DEBUG query log would keep every query and skew the memory peaks
+    settings.DEBUG = False
+    settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'testserver']
+    results = {}
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        with tempfile.TemporaryDirectory() as media_root:
+            settings.MEDIA_ROOT = media_root
+            for size in sizes:
+                # Each size starts from an empty database
+                call_command('flush', interactive=False, verbosity=0)
+                fixture = build_fixtures(size, months, END, seed=0)
+                print(f"{size} employees: {fixture.payrolls} payrolls built in {fixture.elapsed:.1f}s")
+                client = Client()
+                client.force_login(User.objects.create_user('benchmark', password='benchmark'))
+                for case in build_cases(client, payslip_count, report_months):
+                    if only and not any(pattern in case.name for pattern in only):
+                        continue
+                    stats = measure(case, repeats)
+                    results[f'{size}/{case.name}'] = {'size': size, 'case': case.name, **stats}
+                    print(
+                        f"  {case.name:<32} {stats['wall_ms']:>10.1f} ms {stats['queries']:>5} queries "
+                        f"{stats['peak_kib']:>10.0f} KiB {stats['rows_per_second']:>12.0f} rows/s"
+                    )
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'sizes': list(sizes),
+            'months': months,
+            'repeats': repeats,
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD, min_delta_ms=MIN_DELTA_MS):
+    """
+    Regressions of ``current`` against ``baseline`` (both as written by
+    :func:`run_benchmark`): cases that got slower or used more memory by
+    more than ``threshold``, or ran more queries.
+    """
+    regressions = []
+    for key, now in current['results'].items():
+        before = baseline['results'].get(key)
+        if before is None:
+            continue
+        slower = now['wall_ms'] - before['wall_ms']
+        if slower > min_delta_ms and slower > before['wall_ms'] * threshold:
+            regressions.append(f"{key}: wall time {before['wall_ms']} -> {now['wall_ms']} ms")
+        if now['queries'] > before['queries']:
+            regressions.append(f"{key}: queries {before['queries']} -> {now['queries']}")
+        if now['peak_kib'] > before['peak_kib'] * (1 + threshold) and now['peak_kib'] - before['peak_kib'] > 64:
+            regressions.append(f"{key}: peak memory {before['peak_kib']} -> {now['peak_kib']} KiB")
+    return regressions
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark views, reports, payslips and payroll math.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in DEFAULT_SIZES),
+                        help='Comma-separated fixture sizes in employees, e.g. 1000,10000,100000')
+    parser.add_argument('--months', type=int, default=12, help='Months of payroll history per employee')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per case')
+    parser.add_argument('--payslips', type=int, default=500, help='Payslips rendered by the payslip case')
+    parser.add_argument('--report-months', type=int, default=1, help='Months covered by the report cases')
+    parser.add_argument('--only', action='append', help='Run only cases whose name contains this (repeatable)')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline JSON to check the results against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Allowed relative slowdown before a case counts as a regression')
+
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    report = run_benchmark(sizes, args.months, args.repeats, args.payslips, args.report_months, args.only)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, report, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare} (commit {baseline['meta'].get('commit')})")
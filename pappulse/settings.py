@@ -67,6 +67,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'payroll.context_processors.company',
             ],
         },
     },
@@ -101,6 +102,46 @@ else:
     }
 
 
+# Cache
+# Local memory by default. Set CACHE_BACKEND to
+# django.core.cache.backends.filebased.FileBasedCache and CACHE_LOCATION to a
+# directory to share cached data (and its invalidation) between workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'paypulse'),
+    }
+}
+
+# Seconds the dashboard aggregates stay cached; writes invalidate them sooner
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', '300'))
+
+# Seconds a list view's row count is cached where no counter or planner estimate is available
+PAGINATION_COUNT_TTL = int(os.getenv('PAGINATION_COUNT_TTL', '60'))
+# Seconds a process trusts a DataVersion counter (Company record, employee name index) before reading it again
+DATA_VERSION_CHECK_INTERVAL = float(os.getenv('DATA_VERSION_CHECK_INTERVAL', '1.0'))
+# Answer the payroll form's employee picker from an in-process name index
+EMPLOYEE_NAME_INDEX = os.getenv('EMPLOYEE_NAME_INDEX', 'True') == 'True'
+
+
+# Report job queue
+# Reports are built by `python manage.py run_report_worker`. Set
+# REPORT_QUEUE_EAGER=True to build them inside the request instead.
+REPORT_QUEUE_EAGER = os.getenv('REPORT_QUEUE_EAGER', 'False') == 'True'
+# Seconds before a report stuck in "processing" is handed to another worker
+REPORT_JOB_TIMEOUT = int(os.getenv('REPORT_JOB_TIMEOUT', '3600'))
+# Processes each report may fan its departments/employee shards out to
+REPORT_PARALLEL_WORKERS = int(os.getenv('REPORT_PARALLEL_WORKERS', '1'))
+# Employees per part when an employee report is split across processes
+REPORT_SHARD_SIZE = int(os.getenv('REPORT_SHARD_SIZE', '500'))
+# 'reportlab' draws PDF reports natively; 'html' renders the templates with xhtml2pdf
+REPORT_PDF_ENGINE = os.getenv('REPORT_PDF_ENGINE', 'reportlab')
+# Let the front-end server send report files: 'x-sendfile' or 'x-accel-redirect'
+REPORT_DOWNLOAD_OFFLOAD = os.getenv('REPORT_DOWNLOAD_OFFLOAD') or None
+# nginx internal location mapped to MEDIA_ROOT, used with x-accel-redirect
+REPORT_ACCEL_REDIRECT_PREFIX = os.getenv('REPORT_ACCEL_REDIRECT_PREFIX', '/protected-media/')
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
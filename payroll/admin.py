@@ -1,7 +1,9 @@
 from django.contrib import admin
-from .models import Employee, Payroll, Report
+from .models import DataVersion, DepartmentPayrollSummary, Employee, Payroll, Report
 
 # Register your models here.
 admin.site.register(Employee)
 admin.site.register(Payroll)
 admin.site.register(Report)
+admin.site.register(DepartmentPayrollSummary)
+admin.site.register(DataVersion)
@@ -1,6 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class PayrollConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payroll'
+
+    def ready(self):
+        # Connect the handlers that keep summaries in sync with writes
+        from . import signals  # noqa: F401
+        from .search import ensure_search_index
+
+        # SQLite drops the search triggers whenever a migration rebuilds the employee table
+        post_migrate.connect(ensure_search_index, sender=self)
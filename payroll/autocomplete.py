@@ -0,0 +1,242 @@
+"""
+Per-process employee name index for the payroll form's employee picker.
+
+Every word of every employee's first name, last name and email local-part
+(the fields :func:`payroll.search.autocomplete_employees` searches) is kept
+in one sorted list of normalised keys with a parallel ``array`` of employee
+ids, so a prefix query is two bisections and a short scan, answered without
+a database round trip. Results are ranked as the database ranks them:
+names starting with the first term first, then by first name, last name and
+id. The index is built on first use. Requests that arrive while another
+thread is building it, or while the index is disabled, are answered from
+the database.
+
+Freshness is tracked with the ``employee_names`` :class:`DataVersion`
+counter in the database, which every process and worker sees (the default
+cache is per-process). A process reads it at most once per
+``DATA_VERSION_CHECK_INTERVAL``, not on every keystroke. Employee saves and
+deletes bump it once the transaction commits (see ``payroll/signals.py``)
+and apply the change to the index of the process that made them; other
+processes see the counter move and rebuild. Bulk writes that bypass signals
+call :func:`invalidate_name_index`.
+"""
+import bisect
+import heapq
+import re
+import threading
+import unicodedata
+from array import array
+
+from django.conf import settings
+
+from .data_version import bump_data_version, checked_data_version, current_data_version
+from .models import Employee
+from .search import AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_PAGE, autocomplete_employees, search_terms
+
+NAME_INDEX_DATA = 'employee_names'
+
+# Employee rows fetched per database round trip while building
+LOAD_CHUNK_SIZE = 5000
+
+_state = {'version': None, 'index': None}
+_build_lock = threading.Lock()
+
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    """Lower-cased words of ``text`` with accents removed."""
+    text = text or ''
+    if not text.isascii():
+        text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return WORD_RE.findall(text.lower())
+
+
+def email_name(email):
+    """The part of an email before the @, which is searched; the shared domain is not."""
+    return (email or '').split('@', 1)[0]
+
+
+class PrefixList:
+    """Sorted keys with a parallel ``array`` of employee ids, searched by prefix."""
+
+    def __init__(self, entries=()):
+        entries = sorted(entries)
+        self.keys = [key for key, _ in entries]
+        self.ids = array('q', [pk for _, pk in entries])
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, key, pk):
+        position = bisect.bisect_right(self.keys, key)
+        # Keep equal keys ordered by id
+        while position > 0 and self.keys[position - 1] == key and self.ids[position - 1] > pk:
+            position -= 1
+        self.keys.insert(position, key)
+        self.ids.insert(position, pk)
+
+    def remove(self, key, pk):
+        position = bisect.bisect_left(self.keys, key)
+        while position < len(self.keys) and self.keys[position] == key:
+            if self.ids[position] == pk:
+                del self.keys[position]
+                del self.ids[position]
+                return
+            position += 1
+
+    def ids_with_prefix(self, prefix):
+        """Ids of the keys starting with ``prefix``: two bisections and one slice."""
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\U0010ffff', start)
+        return self.ids[start:end]
+
+
+class EmployeeNameIndex:
+    """
+    Name and email words -> employee ids, plus lower-cased first and last
+    names for ranking and each employee's name.
+    """
+
+    def __init__(self, rows=()):
+        words, first_names, last_names = [], [], []
+        self.names = {}
+        self.words = {}
+        for pk, first_name, last_name, email in rows:
+            employee_words = self._remember(pk, first_name, last_name, email)
+            words.extend((word, pk) for word in employee_words)
+            first_name, last_name = self.names[pk][:2]
+            first_names.append((first_name.lower(), pk))
+            last_names.append((last_name.lower(), pk))
+        self.word_list = PrefixList(words)
+        self.first_names = PrefixList(first_names)
+        self.last_names = PrefixList(last_names)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def _remember(self, pk, first_name, last_name, email):
+        first_name, last_name = first_name or '', last_name or ''
+        words = tuple(set(normalize(f"{first_name} {last_name} {email_name(email)}")))
+        # Also the database's result order
+        self.names[pk] = (first_name, last_name, pk)
+        self.words[pk] = words
+        return words
+
+    def _remove_entries(self, pk):
+        for word in self.words.pop(pk, ()):
+            self.word_list.remove(word, pk)
+        name = self.names.pop(pk, None)
+        if name:
+            self.first_names.remove(name[0].lower(), pk)
+            self.last_names.remove(name[1].lower(), pk)
+
+    def add(self, pk, first_name, last_name, email=''):
+        """Adds or replaces one employee."""
+        with self.lock:
+            self._remove_entries(pk)
+            for word in self._remember(pk, first_name, last_name, email):
+                self.word_list.add(word, pk)
+            first_name, last_name = self.names[pk][:2]
+            self.first_names.add(first_name.lower(), pk)
+            self.last_names.add(last_name.lower(), pk)
+
+    def remove(self, pk):
+        with self.lock:
+            self._remove_entries(pk)
+
+    def search(self, text, page=1, limit=AUTOCOMPLETE_LIMIT):
+        """
+        Same contract and results as :func:`payroll.search.autocomplete_employees`:
+        employees with a name or email word starting with every term, those
+        whose first or last name starts with the first term first, then by
+        first name, last name and id.
+        """
+        terms = normalize(text)
+        if not terms:
+            return [], False
+        page = min(max(page, 1), AUTOCOMPLETE_MAX_PAGE)
+        wanted = page * limit + 1
+        # Ranked on the entry as typed, like the database's istartswith
+        typed = search_terms(text)[0]
+
+        with self.lock:
+            matches = set(self.word_list.ids_with_prefix(terms[0]))
+            for term in terms[1:]:
+                matches.intersection_update(self.word_list.ids_with_prefix(term))
+            named = matches.intersection(self.first_names.ids_with_prefix(typed))
+            named.update(matches.intersection(self.last_names.ids_with_prefix(typed)))
+            ranked = heapq.nsmallest(wanted, named, key=self.names.__getitem__)
+            if len(ranked) < wanted:
+                ranked += heapq.nsmallest(wanted - len(ranked), matches - named, key=self.names.__getitem__)
+            results = [
+                {'id': pk, 'text': f"{self.names[pk][0]} {self.names[pk][1]}"}
+                for pk in ranked[wanted - limit - 1:wanted - 1]
+            ]
+        more = len(ranked) == wanted and page < AUTOCOMPLETE_MAX_PAGE
+        return results, more
+
+
+def _current_version():
+    return checked_data_version(NAME_INDEX_DATA)
+
+
+def invalidate_name_index():
+    """Bump the version so every process rebuilds its index."""
+    bump_data_version(NAME_INDEX_DATA)
+
+
+def build_name_index():
+    rows = Employee.objects.order_by().values_list('id', 'first_name', 'last_name', 'email').iterator(
+        chunk_size=LOAD_CHUNK_SIZE,
+    )
+    return EmployeeNameIndex(rows)
+
+
+def get_name_index():
+    """
+    This process's index, built now if it is missing or out of date, or
+    None if another thread is already building it.
+    """
+    version = _current_version()
+    if _state['version'] == version:
+        return _state['index']
+    if not _build_lock.acquire(blocking=False):
+        return None
+    try:
+        index = build_name_index()
+        _state['index'], _state['version'] = index, version
+        return index
+    finally:
+        _build_lock.release()
+
+
+def autocomplete(text, page=1, limit=AUTOCOMPLETE_LIMIT):
+    """``(results, more)`` for the employee picker, from the index when it is warm."""
+    index = get_name_index() if settings.EMPLOYEE_NAME_INDEX else None
+    if index is None:
+        return autocomplete_employees(text, page=page, limit=limit)
+    return index.search(text, page=page, limit=limit)
+
+
+def _publish(change):
+    """Applies ``change`` to this process's index and tells the other processes to rebuild."""
+    index = _state['index']
+    fresh = index is not None and _state['version'] == current_data_version(NAME_INDEX_DATA)
+    before = _state['version']
+    invalidate_name_index()
+    # Only our bump since the index was built: it stays current with the change applied
+    version = current_data_version(NAME_INDEX_DATA)
+    if fresh and version == before + 1:
+        change(index)
+        _state['version'] = version
+
+
+def index_employee(pk, first_name, last_name, email):
+    _publish(lambda index: index.add(pk, first_name, last_name, email))
+
+
+def unindex_employee(pk):
+    _publish(lambda index: index.remove(pk))
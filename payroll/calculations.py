@@ -0,0 +1,151 @@
+"""
+Payroll calculation kernel.
+
+All gross/tax/retirement/net arithmetic lives here so that the payroll views,
+``Payroll.save()``, batch runs and reports agree to the cent. Amounts are
+handled as integer cents and rates as integer hundredths of a percent, so the
+arithmetic is exact. Tax, retirement and net salary are computed from the
+unrounded amounts and each is rounded once, half-even, to the cent: the
+values ``Payroll.save()`` has always stored, where the unrounded Decimals
+were rounded by the two-place DecimalField.
+
+``calculate_payroll`` handles one payroll with plain Python integers.
+``calculate_payroll_batch`` takes whole columns and computes every derived
+column with NumPy in a handful of vector operations.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy as np
+
+# Statutory rates applied to new payrolls
+TAX_RATE = Decimal('16.00')
+HEALTH_INSURANCE = Decimal('2000.00')
+RETIREMENT_RATE = Decimal('5.00')
+
+# A payroll is rejected when net pay drops below this fraction of gross
+MIN_NET_FRACTION_DENOMINATOR = 3
+
+# rate (in hundredths of a percent) * cents / RATE_SCALE == cents
+RATE_SCALE = 10000
+
+
+def to_cents(value):
+    """Convert a Decimal, int, float or numeric string amount to integer cents."""
+    if not isinstance(value, Decimal):
+        value = Decimal(str(value or 0))
+    return int(value.scaleb(2).to_integral_value(ROUND_HALF_UP))
+
+
+def from_cents(cents):
+    """Convert integer cents back to a two-place Decimal."""
+    return Decimal(int(cents)).scaleb(-2)
+
+
+# Rates carry two decimal places, the same as amounts
+rate_to_hundredths = to_cents
+
+
+def to_cents_array(values):
+    """Convert a sequence of amounts to an int64 array of cents."""
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iu':
+        return values.astype(np.int64, copy=False)
+    return np.fromiter((to_cents(v) for v in values), dtype=np.int64)
+
+
+def _div_round_half_even(numerator, denominator):
+    """Integer division rounded half to even (scalar ints)."""
+    quotient, remainder = divmod(numerator, denominator)
+    if 2 * remainder > denominator or (2 * remainder == denominator and quotient % 2):
+        quotient += 1
+    return quotient
+
+
+def _div_round_half_even_array(numerator, denominator):
+    """Integer division rounded half to even (int64 arrays)."""
+    quotient, remainder = np.divmod(numerator, denominator)
+    up = (2 * remainder > denominator) | ((2 * remainder == denominator) & (quotient % 2 == 1))
+    return quotient + up
+
+
+def calculate_payroll(gross_salary, allowances=0, deductions=0, tax_rate=TAX_RATE,
+                      health_insurance=HEALTH_INSURANCE, retirement_rate=RETIREMENT_RATE):
+    """
+    Calculate the derived amounts for a single payroll.
+
+    Returns a dict of Decimals: ``tax_amount``, ``retirement_amount``,
+    ``total_statutory_deductions``, ``net_salary`` and ``min_net_salary``,
+    plus the boolean ``below_minimum_net``.
+    """
+    gross = to_cents(gross_salary)
+    health = to_cents(health_insurance)
+    # Exact amounts in units of 1/RATE_SCALE of a cent
+    tax = gross * rate_to_hundredths(tax_rate)
+    retirement = gross * rate_to_hundredths(retirement_rate)
+    statutory = tax + health * RATE_SCALE + retirement
+    net = (gross + to_cents(allowances) - to_cents(deductions)) * RATE_SCALE - statutory
+
+    return {
+        'gross_salary': from_cents(gross),
+        'tax_amount': from_cents(_div_round_half_even(tax, RATE_SCALE)),
+        'retirement_amount': from_cents(_div_round_half_even(retirement, RATE_SCALE)),
+        'health_insurance': from_cents(health),
+        'total_statutory_deductions': from_cents(_div_round_half_even(statutory, RATE_SCALE)),
+        'net_salary': from_cents(_div_round_half_even(net, RATE_SCALE)),
+        'min_net_salary': from_cents(gross) / MIN_NET_FRACTION_DENOMINATOR,
+        'below_minimum_net': net * MIN_NET_FRACTION_DENOMINATOR < gross * RATE_SCALE,
+    }
+
+
+def calculate_payroll_batch(gross_cents, allowance_cents=0, deduction_cents=0, tax_rate=TAX_RATE,
+                            health_insurance=HEALTH_INSURANCE, retirement_rate=RETIREMENT_RATE):
+    """
+    Vectorised :func:`calculate_payroll` over whole columns.
+
+    ``gross_cents``, ``allowance_cents`` and ``deduction_cents`` are int64
+    arrays of cents (or scalars, which broadcast); use :func:`to_cents_array`
+    to convert Decimal columns. Rates and health insurance may be Decimal
+    scalars (as for :func:`calculate_payroll`) or per-row int64 arrays
+    already scaled to hundredths of a percent and cents respectively.
+
+    Returns a dict of int64 cent arrays with the same keys as
+    :func:`calculate_payroll` (minus ``min_net_salary``) and a boolean
+    ``below_minimum_net`` array.
+    """
+    gross = np.asarray(gross_cents, dtype=np.int64)
+    allowances = np.asarray(allowance_cents, dtype=np.int64)
+    deductions = np.asarray(deduction_cents, dtype=np.int64)
+    tax_rate = _rate_column(tax_rate)
+    retirement_rate = _rate_column(retirement_rate)
+    health = _amount_column(health_insurance)
+
+    # Exact amounts in units of 1/RATE_SCALE of a cent
+    tax = gross * tax_rate
+    retirement = gross * retirement_rate
+    statutory = tax + health * RATE_SCALE + retirement
+    net = (gross + allowances - deductions) * RATE_SCALE - statutory
+
+    return {
+        'gross_salary': gross,
+        'tax_amount': _div_round_half_even_array(tax, RATE_SCALE),
+        'retirement_amount': _div_round_half_even_array(retirement, RATE_SCALE),
+        'health_insurance': np.broadcast_to(health, gross.shape),
+        'total_statutory_deductions': _div_round_half_even_array(statutory, RATE_SCALE),
+        'net_salary': _div_round_half_even_array(net, RATE_SCALE),
+        'below_minimum_net': net * MIN_NET_FRACTION_DENOMINATOR < gross * RATE_SCALE,
+    }
+
+
+def _rate_column(rate):
+    if isinstance(rate, np.ndarray):
+        return rate.astype(np.int64, copy=False)
+    if isinstance(rate, (list, tuple)):
+        return to_cents_array(rate)
+    return np.int64(rate_to_hundredths(rate))
+
+
+def _amount_column(amount):
+    if isinstance(amount, np.ndarray):
+        return amount.astype(np.int64, copy=False)
+    if isinstance(amount, (list, tuple)):
+        return to_cents_array(amount)
+    return np.int64(to_cents(amount))
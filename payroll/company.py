@@ -0,0 +1,40 @@
+"""
+Per-process cache of the Company record.
+
+Every page renders the company name through the base layout, and every
+payslip prints it, so the record is kept in process memory. The ``company``
+:class:`DataVersion` counter in the database is bumped once a Company save
+or delete commits (see ``payroll/signals.py``); every process, report worker
+and pool child compares its copy against that counter (read at most once per
+``DATA_VERSION_CHECK_INTERVAL``) and reloads only when it moved.
+"""
+from .data_version import bump_data_version_on_commit, checked_data_version
+from .models import Company
+
+DEFAULT_COMPANY_NAME = 'PayPulse'
+COMPANY_DATA = 'company'
+
+_cached_company = {'version': None, 'company': None}
+
+
+def _current_version():
+    return checked_data_version(COMPANY_DATA)
+
+
+def invalidate_company():
+    """Bump the version once the transaction commits, so every process reloads the Company record."""
+    bump_data_version_on_commit(COMPANY_DATA)
+
+
+def get_company():
+    """The Company record (or None), loaded at most once per version."""
+    version = _current_version()
+    if _cached_company['version'] != version:
+        _cached_company['company'] = Company.objects.first()
+        _cached_company['version'] = version
+    return _cached_company['company']
+
+
+def get_company_name():
+    company = get_company()
+    return company.name if company and company.name else DEFAULT_COMPANY_NAME
@@ -0,0 +1,9 @@
+from .company import get_company, get_company_name
+
+
+def company(request):
+    """Expose the cached Company record and display name to every template."""
+    return {
+        'company': get_company(),
+        'company_name': get_company_name(),
+    }
@@ -0,0 +1,109 @@
+"""
+Aggregates shown on the dashboard.
+
+Each helper answers its part of the dashboard with a single GROUP BY or
+conditional-aggregation query, so the cost of a dashboard load does not grow
+with the number of employees. Results are cached for
+``settings.DASHBOARD_CACHE_TTL`` seconds and invalidated by the Employee and
+Payroll signal handlers in ``payroll/signals.py``. Invalidation waits for the
+write's transaction to commit: dropped earlier, a dashboard request in the
+meantime would cache the old totals again.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .models import Employee
+
+UNASSIGNED_DEPARTMENT = 'Unassigned'
+
+EMPLOYEE_STATS_KEY = 'dashboard:employee_stats'
+DEPARTMENT_CHART_KEY = 'dashboard:department_chart'
+PAID_NET_KEY = 'dashboard:paid_net_by_department'
+
+
+def department_label(department):
+    """Display name for a department code, tolerating employees without one."""
+    return dict(Employee.DEPARTMENT_CHOICES).get(department, UNASSIGNED_DEPARTMENT)
+
+
+def _cached(key, compute):
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.DASHBOARD_CACHE_TTL)
+    return value
+
+
+def invalidate_employee_aggregates():
+    """Drop the cached aggregates computed from Employee rows once the transaction commits."""
+    transaction.on_commit(lambda: cache.delete_many([EMPLOYEE_STATS_KEY, DEPARTMENT_CHART_KEY]))
+
+
+def invalidate_payroll_aggregates():
+    """
+    Drop the cached aggregates computed from payroll totals (per active
+    employee's department) once the transaction commits.
+    """
+    transaction.on_commit(lambda: cache.delete(PAID_NET_KEY))
+
+
+def _compute_employee_stats():
+    aggregates = {'total': Count('id')}
+    for status, _ in Employee.ACTIVE_STATUS:
+        aggregates[status] = Count('id', filter=Q(is_active=status))
+    counts = Employee.objects.aggregate(**aggregates)
+    return {
+        'total': counts.pop('total'),
+        'status_counts': counts,
+    }
+
+
+def get_employee_stats():
+    """Total employee count plus one count per status, in one query."""
+    return _cached(EMPLOYEE_STATS_KEY, _compute_employee_stats)
+
+
+def _compute_department_chart_data():
+    rows = (
+        Employee.objects.order_by()
+        .values('department')
+        .annotate(total_payroll=Sum('salary'), employee_count=Count('id'))
+        .order_by('department')
+    )
+    chart = {
+        'departments': [],
+        'payroll': [],
+        'employees': [],
+    }
+    for row in rows:
+        chart['departments'].append(department_label(row['department']))
+        chart['payroll'].append(float(row['total_payroll'] or 0))
+        chart['employees'].append(row['employee_count'])
+    return chart
+
+
+def get_department_chart_data():
+    """Salary totals and headcount per department for the dashboard charts."""
+    return _cached(DEPARTMENT_CHART_KEY, _compute_department_chart_data)
+
+
+def _compute_paid_net_by_department():
+    # Grouped over active employees (employee_dept_status_idx) joined to
+    # their payrolls by employee_id; departments without payments show 0
+    rows = (
+        Employee.objects.filter(is_active='active').order_by()
+        .values('department')
+        .annotate(total=Sum('payrolls__net_salary', filter=Q(payrolls__payment_status='paid')))
+    )
+    department_data = {}
+    for row in rows:
+        label = department_label(row['department'])
+        department_data[label] = department_data.get(label, 0) + (row['total'] or 0)
+    return department_data
+
+
+def get_paid_net_by_department():
+    """Net salary paid to active employees, summed per department."""
+    return _cached(PAID_NET_KEY, _compute_paid_net_by_department)
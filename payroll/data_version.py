@@ -0,0 +1,67 @@
+"""
+Version stamp for the data reports are built from.
+
+Every Employee or Payroll write bumps the ``payroll`` counter: single saves
+and deletes through ``payroll/signals.py`` once their transaction commits
+(saves that changed nothing are skipped), bulk operations through
+:func:`payroll.summaries.refresh_buckets`. A report's cache key includes the
+version it was built at, so an identical request made before the next write
+can reuse the existing file.
+
+Per-process caches that follow a counter (the Company record, the employee
+name index) read it through :func:`checked_data_version`, which goes to the
+database at most once per ``DATA_VERSION_CHECK_INTERVAL`` seconds. Bumps made
+by this process are seen at once; other processes' within that interval.
+"""
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from .models import DataVersion
+
+PAYROLL_DATA = 'payroll'
+
+# name -> (version, time.monotonic() it was read at)
+_checked = {}
+
+
+def current_data_version(name=PAYROLL_DATA):
+    return DataVersion.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+
+def checked_data_version(name):
+    """:func:`current_data_version`, read again only once the last read is older than the check interval."""
+    checked = _checked.get(name)
+    now = time.monotonic()
+    if checked is None or now - checked[1] >= settings.DATA_VERSION_CHECK_INTERVAL:
+        checked = _checked[name] = (current_data_version(name), now)
+    return checked[0]
+
+
+def forget_data_versions():
+    """Make the next :func:`checked_data_version` calls read the database."""
+    _checked.clear()
+
+
+def bump_data_version(name=PAYROLL_DATA):
+    """Advance the version so reports built before this write are no longer reused."""
+    _checked.pop(name, None)
+    if DataVersion.objects.filter(name=name).update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            DataVersion.objects.create(name=name, version=1)
+    except IntegrityError:
+        # Another writer created the row first
+        DataVersion.objects.filter(name=name).update(version=F('version') + 1)
+
+
+def bump_data_version_on_commit(name=PAYROLL_DATA):
+    """
+    :func:`bump_data_version` once the current transaction commits, so no
+    report is built and cached at a version the write is not visible in.
+    Each write bumps on its own; a rolled back write bumps nothing.
+    """
+    transaction.on_commit(lambda: bump_data_version(name))
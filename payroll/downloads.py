@@ -0,0 +1,163 @@
+"""
+Report file downloads.
+
+Files are streamed from storage in blocks rather than read into memory,
+with an ETag and Last-Modified for conditional GETs and single-range
+``Range`` requests for resumable downloads. ``REPORT_DOWNLOAD_OFFLOAD``
+hands the transfer to the front-end server instead (``'x-sendfile'`` for
+Apache/lighttpd, ``'x-accel-redirect'`` for nginx). Other private files, like
+import error reports, are streamed by :func:`serve_stored_file`.
+"""
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+REPORT_CONTENT_TYPES = {
+    'excel': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'pdf': 'application/pdf',
+}
+
+# Bytes read from storage per chunk of a response body
+DOWNLOAD_BLOCK_SIZE = 64 * 1024
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def report_content_type(report):
+    return REPORT_CONTENT_TYPES.get(report.format, 'application/octet-stream')
+
+
+def report_etag(report, size, last_modified):
+    """Changes whenever the report's file is rebuilt."""
+    return quote_etag(f"report-{report.pk}-{size}-{last_modified or 0}")
+
+
+def report_last_modified(report):
+    """Unix timestamp of the report file, or None if the storage can't say."""
+    if report.completed_at:
+        return int(report.completed_at.timestamp())
+    try:
+        return int(report.file.storage.get_modified_time(report.file.name).timestamp())
+    except (NotImplementedError, OSError):
+        return None
+
+
+def parse_range(header, size):
+    """
+    ``(start, end)`` (inclusive) for a single-range ``Range`` header, None
+    to ignore the header, or ``'invalid'`` when it can't be satisfied.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match:
+        # Multiple ranges and other units are answered with the full file
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return 'invalid'
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        return 'invalid'
+    return start, end
+
+
+def iter_file_range(file, start, length, block_size=DOWNLOAD_BLOCK_SIZE):
+    try:
+        file.seek(start)
+        remaining = length
+        while remaining > 0:
+            block = file.read(min(block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        file.close()
+
+
+def _set_file_headers(response, report, filename, etag, last_modified):
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+def offload_response(report, content_type):
+    """An empty response telling the front-end server which file to send."""
+    response = HttpResponse(content_type=content_type)
+    if settings.REPORT_DOWNLOAD_OFFLOAD == 'x-sendfile':
+        response['X-Sendfile'] = report.file.path
+    else:
+        response['X-Accel-Redirect'] = settings.REPORT_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + report.file.name
+    return response
+
+
+def serve_report_file(request, report):
+    """Response for downloading ``report.file``, honouring conditional and Range requests."""
+    if not report.file or not report.file.storage.exists(report.file.name):
+        raise Http404("File does not exist")
+
+    size = report.file.size
+    filename = os.path.basename(report.file.name)
+    content_type = report_content_type(report)
+    last_modified = report_last_modified(report)
+    etag = report_etag(report, size, last_modified)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return _set_file_headers(response, report, filename, etag, last_modified)
+
+    if settings.REPORT_DOWNLOAD_OFFLOAD:
+        # The front-end server handles Range requests itself
+        return _set_file_headers(offload_response(report, content_type), report, filename, etag, last_modified)
+
+    byte_range = None
+    range_header = request.headers.get('Range')
+    if range_header:
+        if_range = request.headers.get('If-Range')
+        if not if_range or if_range == etag:
+            byte_range = parse_range(range_header, size)
+
+    if byte_range == 'invalid':
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            iter_file_range(report.file.open('rb'), start, length),
+            status=206,
+            content_type=content_type,
+        )
+        response['Content-Length'] = str(length)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        return _set_file_headers(response, report, filename, etag, last_modified)
+
+    response = FileResponse(report.file.open('rb'), content_type=content_type)
+    response.block_size = DOWNLOAD_BLOCK_SIZE
+    return _set_file_headers(response, report, filename, etag, last_modified)
+
+
+def serve_stored_file(name, filename, content_type, storage=default_storage):
+    """Streams ``name`` from ``storage`` as a private attachment called ``filename``."""
+    if not storage.exists(name):
+        raise Http404("File does not exist")
+    response = FileResponse(storage.open(name, 'rb'), as_attachment=True, filename=filename, content_type=content_type)
+    response.block_size = DOWNLOAD_BLOCK_SIZE
+    response['Cache-Control'] = 'private, no-store'
+    return response
@@ -0,0 +1,343 @@
+"""
+Bulk employee import from CSV or XLSX files.
+
+Rows are streamed from the file (``csv`` readers, openpyxl read-only mode)
+and handled ``batch_size`` at a time, so memory stays flat however long the
+file is. Each row is validated with :class:`EmployeeImportForm`, the
+``EmployeeForm`` rules minus the per-row uniqueness query. Rows are then
+upserted by email, ignoring case: one SELECT per batch, answered from the
+``LOWER(email)`` index, finds the employees that already exist, then one
+``bulk_create(update_conflicts=True)`` inserts the new rows and updates the
+changed ones, keyed on their id (``email`` has no unique constraint to
+upsert on). Rows that fail validation are written to a CSV
+error report with their row number and messages; :func:`save_error_report`
+stores it under a random name, served only through the login-protected
+``import_error_report`` view.
+
+The bulk writes skip the Employee signals, so each batch recomputes the
+summary buckets of employees who changed department, and once the import
+commits the dashboard aggregates, employee name index and report data
+version are invalidated.
+"""
+import csv
+import io
+import logging
+import os
+import secrets
+import time
+from datetime import date, datetime
+
+import openpyxl
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.forms.models import construct_instance
+
+from .autocomplete import invalidate_name_index
+from .dashboard import invalidate_employee_aggregates, invalidate_payroll_aggregates
+from .data_version import bump_data_version
+from .forms import EmployeeForm
+from .models import Employee
+from .summaries import refresh_employee_buckets
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 1000
+
+IMPORT_COLUMNS = (
+    'first_name', 'last_name', 'email', 'phone_number', 'hire_date', 'department', 'salary', 'is_active',
+)
+REQUIRED_COLUMNS = ('first_name', 'last_name', 'email', 'hire_date', 'salary')
+UPDATE_COLUMNS = [column for column in IMPORT_COLUMNS if column != 'email']
+
+# The form requires these although the model has defaults for them
+FORM_DEFAULTS = {'is_active': Employee._meta.get_field('is_active').default}
+
+ERROR_REPORT_HEADER = ['row', 'email', 'errors']
+# Storage directory of saved error reports
+ERROR_REPORT_DIR = 'import_errors'
+
+IMPORT_FORMATS = ('.csv', '.xlsx')
+
+
+class EmployeeImportError(ValueError):
+    """The file can't be imported at all (unknown format, missing columns)."""
+
+
+class EmployeeImportForm(EmployeeForm):
+    class Meta(EmployeeForm.Meta):
+        fields = IMPORT_COLUMNS
+
+    def validate_unique(self):
+        # Rows are upserted by email, so an existing email is not an error
+        pass
+
+    def _post_clean(self):
+        # Each form field carries its model field's validators, so
+        # Model.full_clean() would only validate every column a second time
+        self.instance = construct_instance(self, self.instance, self._meta.fields, self._meta.exclude)
+
+    def bind(self, data):
+        """
+        Re-binds the form to another row. Building a new form per row would
+        deep-copy every field each time, which dominates the cost of a row.
+        """
+        self.data = data
+        self.is_bound = True
+        self.instance = Employee()
+        self._errors = None
+        self._bound_fields_cache = {}
+        return self
+
+
+class EmployeeImportResult:
+    """Outcome of an employee import."""
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        # Updated employees whose department changed
+        self.moved = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_minute(self):
+        if not self.elapsed:
+            return 0.0
+        return self.rows / self.elapsed * 60
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'created': self.created,
+            'updated': self.updated,
+            'unchanged': self.unchanged,
+            'moved': self.moved,
+            'duplicates': self.duplicates,
+            'rejected': self.rejected,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_minute': round(self.rows_per_minute),
+        }
+
+
+def _column_name(header):
+    return str(header or '').strip().lower().replace(' ', '_')
+
+
+def _cell(value):
+    """A spreadsheet cell as form data; None for blanks."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        value = value.date()
+    if isinstance(value, date):
+        return value.isoformat()
+    value = str(value).strip()
+    return value or None
+
+
+_CHOICE_LABELS = {
+    'department': {label.lower(): key for key, label in Employee.DEPARTMENT_CHOICES},
+    'is_active': {label.lower(): key for key, label in Employee.ACTIVE_STATUS},
+}
+
+
+def _row_data(columns, values):
+    """Form data for one row, leaving out blank cells."""
+    data = {}
+    for column, value in zip(columns, values):
+        value = _cell(value)
+        if column is None or value is None:
+            continue
+        if column in _CHOICE_LABELS:
+            # Accept the display labels ("Human Resource") as well as the keys
+            value = _CHOICE_LABELS[column].get(value.lower(), value)
+        data[column] = value
+    return data
+
+
+def _header_columns(header):
+    columns = [_column_name(name) for name in header]
+    missing = [column for column in REQUIRED_COLUMNS if column not in columns]
+    if missing:
+        raise EmployeeImportError(f"Missing required columns: {', '.join(missing)}.")
+    return [column if column in IMPORT_COLUMNS else None for column in columns]
+
+
+def _csv_rows(file):
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    finally:
+        # Leave the underlying file open for the caller
+        text.detach()
+
+
+def _xlsx_rows(file):
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def read_rows(file, filename):
+    """
+    Yield ``(row_number, data)`` for every non-blank data row of a CSV or
+    XLSX file opened in binary mode. ``row_number`` counts the header as 1,
+    as spreadsheet programs do.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in IMPORT_FORMATS:
+        raise EmployeeImportError(f"Unsupported file type '{extension}'. Upload a CSV or XLSX file.")
+    rows = _xlsx_rows(file) if extension == '.xlsx' else _csv_rows(file)
+    try:
+        header = next(rows, None)
+        if header is None:
+            raise EmployeeImportError("The file is empty.")
+        columns = _header_columns(header)
+        for row_number, values in enumerate(rows, start=2):
+            data = _row_data(columns, values)
+            if data:
+                yield row_number, data
+    finally:
+        rows.close()
+
+
+def email_key(email):
+    """The form of an email rows are matched on: addresses differing only in case are one employee."""
+    return email.strip().lower()
+
+
+def _validate(rows, result, errors):
+    """
+    ``{email key: (employee, columns)}`` for the valid rows of a batch: an
+    unsaved Employee and the columns the row gave. A later row with the same
+    email wins.
+    """
+    employees = {}
+    form = EmployeeImportForm()
+    for row_number, data in rows:
+        form.bind({**FORM_DEFAULTS, **data})
+        if form.is_valid():
+            key = email_key(form.instance.email)
+            if key in employees:
+                result.duplicates += 1
+            employees[key] = (form.instance, data.keys())
+        else:
+            result.rejected += 1
+            messages = '; '.join(
+                f"{field}: {' '.join(field_errors)}" if field != '__all__' else ' '.join(field_errors)
+                for field, field_errors in form.errors.items()
+            )
+            errors.writerow([row_number, data.get('email', ''), messages])
+    return employees
+
+
+def _upsert(employees, result, dry_run):
+    existing = {}
+    rows = (
+        Employee.objects.annotate(email_key=Lower('email'))
+        .filter(email_key__in=list(employees))
+        .order_by('-id')
+        .values('id', 'email_key', *IMPORT_COLUMNS)
+    )
+    for row in rows:
+        # With several employees sharing an email the oldest one is updated
+        existing[row['email_key']] = row
+
+    created, updated = [], []
+    moved, departments = [], set()
+    for key, (employee, columns) in employees.items():
+        row = existing.get(key)
+        if row is None:
+            created.append(employee)
+            continue
+        # Columns left blank keep the stored value rather than the model default
+        for column in UPDATE_COLUMNS:
+            if column not in columns:
+                setattr(employee, column, row[column])
+        if any(getattr(employee, column) != row[column] for column in UPDATE_COLUMNS):
+            employee.pk = row['id']
+            updated.append(employee)
+            if (row['department'] or '') != (employee.department or ''):
+                moved.append(employee.pk)
+                departments.update({row['department'] or '', employee.department or ''})
+        else:
+            result.unchanged += 1
+
+    if not dry_run:
+        # New rows are inserted; rows given the id of an existing employee update it
+        Employee.objects.bulk_create(
+            created + updated, update_conflicts=True, unique_fields=['id'], update_fields=UPDATE_COLUMNS,
+        )
+        if moved:
+            # Payrolls of employees who changed department belong to other buckets now
+            refresh_employee_buckets(moved, departments)
+    result.created += len(created)
+    result.updated += len(updated)
+    result.moved += len(moved)
+
+
+def _invalidate_caches(result):
+    if result.moved:
+        invalidate_payroll_aggregates()
+    invalidate_employee_aggregates()
+    invalidate_name_index()
+    bump_data_version()
+
+
+def import_employees(file, filename, error_report, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """
+    Import employees from ``file`` (binary; CSV or XLSX, told apart by
+    ``filename``), writing rejected rows as CSV to the text file
+    ``error_report``. All writes happen in one transaction. Raises
+    :class:`EmployeeImportError` if the file can't be read as an employee
+    list; returns an :class:`EmployeeImportResult`.
+    """
+    result = EmployeeImportResult()
+    started = time.perf_counter()
+    errors = csv.writer(error_report)
+    errors.writerow(ERROR_REPORT_HEADER)
+
+    with transaction.atomic():
+        batch = []
+        for row in read_rows(file, filename):
+            result.rows += 1
+            batch.append(row)
+            if len(batch) >= batch_size:
+                _upsert(_validate(batch, result, errors), result, dry_run)
+                batch = []
+        if batch:
+            _upsert(_validate(batch, result, errors), result, dry_run)
+
+        if (result.created or result.updated) and not dry_run:
+            # Other processes must not rebuild their caches from uncommitted rows
+            transaction.on_commit(lambda: _invalidate_caches(result))
+
+    result.elapsed = time.perf_counter() - started
+    logger.info(
+        "Employee import of %s: %d rows, %d created, %d updated, %d unchanged, %d rejected (%.0f rows/min)",
+        filename, result.rows, result.created, result.updated, result.unchanged, result.rejected,
+        result.rows_per_minute,
+    )
+    return result
+
+
+def error_report_name(token):
+    """Storage name of the error report saved under ``token``."""
+    return f"{ERROR_REPORT_DIR}/{token}.csv"
+
+
+def save_error_report(errors):
+    """
+    Stores the error report in ``errors`` (a file object) under a random,
+    unguessable name and returns its token.
+    """
+    name = default_storage.save(error_report_name(secrets.token_urlsafe(24)), File(errors))
+    return os.path.splitext(os.path.basename(name))[0]
@@ -1,247 +1,256 @@
 import logging
-from datetime import datetime
-from io import BytesIO
+import tempfile
 
-from django.contrib import messages
-from django.db.models import Count, Sum
-from django.http import HttpResponse
+from django.core.files import File
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Border, Font, Side
 from openpyxl.utils import get_column_letter
 
-from .models import Employee, Payroll, Report
-from django.core.files.base import ContentFile
+from .dashboard import department_label
+from .models import Employee, Payroll
+from .report_data import report_payrolls, report_totals
+from .summaries import department_employee_counts, department_totals
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 
+# Rows fetched per database round trip while streaming a sheet
+EXPORT_CHUNK_SIZE = 2000
 
-def create_styled_workbook(title):
-    """Creates a workbook with a styled title and returns the workbook and worksheet."""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = title
+HEADER_BORDER = Border(
+    bottom=Side(style="thin"),
+    left=Side(style="thin"),
+    right=Side(style="thin"),
+    top=Side(style="thin"),
+)
 
-    # Add and style the main title
-    ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=8)
-    title_cell = ws.cell(row=1, column=1, value=title)
-    title_cell.font = Font(bold=True, size=16)
-    title_cell.alignment = Alignment(horizontal="center")
 
+def create_streaming_workbook(title, headers, subtitle=None):
+    """
+    Creates a write-only workbook with a styled title and header row.
+
+    Rows appended to the returned worksheet are written straight to disk, so
+    memory use stays flat no matter how many rows the report has.
+    """
+    wb = Workbook(write_only=True)
+    ws = add_streaming_sheet(wb, title, headers, subtitle)
     return wb, ws
 
 
-def set_header_styles(ws, headers):
-    """Applies styling to header cells and sets column widths."""
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=3, column=col_num, value=header)
+def add_streaming_sheet(wb, title, headers, subtitle=None, sheet_title=None):
+    """Adds a sheet with a styled title and header row to a write-only workbook."""
+    ws = wb.create_sheet(title=(sheet_title or title)[:31])
+
+    # Column widths must be set before the first row is written
+    for col_num in range(1, len(headers) + 1):
+        ws.column_dimensions[get_column_letter(col_num)].width = 20
+
+    title_cell = WriteOnlyCell(ws, value=title)
+    title_cell.font = Font(bold=True, size=16)
+    ws.append([title_cell])
+
+    if subtitle:
+        subtitle_cell = WriteOnlyCell(ws, value=subtitle)
+        subtitle_cell.font = Font(italic=True)
+        ws.append([subtitle_cell])
+    else:
+        ws.append([])
+
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
         cell.font = Font(bold=True)
         cell.alignment = Alignment(horizontal="center")
-        cell.border = Border(
-            bottom=Side(style="thin"),
-            left=Side(style="thin"),
-            right=Side(style="thin"),
-            top=Side(style="thin"),
-        )
-        # Adjust column width
-        column_letter = get_column_letter(col_num)
-        ws.column_dimensions[column_letter].width = 20
+        cell.border = HEADER_BORDER
+        header_cells.append(cell)
+    ws.append(header_cells)
+
     return ws
 
 
-def generate_payroll_excel(request, start_date, end_date):
-    """Generates an Excel report for payroll data and saves it to the database."""
-    payrolls = Payroll.objects.filter(
-        pay_period__range=[start_date, end_date]
-    ).select_related("employee")
+def period_subtitle(start_date, end_date):
+    return f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}"
+
 
-    if not payrolls.exists():
-        messages.warning(request, "No payroll records found for the selected criteria.")
-        return None
+def append_totals_row(ws, values):
+    """Appends a bold totals row; ``values`` are the row's cell values."""
+    cells = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        cell.font = Font(bold=True)
+        cells.append(cell)
+    ws.append(cells)
+
+
+def save_workbook_to_report(wb, report):
+    """
+    Saves a workbook into ``report.file`` under ``report.name``.
+
+    The workbook is written to a temporary file first and handed to the
+    storage in chunks; ``storage.save()`` reserves the final name, so two
+    jobs building a report of the same name can't overwrite each other.
+    The caller saves the Report row.
+    """
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        report.file.save(report.name, File(tmp), save=False)
+    return report
+
+
+def build_payroll_excel(report):
+    """Writes the payroll detail workbook for ``report``. Returns False if there is no data."""
+    payrolls = report_payrolls(report)
+    totals = report_totals(payrolls)
 
-    wb, ws = create_styled_workbook("Payroll Detail Report")
-    ws.cell(
-        row=2,
-        column=1,
-        value=f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-    ).font = Font(italic=True)
+    if not totals["payroll_count"]:
+        return False
 
     headers = [
         "Employee ID", "Employee Name", "Department", "Gross Salary",
         "Allowances", "Deductions", "Net Salary", "Pay Period",
     ]
-    ws = set_header_styles(ws, headers)
-
-    for row_num, payroll in enumerate(payrolls, 4):
-        ws.cell(row=row_num, column=1, value=payroll.employee.id)
-        ws.cell(row=row_num, column=2, value=f"{payroll.employee.first_name} {payroll.employee.last_name}")
-        ws.cell(row=row_num, column=3, value=payroll.employee.get_department_display())
-        ws.cell(row=row_num, column=4, value=payroll.gross_salary)
-        ws.cell(row=row_num, column=5, value=payroll.total_allowances)
-        ws.cell(row=row_num, column=6, value=payroll.total_deductions)
-        ws.cell(row=row_num, column=7, value=payroll.net_salary)
-        ws.cell(row=row_num, column=8, value=payroll.pay_period)
-
-    # Save the workbook to a BytesIO buffer
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
-    # Create a Report record
-    report_name = f"Payroll_Report_{start_date}_{end_date}.xlsx"
-    report = Report.objects.create(
-        name=report_name,
-        type='payroll',
-        period_start=start_date,
-        period_end=end_date,
-        generated_by=request.user,
+    wb, ws = create_streaming_workbook(
+        "Payroll Detail Report", headers, period_subtitle(report.period_start, report.period_end)
     )
-    report.file.save(report_name, ContentFile(buffer.read()))
-
-    messages.success(request, "Payroll report generated and saved successfully.")
-    
-    return report
-
-
-def generate_tax_excel(request, start_date, end_date):
-    """Generates a tax Excel report and saves it to the database."""
-    payrolls = Payroll.objects.filter(
-        pay_period__range=[start_date, end_date]
-    ).select_related("employee")
 
-    if not payrolls.exists():
-        messages.warning(request, "No tax records found for the selected criteria.")
-        return None
-
-    wb, ws = create_styled_workbook("Tax Report")
-    ws.cell(
-        row=2,
-        column=1,
-        value=f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-    ).font = Font(italic=True)
+    rows = payrolls.values_list(
+        "employee_id", "employee__first_name", "employee__last_name", "employee__department",
+        "gross_salary", "total_allowances", "total_deductions", "net_salary", "pay_period",
+    )
+    departments = dict(Employee.DEPARTMENT_CHOICES)
+    for (employee_id, first_name, last_name, department, gross, allowances,
+         deductions, net, pay_period) in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        ws.append([
+            employee_id, f"{first_name} {last_name}", departments.get(department),
+            gross, allowances, deductions, net, pay_period,
+        ])
+    append_totals_row(ws, [
+        "Total", None, None, totals["total_gross"], totals["total_allowances"],
+        totals["total_deductions"], totals["total_net"], None,
+    ])
+
+    save_workbook_to_report(wb, report)
+    return True
+
+
+def build_tax_excel(report):
+    """Writes the tax workbook for ``report``. Returns False if there is no data."""
+    payrolls = report_payrolls(report)
+    totals = report_totals(payrolls)
+
+    if not totals["payroll_count"]:
+        return False
 
     headers = ["Employee ID", "Employee Name", "Tax Amount", "Pay Period"]
-    ws = set_header_styles(ws, headers)
-
-    for row_num, payroll in enumerate(payrolls, 4):
-        ws.cell(row=row_num, column=1, value=payroll.employee.id)
-        ws.cell(row=row_num, column=2, value=f"{payroll.employee.first_name} {payroll.employee.last_name}")
-        ws.cell(row=row_num, column=3, value=payroll.tax_amount)
-        ws.cell(row=row_num, column=4, value=payroll.pay_period)
-
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
-    report_name = f"Tax_Report_{start_date}_{end_date}.xlsx"
-    report = Report.objects.create(
-        name=report_name,
-        type='tax',
-        period_start=start_date,
-        period_end=end_date,
-        generated_by=request.user,
+    wb, ws = create_streaming_workbook(
+        "Tax Report", headers, period_subtitle(report.period_start, report.period_end)
     )
-    report.file.save(report_name, ContentFile(buffer.read()))
 
-    messages.success(request, "Tax report generated and saved successfully.")
+    rows = payrolls.values_list(
+        "employee_id", "employee__first_name", "employee__last_name", "tax_amount", "pay_period",
+    )
+    for employee_id, first_name, last_name, tax_amount, pay_period in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        ws.append([employee_id, f"{first_name} {last_name}", tax_amount, pay_period])
+    append_totals_row(ws, ["Total", None, totals["total_tax"], None])
 
-    return report
+    save_workbook_to_report(wb, report)
+    return True
 
 
-def generate_employee_excel(request, start_date, end_date):
-    """Generates an employee Excel report and saves it to the database."""
+def build_employee_excel(report):
+    """Writes the employee workbook for ``report``. Returns False if there is no data."""
     employees = Employee.objects.all()
+    if report.department:
+        employees = employees.filter(department=report.department)
 
     if not employees.exists():
-        messages.warning(request, "No employees found.")
-        return None
+        return False
 
-    wb, ws = create_styled_workbook("Employee Report")
     headers = [
         "Employee ID", "First Name", "Last Name", "Email",
         "Department", "Hire Date", "Status",
     ]
-    ws = set_header_styles(ws, headers)
-
-    for row_num, employee in enumerate(employees, 4):
-        ws.cell(row=row_num, column=1, value=employee.id)
-        ws.cell(row=row_num, column=2, value=employee.first_name)
-        ws.cell(row=row_num, column=3, value=employee.last_name)
-        ws.cell(row=row_num, column=4, value=employee.email)
-        ws.cell(row=row_num, column=5, value=employee.get_department_display())
-        ws.cell(row=row_num, column=6, value=employee.hire_date)
-        ws.cell(row=row_num, column=7, value=employee.get_is_active_display())
-
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
-    report_name = "Employee_Report.xlsx"
-    report = Report.objects.create(
-        name=report_name,
-        type='employee',
-        period_start=start_date,
-        period_end=end_date,
-        generated_by=request.user,
+    wb, ws = create_streaming_workbook("Employee Report", headers)
+
+    departments = dict(Employee.DEPARTMENT_CHOICES)
+    statuses = dict(Employee.ACTIVE_STATUS)
+    rows = employees.order_by("id").values_list(
+        "id", "first_name", "last_name", "email", "department", "hire_date", "is_active",
     )
-    report.file.save(report_name, ContentFile(buffer.read()))
+    for employee_id, first_name, last_name, email, department, hire_date, status in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        ws.append([
+            employee_id, first_name, last_name, email,
+            departments.get(department), hire_date, statuses.get(status, status),
+        ])
 
-    messages.success(request, "Employee report generated and saved successfully.")
+    save_workbook_to_report(wb, report)
+    return True
 
-    return report
 
+DEPARTMENT_DETAIL_HEADERS = [
+    "Employee ID", "Employee Name", "Email", "Pay Period",
+    "Gross Salary", "Net Salary", "Payment Status",
+]
 
-def generate_department_excel(request, start_date, end_date):
-    """Generates a department summary Excel report and saves it to the database."""
-    department_summary = (
-        Payroll.objects.filter(pay_period__range=[start_date, end_date])
-        .values("employee__department")
-        .annotate(
-            employee_count=Count("employee", distinct=True),
-            total_gross=Sum("gross_salary"),
-            total_net=Sum("net_salary"),
+
+def department_detail_rows(report, department):
+    """Payroll rows for one department's detail sheet, streamed from the database."""
+    rows = (
+        Payroll.objects.filter(
+            employee__department=department,
+            pay_period__range=[report.period_start, report.period_end],
+        )
+        .order_by("employee_id", "pay_period")
+        .values_list(
+            "employee_id", "employee__first_name", "employee__last_name", "employee__email",
+            "pay_period", "gross_salary", "net_salary", "payment_status",
         )
     )
+    statuses = dict(Payroll.PAYMENT_STATUS_CHOICES)
+    for employee_id, first_name, last_name, email, pay_period, gross, net, status in rows.iterator(
+        chunk_size=EXPORT_CHUNK_SIZE,
+    ):
+        yield employee_id, f"{first_name} {last_name}", email, pay_period, gross, net, statuses.get(status, status)
 
-    if not department_summary:
-        messages.warning(request, "No departmental data found for the selected criteria.")
-        return None
 
-    wb, ws = create_styled_workbook("Department Summary Report")
-    ws.cell(
-        row=2,
-        column=1,
-        value=f"Period: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}",
-    ).font = Font(italic=True)
+def build_department_excel(report):
+    """
+    Writes the department summary workbook for ``report``. Returns False if there is no data.
+
+    The first sheet holds one summary row per department, followed by a
+    detail sheet per department. Every sheet is streamed in this process:
+    a write-only workbook can't be split across processes and merged.
+    """
+    totals = department_totals(report.period_start, report.period_end, department=report.department)
+    if not totals:
+        return False
 
     headers = [
         "Department", "Employee Count", "Total Gross Salary", "Total Net Salary",
     ]
-    ws = set_header_styles(ws, headers)
-
-    for row_num, summary in enumerate(department_summary, 4):
-        department_display = dict(Employee.DEPARTMENT_CHOICES).get(
-            summary["employee__department"]
-        )
-        ws.cell(row=row_num, column=1, value=department_display)
-        ws.cell(row=row_num, column=2, value=summary["employee_count"])
-        ws.cell(row=row_num, column=3, value=summary["total_gross"])
-        ws.cell(row=row_num, column=4, value=summary["total_net"])
-
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
-
-    report_name = f"Department_Summary_{start_date}_{end_date}.xlsx"
-    report = Report.objects.create(
-        name=report_name,
-        type='department',
-        period_start=start_date,
-        period_end=end_date,
-        generated_by=request.user,
-    )
-    report.file.save(report_name, ContentFile(buffer.read()))
-
-    messages.success(request, "Department summary report generated and saved successfully.")
-
-    return report
+    subtitle = period_subtitle(report.period_start, report.period_end)
+    wb, ws = create_streaming_workbook("Department Summary Report", headers, subtitle)
+
+    headcounts = department_employee_counts(report.period_start, report.period_end, department=report.department)
+    departments = sorted(totals)
+    for department in departments:
+        values = totals[department]
+        ws.append([
+            department_label(department),
+            headcounts.get(department, 0),
+            values["total_gross"],
+            values["total_net"],
+        ])
+
+    for department in departments:
+        if not department:
+            continue
+        label = department_label(department)
+        detail_ws = add_streaming_sheet(wb, f"{label} Payroll", DEPARTMENT_DETAIL_HEADERS, subtitle, sheet_title=label)
+        for row in department_detail_rows(report, department):
+            detail_ws.append(row)
+
+    save_workbook_to_report(wb, report)
+    return True
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from payroll.synthetic_data import DEFAULT_BATCH_SIZE, DEFAULT_CHUNK_SIZE, build_fixtures, clear_payroll_data
+
+
+class Command(BaseCommand):
+    help = 'Generate seeded synthetic employees and payroll history for load tests and benchmarks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=10000, help='Employees to create')
+        parser.add_argument('--months', type=int, default=24, help='Months of payroll history')
+        parser.add_argument('--end', help='Last pay period in YYYY-MM-DD format (default: today)')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed; the same seed gives the same data')
+        parser.add_argument('--pending-months', type=int, default=1,
+                            help='Latest months whose payrolls are still pending')
+        parser.add_argument('--late-share', type=float, default=0.02,
+                            help='Share of older payrolls left pending')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Employees generated and written per transaction')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='Rows per executemany batch')
+        parser.add_argument('--workers', type=int, default=1, help='Processes generating chunks')
+        parser.add_argument('--clear', action='store_true', help='Delete every employee and payroll first')
+
+    def handle(self, *args, **options):
+        if options['end']:
+            try:
+                end = datetime.strptime(options['end'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError('Invalid end date. Please use YYYY-MM-DD.')
+        else:
+            end = timezone.now().date()
+
+        if options['employees'] < 1 or options['months'] < 1:
+            raise CommandError('Employees and months must be positive.')
+        if not 0 <= options['late_share'] <= 1:
+            raise CommandError('The late share must be between 0 and 1.')
+
+        if options['clear']:
+            clear_payroll_data()
+
+        result = build_fixtures(
+            options['employees'],
+            options['months'],
+            end,
+            seed=options['seed'],
+            pending_months=options['pending_months'],
+            late_share=options['late_share'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result.employees} employees and {result.payrolls} payrolls "
+            f"({result.pending} pending) in {result.elapsed:.2f}s ({result.rows_per_second:,.0f} rows/sec)"
+        ))
@@ -0,0 +1,39 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.employee_import import DEFAULT_BATCH_SIZE, EmployeeImportError, import_employees
+
+
+class Command(BaseCommand):
+    help = 'Create or update employees from a CSV or XLSX file, matching existing employees by email.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or XLSX file with a header row')
+        parser.add_argument('--errors', help='Where to write the rejected rows (default: <path>.errors.csv)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help='Rows validated and written per batch')
+        parser.add_argument('--dry-run', action='store_true', help='Validate the file without writing employees')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        error_path = options['errors'] or f"{os.path.splitext(path)[0]}.errors.csv"
+
+        try:
+            with open(path, 'rb') as file, open(error_path, 'w', newline='', encoding='utf-8') as error_report:
+                result = import_employees(
+                    file, path, error_report, batch_size=options['batch_size'], dry_run=options['dry_run'],
+                )
+        except OSError as e:
+            raise CommandError(f"Could not open {e.filename}: {e.strerror}")
+        except EmployeeImportError as e:
+            raise CommandError(str(e))
+
+        verb = 'Would import' if options['dry_run'] else 'Imported'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.rows} rows: {result.created} created, {result.updated} updated, "
+            f"{result.unchanged} unchanged, {result.rejected} rejected "
+            f"in {result.elapsed:.2f}s ({result.rows_per_minute:,.0f} rows/min)"
+        ))
+        if result.rejected:
+            self.stdout.write(self.style.WARNING(f"Rejected rows written to {error_path}"))
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payroll.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Recompute the department/month payroll summary table from payroll history.'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        count = rebuild_summaries()
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {count} department payroll summary rows in {time.perf_counter() - started:.2f}s"
+        ))
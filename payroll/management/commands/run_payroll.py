@@ -0,0 +1,52 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.models import Employee
+from payroll.payroll_runs import DEFAULT_CHUNK_SIZE, run_payroll
+
+
+class Command(BaseCommand):
+    help = 'Create pending payroll rows for every employee for a pay period in one batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('pay_period', help='Pay date in YYYY-MM-DD format')
+        parser.add_argument('--department', choices=[d[0] for d in Employee.DEPARTMENT_CHOICES],
+                            help='Only run payroll for this department')
+        parser.add_argument('--status', action='append', choices=[s[0] for s in Employee.ACTIVE_STATUS],
+                            dest='statuses', help='Only include employees with this status (repeatable)')
+        parser.add_argument('--allowances', default='0.00', help='Allowances added to every payroll row')
+        parser.add_argument('--deductions', default='0.00', help='Other deductions applied to every payroll row')
+        parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                            help='Rows per INSERT statement')
+        parser.add_argument('--dry-run', action='store_true', help='Compute the run without writing rows')
+
+    def handle(self, *args, **options):
+        try:
+            pay_period = datetime.strptime(options['pay_period'], '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError('Invalid pay period. Please use YYYY-MM-DD.')
+
+        try:
+            allowances = Decimal(options['allowances'])
+            deductions = Decimal(options['deductions'])
+        except InvalidOperation:
+            raise CommandError('Allowances and deductions must be numbers.')
+
+        result = run_payroll(
+            pay_period,
+            department=options['department'],
+            statuses=options['statuses'],
+            allowances=allowances,
+            deductions=deductions,
+            chunk_size=options['chunk_size'],
+            dry_run=options['dry_run'],
+        )
+
+        verb = 'Would create' if options['dry_run'] else 'Created'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result.created} payroll rows for {pay_period.strftime('%B %Y')} "
+            f"(skipped {result.skipped_existing} existing, {result.skipped_min_net} below minimum net) "
+            f"in {result.elapsed:.2f}s ({result.rows_per_second:,.0f} rows/sec)"
+        ))
@@ -0,0 +1,50 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from payroll.report_jobs import run_worker
+
+
+def _worker_process(poll_interval, max_jobs, burst):
+    # Each process opens its own database connection
+    connections.close_all()
+    run_worker(poll_interval=poll_interval, max_jobs=max_jobs, burst=burst)
+
+
+class Command(BaseCommand):
+    help = 'Build queued reports in one or more worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait between checks when the queue is empty')
+        parser.add_argument('--max-jobs', type=int, default=None,
+                            help='Stop each worker after this many reports')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        poll_interval = options['poll_interval']
+        max_jobs = options['max_jobs']
+        burst = options['burst']
+
+        if options['processes'] <= 1:
+            processed = run_worker(poll_interval=poll_interval, max_jobs=max_jobs, burst=burst)
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} reports"))
+            return
+
+        # Don't share the parent's connection with the forked workers
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=_worker_process, args=(poll_interval, max_jobs, burst))
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
+        self.stdout.write(self.style.SUCCESS(f"Stopped {len(workers)} report workers"))
@@ -0,0 +1,60 @@
+# Generated by Django 5.2 on 2026-10-18 09:22
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def populate_summaries(apps, schema_editor):
+    Payroll = apps.get_model('payroll', 'Payroll')
+    DepartmentPayrollSummary = apps.get_model('payroll', 'DepartmentPayrollSummary')
+    rows = (
+        Payroll.objects.annotate(pay_month=TruncMonth('pay_period'))
+        .order_by()
+        .values('employee__department', 'pay_month', 'payment_status')
+        .annotate(
+            payroll_count=Count('id'),
+            total_gross=Sum('gross_salary'),
+            total_tax=Sum('tax_amount'),
+            total_retirement=Sum('retirement_amount'),
+            total_health_insurance=Sum('health_insurance'),
+            total_net=Sum('net_salary'),
+        )
+    )
+    summaries = []
+    for row in rows:
+        row['department'] = row.pop('employee__department') or ''
+        summaries.append(DepartmentPayrollSummary(**row))
+    DepartmentPayrollSummary.objects.bulk_create(summaries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0007_report_generated_by'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartmentPayrollSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('department', models.CharField(blank=True, choices=[('engineering', 'Engineering'), ('marketing', 'Marketing'), ('sales', 'Sales'), ('human_resource', 'Human Resource'), ('finance', 'Finance'), ('design', 'Design')], default='', help_text='Department code, blank for employees without a department', max_length=20)),
+                ('pay_month', models.DateField(help_text='First day of the pay month')),
+                ('payment_status', models.CharField(choices=[('paid', 'Paid'), ('pending', 'Pending')], max_length=20)),
+                ('payroll_count', models.PositiveIntegerField(default=0)),
+                ('total_gross', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_tax', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_retirement', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_health_insurance', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('total_net', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'department payroll summaries',
+                'ordering': ['-pay_month', 'department', 'payment_status'],
+                'unique_together': {('department', 'pay_month', 'payment_status')},
+            },
+        ),
+        migrations.RunPython(populate_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+def mark_existing_reports(apps, schema_editor):
+    """Reports created before the job queue were generated synchronously."""
+    Report = apps.get_model('payroll', 'Report')
+    Report.objects.filter(status='processing').exclude(file='').update(status='generated')
+    Report.objects.filter(status='processing', file='').update(status='failed')
+    Report.objects.filter(name__iendswith='.pdf').update(format='pdf')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0008_department_payroll_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='report',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='error_message',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='format',
+            field=models.CharField(choices=[('excel', 'Excel'), ('pdf', 'PDF')], default='excel', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='started_at',
+            field=models.DateTimeField(blank=True, help_text='When a worker picked up the report', null=True),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='file',
+            field=models.FileField(blank=True, upload_to='reports/'),
+        ),
+        migrations.AlterField(
+            model_name='report',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('generated', 'Generated'), ('failed', 'Failed'), ('processing', 'Processing')], default='processing', max_length=20),
+        ),
+        migrations.RunPython(mark_existing_reports, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-18 09:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0009_report_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='cache_key',
+            field=models.CharField(blank=True, db_index=True, help_text='Hash of the report parameters and the data version it was built from', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='report',
+            name='data_version',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-18 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0010_report_cache'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['department', 'is_active'], name='employee_dept_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['is_active', 'first_name', 'last_name'], name='employee_status_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['first_name', 'last_name'], name='employee_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payroll',
+            index=models.Index(fields=['pay_period', 'employee'], name='payroll_period_employee_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payroll',
+            index=models.Index(condition=models.Q(('payment_status', 'paid')), fields=['-payment_date'], name='payroll_paid_paydate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payroll',
+            index=models.Index(condition=models.Q(('payment_status', 'pending')), fields=['-pay_period'], name='payroll_pending_period_idx'),
+        ),
+    ]
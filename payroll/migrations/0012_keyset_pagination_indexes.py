@@ -0,0 +1,41 @@
+# Generated by Django 5.2 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0011_payroll_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='employee',
+            name='employee_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='payroll',
+            name='payroll_paid_paydate_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='payroll',
+            name='payroll_pending_period_idx',
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['first_name', 'last_name', 'id'], name='employee_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payroll',
+            index=models.Index(fields=['-pay_period', '-id'], name='payroll_period_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payroll',
+            index=models.Index(condition=models.Q(('payment_status', 'paid')), fields=['-payment_date', '-id'], name='payroll_paid_paydate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payroll',
+            index=models.Index(condition=models.Q(('payment_status', 'pending')), fields=['-pay_period', '-id'], name='payroll_pending_period_idx'),
+        ),
+    ]
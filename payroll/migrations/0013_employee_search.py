@@ -0,0 +1,26 @@
+# Generated by Django 5.2 on 2026-10-18 10:05
+
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from payroll.search import install_search_index
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from payroll.search import uninstall_search_index
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX on PostgreSQL and the FTS5 table and triggers on SQLite are
+    # vendor-specific, so they are created in code rather than as model state
+
+    dependencies = [
+        ('payroll', '0012_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 10:44
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0013_employee_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='employee_email_lower_idx'),
+        ),
+    ]
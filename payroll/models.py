@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.utils import timezone
 from decimal import Decimal
 import uuid
@@ -6,6 +7,8 @@ from django.contrib.auth.models import User
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
+from .calculations import calculate_payroll
+
 # Function to generate a default avatar path or handle missing avatars
 def default_avatar_path():
     return 'avatars/default_avatar.png' # Make sure this default image exists in your media/avatars/ directory
@@ -80,9 +83,32 @@ class Employee(models.Model):
         default='active',
     )
 
+    class Meta:
+        indexes = [
+            # employee_list filters by department and/or status, ordered by name
+            models.Index(fields=['department', 'is_active'], name='employee_dept_status_idx'),
+            models.Index(fields=['is_active', 'first_name', 'last_name'], name='employee_status_name_idx'),
+            # id breaks ties for keyset pagination
+            models.Index(fields=['first_name', 'last_name', 'id'], name='employee_name_idx'),
+            # The employee import matches rows by email, ignoring case
+            models.Index(Lower('email'), name='employee_email_lower_idx'),
+        ]
+
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
+class PayrollQuerySet(models.QuerySet):
+    # Columns the payroll list pages render
+    LIST_ROW_FIELDS = (
+        'reference_id', 'pay_period', 'gross_salary', 'net_salary', 'payment_status', 'payment_date',
+        'employee__first_name', 'employee__last_name', 'employee__department',
+    )
+
+    def list_rows(self):
+        """Rows shaped for the payroll list pages: the employee joined in, other columns deferred."""
+        return self.select_related('employee').only(*self.LIST_ROW_FIELDS)
+
+
 class Payroll(models.Model):
     reference_id = models.CharField(
         max_length=50,  # Increased length to accommodate UUID
@@ -119,9 +145,75 @@ class Payroll(models.Model):
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
     retirement_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0)
 
+    objects = PayrollQuerySet.as_manager()
+
     class Meta:
         ordering = ['-pay_period', 'employee__first_name']
         unique_together = ['employee', 'pay_period']
+        indexes = [
+            # Period lists and report ranges; employee_id lets the department join use the index
+            models.Index(fields=['pay_period', 'employee'], name='payroll_period_employee_idx'),
+            # payroll_list pages on (pay_period, id), newest first
+            models.Index(fields=['-pay_period', '-id'], name='payroll_period_id_idx'),
+            # paid_payroll_list: paid rows newest payment first
+            models.Index(
+                fields=['-payment_date', '-id'],
+                name='payroll_paid_paydate_idx',
+                condition=models.Q(payment_status='paid'),
+            ),
+            # pending_payroll_list: pending rows newest period first
+            models.Index(
+                fields=['-pay_period', '-id'],
+                name='payroll_pending_period_idx',
+                condition=models.Q(payment_status='pending'),
+            ),
+        ]
+
+    # Columns the derived amounts are calculated from
+    CALCULATION_INPUTS = (
+        'gross_salary', 'total_allowances', 'total_deductions', 'tax_rate', 'health_insurance', 'retirement_rate',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._remember_loaded_values(fields)
+
+    def _remember_loaded_values(self, fields=None):
+        """
+        Snapshot of the column values as stored, for :meth:`get_dirty_fields`;
+        only ``fields`` are refreshed when a save wrote just those.
+        """
+        if fields is None or getattr(self, '_loaded_values', None) is None:
+            self._loaded_values = {}
+            fields = [field.attname for field in self._meta.concrete_fields]
+        for name in fields:
+            attname = self._meta.get_field(name).attname
+            if attname in self.__dict__:
+                self._loaded_values[attname] = self.__dict__[attname]
+
+    def get_dirty_fields(self):
+        """
+        Names of the columns changed since the row was loaded or last saved,
+        or None for instances that were not loaded from the database.
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        dirty = set()
+        for field in self._meta.concrete_fields:
+            name = field.attname
+            if field.primary_key or name not in self.__dict__:
+                continue
+            # Deferred columns assigned after loading count as changed
+            if name not in loaded or self.__dict__[name] != loaded[name]:
+                dirty.add(name)
+        return dirty
 
     def save(self, *args, **kwargs):
         # Generate unique reference ID if not set
@@ -140,35 +232,41 @@ class Payroll(models.Model):
         if self.employee and not self.gross_salary:
             self.gross_salary = self.employee.salary
 
-        # Convert all values to Decimal to avoid float operations
-        gross_salary = Decimal(str(self.gross_salary))
-        total_allowances = Decimal(str(self.total_allowances))
-        total_deductions = Decimal(str(self.total_deductions))
-        tax_rate = Decimal(str(self.tax_rate))
-        health_insurance = Decimal(str(self.health_insurance))
-        retirement_rate = Decimal(str(self.retirement_rate))
-
-        # Calculate tax amount
-        self.tax_amount = (gross_salary * tax_rate / Decimal('100'))
-        
-        # Calculate retirement amount
-        self.retirement_amount = (gross_salary * retirement_rate / Decimal('100'))
-        
-        # Calculate net salary with all deductions
-        self.net_salary = (
-            gross_salary 
-            + total_allowances 
-            - total_deductions 
-            - self.tax_amount 
-            - health_insurance 
-            - self.retirement_amount
-        )
+        # Rows loaded from the database only recalculate when an input changed
+        dirty = None if self._state.adding else self.get_dirty_fields()
+        if dirty is None or not dirty.isdisjoint(self.CALCULATION_INPUTS):
+            # Derive tax, retirement and net pay with the shared calculation kernel
+            amounts = calculate_payroll(
+                self.gross_salary,
+                allowances=self.total_allowances,
+                deductions=self.total_deductions,
+                tax_rate=self.tax_rate,
+                health_insurance=self.health_insurance,
+                retirement_rate=self.retirement_rate,
+            )
+            self.tax_amount = amounts['tax_amount']
+            self.retirement_amount = amounts['retirement_amount']
+            self.net_salary = amounts['net_salary']
         
         # Set payment date when status changes to paid
         if self.payment_status == 'paid' and not self.payment_date:
             self.payment_date = timezone.now().date()
-        
+
+        changed = None
+        if dirty is not None and not kwargs.get('force_insert'):
+            # Write only the changed columns (and the modification time)
+            changed = self.get_dirty_fields()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                kwargs['update_fields'] = changed | {'updated_at'}
+            else:
+                derived = {'tax_amount', 'retirement_amount', 'net_salary', 'payment_date'}
+                kwargs['update_fields'] = set(update_fields) | (changed & derived)
+        # Columns this save changes, None for new or untracked rows; read by the post_save handlers
+        self._saved_changes = changed
+
         super().save(*args, **kwargs)
+        self._remember_loaded_values(kwargs.get('update_fields'))
 
     def __str__(self):
         return f"Payroll for {self.employee} - {self.pay_period.strftime('%B %Y')}"
@@ -192,20 +290,91 @@ class Report(models.Model):
     ]
 
     REPORT_STATUS = [
+        ('queued', 'Queued'),
         ('generated', 'Generated'),
         ('failed', 'Failed'),
         ('processing', 'Processing'),
     ]
 
+    REPORT_FORMATS = [
+        ('excel', 'Excel'),
+        ('pdf', 'PDF'),
+    ]
+
     name = models.CharField(max_length=255)
     type = models.CharField(max_length=20, choices=REPORT_TYPES)
+    format = models.CharField(max_length=10, choices=REPORT_FORMATS, default='excel')
     generated_date = models.DateTimeField(auto_now_add=True)
     period_start = models.DateField()
     period_end = models.DateField()
     department = models.CharField(max_length=20, choices=Employee.DEPARTMENT_CHOICES, null=True, blank=True)
-    file = models.FileField(upload_to='reports/')
+    file = models.FileField(upload_to='reports/', blank=True)
     status = models.CharField(max_length=20, choices=REPORT_STATUS, default='processing')
+    error_message = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True, help_text="When a worker picked up the report")
+    completed_at = models.DateTimeField(null=True, blank=True)
     generated_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    cache_key = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="Hash of the report parameters and the data version it was built from",
+    )
+    data_version = models.PositiveBigIntegerField(null=True, blank=True)
     
     def __str__(self):
         return f"{self.name} - {self.generated_date.strftime('%Y-%m-%d')}"
+
+    @property
+    def is_finished(self):
+        return self.status in ('generated', 'failed')
+
+
+class DepartmentPayrollSummary(models.Model):
+    """
+    Pre-aggregated payroll totals per department, pay month and payment status.
+
+    Maintained incrementally by the signal handlers in ``payroll/signals.py``
+    and by the bulk payroll operations; ``manage.py rebuild_payroll_summaries``
+    recomputes it from scratch.
+    """
+    department = models.CharField(
+        max_length=20,
+        choices=Employee.DEPARTMENT_CHOICES,
+        blank=True,
+        default='',
+        help_text="Department code, blank for employees without a department",
+    )
+    pay_month = models.DateField(help_text="First day of the pay month")
+    payment_status = models.CharField(max_length=20, choices=Payroll.PAYMENT_STATUS_CHOICES)
+    payroll_count = models.PositiveIntegerField(default=0)
+    total_gross = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_tax = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_retirement = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_health_insurance = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    total_net = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-pay_month', 'department', 'payment_status']
+        unique_together = ['department', 'pay_month', 'payment_status']
+        verbose_name_plural = 'department payroll summaries'
+
+    def __str__(self):
+        return f"{self.get_department_display() or 'Unassigned'} - {self.pay_month.strftime('%B %Y')} ({self.payment_status})"
+
+
+class DataVersion(models.Model):
+    """
+    Named counter shared by every process. ``payroll`` is bumped on every
+    Employee or Payroll write (see ``payroll/data_version.py``), so reports
+    built at the same version can be reused; ``employee_names`` tracks the
+    autocomplete name index (see ``payroll/autocomplete.py``) and ``company``
+    the cached Company record (see ``payroll/company.py``).
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
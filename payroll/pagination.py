@@ -0,0 +1,239 @@
+"""
+Keyset (cursor) pagination for the list views.
+
+Pages are read with ``WHERE (sort key) after (last row's key) ORDER BY ...
+LIMIT n`` instead of ``OFFSET``, so page 500 costs the same as page 1. The
+ordering always ends with ``id`` to make the key unique; the position is
+carried between requests in an opaque ``cursor`` query parameter. Nullable
+sort fields order NULLs as the largest value, as PostgreSQL does by default.
+
+Totals are never counted per request: callers pass a count from a counter
+they already maintain, otherwise :func:`estimated_count` asks the planner
+(PostgreSQL) or caches an exact count for ``PAGINATION_COUNT_TTL`` seconds.
+"""
+import base64
+import hashlib
+import json
+import operator
+from decimal import Decimal
+from functools import cached_property, reduce
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import F, Q
+from django.http import QueryDict
+
+CURSOR_PARAM = 'cursor'
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _json_value(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(direction, values):
+    payload = json.dumps([direction] + [_json_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, keys):
+    """``(direction, values)`` for a cursor over ``keys``; raises :class:`InvalidCursor`."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        direction, raw_values = payload[0], payload[1:]
+    except (ValueError, TypeError, IndexError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in (NEXT, PREVIOUS) or len(raw_values) != len(keys):
+        raise InvalidCursor(cursor)
+    try:
+        values = [None if raw is None else key.field.to_python(raw) for key, raw in zip(keys, raw_values)]
+    except Exception:
+        raise InvalidCursor(cursor)
+    return direction, values
+
+
+class SortKey:
+    """One column of the ordering, e.g. ``'-pay_period'``."""
+
+    def __init__(self, model, spec):
+        self.descending = spec.startswith('-')
+        self.name = spec.lstrip('-')
+        self.field = model._meta.get_field(self.name)
+        self.nullable = self.field.null
+
+    def order_by(self, reverse=False):
+        descending = self.descending != reverse
+        if not self.nullable:
+            return F(self.name).desc() if descending else F(self.name).asc()
+        if descending:
+            return F(self.name).desc(nulls_first=True)
+        return F(self.name).asc(nulls_last=True)
+
+    def equal(self, value):
+        if value is None:
+            return Q(**{f'{self.name}__isnull': True})
+        return Q(**{self.name: value})
+
+    def after(self, value, reverse=False):
+        """Rows strictly after ``value`` in this column's sort order, or None if there are none."""
+        if self.descending != reverse:
+            if value is None:
+                return Q(**{f'{self.name}__isnull': False})
+            return Q(**{f'{self.name}__lt': value})
+        if value is None:
+            return None
+        q = Q(**{f'{self.name}__gt': value})
+        if self.nullable:
+            q |= Q(**{f'{self.name}__isnull': True})
+        return q
+
+
+def keyset_filter(keys, values, reverse=False):
+    """``(k1 > v1) OR (k1 = v1 AND k2 > v2) OR ...`` in the sort order of ``keys``."""
+    branches = []
+    prefix = Q()
+    for key, value in zip(keys, values):
+        after = key.after(value, reverse)
+        if after is not None:
+            branches.append(prefix & after)
+        prefix &= key.equal(value)
+    return reduce(operator.or_, branches)
+
+
+def planner_count(queryset):
+    """The planner's row estimate for ``queryset`` (PostgreSQL only)."""
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def estimated_count(queryset):
+    """Approximate row count without a ``COUNT(*)`` on every request."""
+    if connections[queryset.db].vendor == 'postgresql':
+        return planner_count(queryset)
+    sql, params = queryset.order_by().query.sql_with_params()
+    digest = hashlib.sha1(f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest()
+    return cache.get_or_set(f'pagination:count:{digest}', queryset.count, settings.PAGINATION_COUNT_TTL)
+
+
+class KeysetPage:
+    """One page of rows plus the cursors either side of it."""
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor, previous_cursor, count, per_page,
+                 query=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self._count = count
+        self.per_page = per_page
+        self.query = query if query is not None else QueryDict()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @cached_property
+    def count(self):
+        """Total rows in the list, possibly an estimate."""
+        return self._count() if callable(self._count) else self._count
+
+    def _querystring(self, cursor=None):
+        query = self.query.copy()
+        for param in (CURSOR_PARAM, 'page'):
+            query.pop(param, None)
+        if cursor:
+            query[CURSOR_PARAM] = cursor
+        return query.urlencode()
+
+    @property
+    def next_query(self):
+        return self._querystring(self.next_cursor) if self.has_next else ''
+
+    @property
+    def previous_query(self):
+        return self._querystring(self.previous_cursor) if self.has_previous else ''
+
+    @property
+    def first_query(self):
+        return self._querystring()
+
+
+def keyset_paginate(queryset, ordering, cursor=None, per_page=15, count=None, query=None):
+    """
+    A :class:`KeysetPage` of ``queryset`` ordered by ``ordering`` (``id`` is
+    appended if missing). A missing or malformed ``cursor`` gives the first
+    page. ``count`` may be a number or a callable; by default it comes from
+    :func:`estimated_count` and is only computed if the page's count is read.
+    """
+    ordering = list(ordering)
+    if ordering[-1].lstrip('-') != 'id':
+        ordering.append('id')
+    keys = [SortKey(queryset.model, spec) for spec in ordering]
+
+    direction, values = NEXT, None
+    if cursor:
+        try:
+            direction, values = decode_cursor(cursor, keys)
+        except InvalidCursor:
+            direction, values = NEXT, None
+
+    reverse = direction == PREVIOUS
+    rows = queryset.order_by(*[key.order_by(reverse) for key in keys])
+    if values is not None:
+        rows = rows.filter(keyset_filter(keys, values, reverse))
+    rows = list(rows[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if reverse:
+        rows.reverse()
+        has_next, has_previous = values is not None, more
+    else:
+        has_next, has_previous = more, values is not None
+
+    def key_values(obj):
+        return [getattr(obj, key.name) for key in keys]
+
+    next_cursor = encode_cursor(NEXT, key_values(rows[-1])) if rows and has_next else None
+    previous_cursor = encode_cursor(PREVIOUS, key_values(rows[0])) if rows and has_previous else None
+
+    if count is None:
+        def count():
+            return estimated_count(queryset)
+
+    return KeysetPage(rows, has_next, has_previous, next_cursor, previous_cursor, count, per_page, query)
+
+
+def paginate_request(request, queryset, ordering, per_page=15, count=None):
+    """:func:`keyset_paginate` using the request's ``cursor`` parameter."""
+    return keyset_paginate(
+        queryset, ordering,
+        cursor=request.GET.get(CURSOR_PARAM),
+        per_page=per_page,
+        count=count,
+        query=request.GET,
+    )
@@ -0,0 +1,94 @@
+"""
+Fan-out helpers for building large reports across a process pool.
+
+Department reports are split into one part per department and employee
+reports into shards of employee ids. With ``REPORT_PARALLEL_WORKERS`` above
+one, each part is built in its own process on its own database connection
+and the parent merges the results in order. With a single worker (the
+default) the whole report is built as one part in-process, as is any report
+built inside a transaction: the pool can't share it. Only the first part
+carries the report's title block and only the last its footer, so the
+merged document reads as one report.
+"""
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+import django
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from PyPDF2 import PdfWriter
+
+logger = logging.getLogger(__name__)
+
+
+def report_workers(part_count):
+    """Number of processes to use for ``part_count`` parts."""
+    return max(1, min(settings.REPORT_PARALLEL_WORKERS, part_count))
+
+
+def split_parts(items, workers, size=None):
+    """
+    Group ``items`` into report parts.
+
+    One worker gets a single part. Otherwise items are grouped ``size`` at a
+    time (one per part by default) so the pool can balance uneven parts.
+    """
+    items = list(items)
+    if workers <= 1:
+        return [items] if items else []
+    size = max(1, size or 1)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def with_ends(items):
+    """``(item, first, last)`` for each of ``items``, marking the parts that open and close the report."""
+    items = list(items)
+    return [(item, index == 0, index == len(items) - 1) for index, item in enumerate(items)]
+
+
+def _init_worker():
+    # Under the spawn/forkserver start methods the child starts without Django loaded
+    if not apps.ready:
+        django.setup()
+
+
+def map_parts(func, parts, workers=None):
+    """
+    Return ``[func(part) for part in parts]``, computed across a process
+    pool when more than one worker is configured. ``func`` and each part
+    must be picklable. ``workers`` overrides ``REPORT_PARALLEL_WORKERS``.
+
+    Inside ``atomic()`` the parts are computed serially: closing the
+    connection for the pool would break the caller's transaction, and the
+    children couldn't see its uncommitted rows anyway.
+    """
+    parts = list(parts)
+    if workers is None:
+        workers = report_workers(len(parts))
+    workers = max(1, min(workers, len(parts)))
+    if workers > 1 and any(connection.in_atomic_block for connection in connections.all(initialized_only=True)):
+        logger.info("Building %d report parts serially inside a transaction", len(parts))
+        workers = 1
+    if workers == 1:
+        return [func(part) for part in parts]
+
+    # Children must open their own connections instead of sharing the parent's
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        return list(pool.map(func, parts))
+
+
+def merge_pdfs(parts):
+    """Concatenate rendered PDF documents (bytes) into one document."""
+    parts = [part for part in parts if part]
+    if len(parts) == 1:
+        return parts[0]
+
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(BytesIO(part))
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
@@ -0,0 +1,169 @@
+"""
+Batch payroll runs.
+
+Computes the payroll rows for a whole pay period in memory and inserts them
+with chunked ``bulk_create`` calls inside a single transaction, instead of
+going through ``PayrollForm`` and ``Payroll.save()`` once per employee.
+"""
+import logging
+import time
+import uuid
+from decimal import Decimal
+
+from django.db import transaction
+
+from .calculations import (
+    HEALTH_INSURANCE,
+    RETIREMENT_RATE,
+    TAX_RATE,
+    calculate_payroll_batch,
+    from_cents,
+    to_cents,
+    to_cents_array,
+)
+from .models import Employee, Payroll
+from .summaries import bucket_key, refresh_buckets
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class PayrollRunResult:
+    """Outcome of a batch payroll run."""
+
+    def __init__(self, pay_period):
+        self.pay_period = pay_period
+        self.created = 0
+        self.skipped_existing = 0
+        self.skipped_min_net = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return self.created / self.elapsed
+
+    def as_dict(self):
+        return {
+            'pay_period': self.pay_period.isoformat(),
+            'created': self.created,
+            'skipped_existing': self.skipped_existing,
+            'skipped_min_net': self.skipped_min_net,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def _reference_id(pay_period, employee_id):
+    """Same format as ``Payroll.save()``: PAY-YYYYMM-EEEE-xxxxxx."""
+    return f"PAY-{pay_period.year}{pay_period.month:02d}-{str(employee_id).zfill(4)}-{uuid.uuid4().hex[:6]}"
+
+
+def build_payroll_rows(employees, pay_period, allowances=Decimal('0.00'), deductions=Decimal('0.00'), result=None):
+    """
+    Yield unsaved Payroll objects for ``(employee_id, salary)`` pairs.
+
+    The amounts for the whole batch are computed in one call to
+    :func:`calculate_payroll_batch`. Employees whose net pay would fall below
+    a third of their gross salary are skipped, matching the check done by the
+    payroll views.
+    """
+    employees = list(employees)
+    if not employees:
+        return
+    allowances = from_cents(to_cents(allowances))
+    deductions = from_cents(to_cents(deductions))
+    amounts = calculate_payroll_batch(
+        to_cents_array(salary for _, salary in employees),
+        to_cents(allowances),
+        to_cents(deductions),
+    )
+    if result is not None:
+        result.skipped_min_net += int(amounts['below_minimum_net'].sum())
+
+    below_minimum = amounts['below_minimum_net'].tolist()
+    gross = amounts['gross_salary'].tolist()
+    tax = amounts['tax_amount'].tolist()
+    retirement = amounts['retirement_amount'].tolist()
+    net = amounts['net_salary'].tolist()
+    for i, (employee_id, _) in enumerate(employees):
+        if below_minimum[i]:
+            continue
+        yield Payroll(
+            reference_id=_reference_id(pay_period, employee_id),
+            employee_id=employee_id,
+            pay_period=pay_period,
+            gross_salary=from_cents(gross[i]),
+            total_allowances=allowances,
+            total_deductions=deductions,
+            tax_rate=TAX_RATE,
+            health_insurance=HEALTH_INSURANCE,
+            retirement_rate=RETIREMENT_RATE,
+            tax_amount=from_cents(tax[i]),
+            retirement_amount=from_cents(retirement[i]),
+            net_salary=from_cents(net[i]),
+            payment_status='pending',
+        )
+
+
+def run_payroll(pay_period, department=None, statuses=None, allowances=Decimal('0.00'),
+                deductions=Decimal('0.00'), chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    """
+    Create pending payroll rows for every matching employee for ``pay_period``.
+
+    Employees that already have a payroll row in the same month are skipped.
+    All rows are written in one transaction, ``chunk_size`` rows per INSERT.
+    Returns a :class:`PayrollRunResult`.
+    """
+    result = PayrollRunResult(pay_period)
+    started = time.perf_counter()
+
+    employees = Employee.objects.all()
+    if department:
+        employees = employees.filter(department=department)
+    if statuses:
+        employees = employees.filter(is_active__in=statuses)
+
+    with transaction.atomic():
+        existing = set(
+            Payroll.objects.filter(
+                pay_period__year=pay_period.year,
+                pay_period__month=pay_period.month,
+            ).values_list('employee_id', flat=True)
+        )
+
+        pending = []
+        departments = set()
+        rows = employees.order_by('id').values_list('id', 'salary', 'department')
+        for employee_id, salary, department in rows.iterator(chunk_size=chunk_size):
+            if employee_id in existing:
+                result.skipped_existing += 1
+                continue
+            pending.append((employee_id, salary))
+            departments.add(department)
+
+        batch = []
+        for payroll in build_payroll_rows(pending, pay_period, allowances, deductions, result):
+            batch.append(payroll)
+            if len(batch) >= chunk_size:
+                if not dry_run:
+                    Payroll.objects.bulk_create(batch)
+                result.created += len(batch)
+                batch = []
+        if batch:
+            if not dry_run:
+                Payroll.objects.bulk_create(batch)
+            result.created += len(batch)
+
+        # bulk_create skips the signals that maintain the summary table
+        if result.created and not dry_run:
+            refresh_buckets({bucket_key(department, pay_period, 'pending') for department in departments})
+
+    result.elapsed = time.perf_counter() - started
+    logger.info(
+        "Payroll run for %s: %d created, %d existing, %d below minimum net (%.1f rows/sec)",
+        pay_period, result.created, result.skipped_existing, result.skipped_min_net, result.rows_per_second,
+    )
+    return result
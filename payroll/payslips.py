@@ -0,0 +1,248 @@
+"""
+Payslip PDFs, one at a time or for a whole pay run.
+
+Styles and the static table formatting are built once per process
+(:func:`get_layout`) instead of once per payslip. Batches are rendered in
+chunks across a process pool: the parent reads payrolls from the database
+and the children only render, so they need no database connection. A batch
+is written either as one merged PDF or as a ZIP of per-employee PDFs.
+"""
+import logging
+import time
+import zipfile
+from dataclasses import dataclass
+from io import BytesIO
+
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus import PageBreak, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .company import get_company_name
+from .models import Payroll
+from .parallel_reports import map_parts, merge_pdfs
+from .summaries import month_start, next_month
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 200
+
+PAYSLIP_FORMATS = ('pdf', 'zip')
+
+EMPLOYEE_TABLE_COMMANDS = [
+    ('GRID', (0, 1), (-1, -1), 1, colors.black),
+    ('SPAN', (0, 0), (-1, 0)),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTWEIGHT', (0, 0), (-1, 0), 'BOLD'),
+    ('PADDING', (0, 0), (-1, -1), 6),
+    ('FONTWEIGHT', (3, 1), (3, 1), 'BOLD'),
+]
+
+SALARY_TABLE_COMMANDS = [
+    ('GRID', (0, 0), (-1, 0), 1, colors.black),
+    ('GRID', (0, -1), (-1, -1), 1, colors.black),
+    ('LINEBELOW', (0, 2), (-1, 2), 1, colors.black),
+    ('LINEBELOW', (0, -3), (-1, -3), 1, colors.black),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('BACKGROUND', (0, 5), (-1, 5), colors.lightgrey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('PADDING', (0, 0), (-1, -1), 6),
+    ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
+    ('FONTWEIGHT', (0, 0), (-1, 0), 'BOLD'),
+    ('FONTWEIGHT', (0, -1), (-1, -1), 'BOLD'),
+    ('NOSPLIT', (0, 0), (-1, -1)),
+]
+
+
+class PayslipLayout:
+    """Paragraph and table styles shared by every payslip a process renders."""
+
+    def __init__(self):
+        styles = getSampleStyleSheet()
+        self.title_style = styles['Heading1']
+        self.header_style = styles['Heading2']
+        self.normal_style = styles['Normal']
+        self.watermark_style = ParagraphStyle(
+            'watermark',
+            parent=self.normal_style,
+            textColor=colors.red,
+            fontSize=16,
+            alignment=1,  # Center alignment
+            spaceBefore=20,
+            spaceAfter=20
+        )
+        self.warning_style = ParagraphStyle('warning', parent=self.normal_style, textColor=colors.red)
+        # The payment status cell is green once paid and red until then
+        self.employee_table_styles = {
+            True: TableStyle(EMPLOYEE_TABLE_COMMANDS + [('TEXTCOLOR', (3, 1), (3, 1), colors.green)]),
+            False: TableStyle(EMPLOYEE_TABLE_COMMANDS + [('TEXTCOLOR', (3, 1), (3, 1), colors.red)]),
+        }
+        self.salary_table_style = TableStyle(SALARY_TABLE_COMMANDS)
+
+
+_layout = None
+
+
+def get_layout():
+    """The process-wide :class:`PayslipLayout`, built on first use."""
+    global _layout
+    if _layout is None:
+        _layout = PayslipLayout()
+    return _layout
+
+
+def generated_line(generated_by):
+    return f"Generated on: {timezone.now().strftime('%B %d, %Y at %I:%M %p')} by {generated_by}"
+
+
+def payslip_filename(payroll):
+    return f"payroll_{payroll.employee.last_name}_{payroll.pay_period.strftime('%Y_%m')}.pdf"
+
+
+def payslip_elements(payroll, company_name, footer, layout=None):
+    """Flowables for one payslip. ``payroll.employee`` should already be loaded."""
+    layout = layout or get_layout()
+    employee = payroll.employee
+    elements = [
+        Paragraph(company_name, layout.title_style),
+        Paragraph('Payroll Statement', layout.header_style),
+        Spacer(1, 20),
+    ]
+
+    # Employee information table
+    employee_data = [
+        ['Employee Information', '', '', ''],
+        ['Name:', f"{employee.first_name} {employee.last_name}", 'Payment Status:',
+         f"{payroll.payment_status_display.upper()}" if not payroll.is_paid else 'PAID'],
+        ['Employee ID:', str(employee.id), 'Pay Period:',
+         payroll.pay_period.strftime("%B %d, %Y")],
+        ['Status:', payroll.payment_status_display, 'Payment Date:',
+         payroll.payment_date.strftime("%B %d, %Y") if payroll.payment_date else 'Pending']
+    ]
+    employee_table = Table(employee_data, colWidths=[100, 150, 100, 150])
+    employee_table.setStyle(layout.employee_table_styles[payroll.is_paid])
+    elements.append(employee_table)
+    elements.append(Spacer(1, 20))
+
+    # Salary breakdown table
+    salary_data = [
+        ['Earnings & Deductions', 'Amount'],
+        ['Basic Salary', f"KSh {payroll.gross_salary:,.2f}"],
+        ['Allowances', f"KSh {payroll.total_allowances:,.2f}"],
+        ['Subtotal (Gross)', f"KSh {(payroll.gross_salary + payroll.total_allowances):,.2f}"],
+        ['', ''],
+        ['Deductions:', ''],
+        ['Tax ({:.1f}%)'.format(float(payroll.tax_rate)), f"KSh {payroll.tax_amount:,.2f}"],
+        ['Health Insurance', f"KSh {payroll.health_insurance:,.2f}"],
+        ['Retirement ({:.1f}%)'.format(float(payroll.retirement_rate)), f"KSh {payroll.retirement_amount:,.2f}"],
+        ['Other Deductions', f"KSh {payroll.total_deductions:,.2f}"],
+        ['Total Deductions', f"KSh {(payroll.tax_amount + payroll.health_insurance + payroll.retirement_amount + payroll.total_deductions):,.2f}"],
+        ['', ''],
+        ['Net Salary', f"KSh {payroll.net_salary:,.2f}"]
+    ]
+    salary_table = Table(salary_data, colWidths=[300, 200])
+    salary_table.setStyle(layout.salary_table_style)
+    elements.append(salary_table)
+
+    # Footer
+    elements.append(Spacer(1, 30))
+    elements.append(Paragraph(footer, layout.normal_style))
+
+    if not payroll.is_paid:
+        # Add a prominent watermark
+        elements.append(Paragraph("*** DRAFT - NOT YET PAID ***", layout.watermark_style))
+        elements.append(Paragraph("*** This is not a payment confirmation ***", layout.warning_style))
+
+    return elements
+
+
+def build_pdf(elements):
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter)
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def render_payslip(payroll, company_name, footer):
+    """A single payslip as PDF bytes."""
+    return build_pdf(payslip_elements(payroll, company_name, footer))
+
+
+def render_payslip_chunk(part):
+    """
+    Renders a chunk of payrolls. Returns one multi-page PDF for the ``pdf``
+    format, or a list of ``(filename, pdf)`` pairs for ``zip``.
+    """
+    payrolls, output_format, company_name, footer = part
+    if output_format == 'zip':
+        return [
+            (f"{payroll.employee.id}_{payslip_filename(payroll)}", render_payslip(payroll, company_name, footer))
+            for payroll in payrolls
+        ]
+
+    elements = []
+    for payroll in payrolls:
+        if elements:
+            elements.append(PageBreak())
+        elements.extend(payslip_elements(payroll, company_name, footer))
+    return build_pdf(elements)
+
+
+@dataclass
+class PayslipBatchResult:
+    count: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def payslips_per_second(self):
+        return self.count / self.elapsed if self.elapsed else 0.0
+
+
+def render_payslips(payrolls, output, output_format='pdf', generated_by='system', workers=1,
+                    chunk_size=DEFAULT_CHUNK_SIZE, company_name=None):
+    """
+    Renders ``payrolls`` (model instances with their employee loaded) into
+    the binary file object ``output`` as one PDF or a ZIP of PDFs.
+    """
+    if output_format not in PAYSLIP_FORMATS:
+        raise ValueError(f"Unsupported payslip format: {output_format}")
+
+    started = time.perf_counter()
+    company_name = company_name or get_company_name()
+    footer = generated_line(generated_by)
+
+    payrolls = list(payrolls)
+    chunks = [
+        (payrolls[i:i + chunk_size], output_format, company_name, footer)
+        for i in range(0, len(payrolls), chunk_size)
+    ]
+    rendered = map_parts(render_payslip_chunk, chunks, workers=workers)
+
+    if output_format == 'zip':
+        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for chunk in rendered:
+                for filename, pdf in chunk:
+                    archive.writestr(filename, pdf)
+    elif rendered:
+        output.write(merge_pdfs(rendered))
+
+    result = PayslipBatchResult(count=len(payrolls), elapsed=time.perf_counter() - started)
+    logger.info(
+        "Rendered %s payslips in %.1fs (%.1f/sec)",
+        result.count, result.elapsed, result.payslips_per_second,
+    )
+    return result
+
+
+def pay_run_payrolls(pay_period, department=None):
+    """Payrolls of the pay run for ``pay_period``'s month, ready for rendering."""
+    start = month_start(pay_period)
+    payrolls = Payroll.objects.filter(
+        pay_period__gte=start, pay_period__lt=next_month(start)
+    ).select_related('employee').order_by('employee__last_name', 'employee__first_name', 'id')
+    if department:
+        payrolls = payrolls.filter(employee__department=department)
+    return payrolls
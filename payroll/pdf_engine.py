@@ -0,0 +1,400 @@
+"""
+Native ReportLab engine for the summary PDF reports.
+
+Renders the same context the ``payroll/pdf_templates`` templates receive,
+without the HTML round trip through xhtml2pdf. Long row lists go through
+:class:`StreamingTable`, which pulls rows from a queryset iterator one page
+at a time and lays each page out as its own fixed-height table. Reports
+with a block per employee go through :class:`StreamingSections`, which lays
+out one block at a time. Layout cost is linear in the number of rows and
+only a page of rows is held in memory.
+"""
+from io import BytesIO
+from itertools import islice
+from xml.sax.saxutils import escape
+
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.platypus.doctemplate import NullActionFlowable
+from reportlab.platypus import Flowable, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from .models import Employee, Payroll
+
+# Queryset rows fetched per database round trip
+FETCH_CHUNK_SIZE = 2000
+
+ROW_HEIGHT = 16
+PAGE_MARGIN = 36
+
+FONT = 'Helvetica'
+BOLD_FONT = 'Helvetica-Bold'
+FONT_SIZE = 8
+# Table's default left plus right cell padding
+CELL_PADDING = 12
+ELLIPSIS = '\u2026'
+
+HEADER_BACKGROUND = colors.HexColor('#f5f5f5')
+TOTAL_BACKGROUND = colors.HexColor('#f9f9f9')
+GRID_COLOR = colors.HexColor('#dddddd')
+
+BASE_TABLE_COMMANDS = [
+    ('FONTNAME', (0, 0), (-1, -1), FONT),
+    ('FONTSIZE', (0, 0), (-1, -1), FONT_SIZE),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ('GRID', (0, 0), (-1, -1), 0.5, GRID_COLOR),
+    ('BACKGROUND', (0, 0), (-1, 0), HEADER_BACKGROUND),
+    ('FONTNAME', (0, 0), (-1, 0), BOLD_FONT),
+]
+
+TOTAL_ROW_COMMANDS = [
+    ('BACKGROUND', (0, -1), (-1, -1), TOTAL_BACKGROUND),
+    ('FONTNAME', (0, -1), (-1, -1), BOLD_FONT),
+]
+
+_styles = None
+
+
+def make_table(data, col_widths, total=False):
+    """A table of ``data`` with a shaded header row, and a bold total row last if ``total``."""
+    commands = list(BASE_TABLE_COMMANDS)
+    if total:
+        commands += TOTAL_ROW_COMMANDS
+    return Table(data, colWidths=col_widths, repeatRows=1, style=TableStyle(commands))
+
+
+def get_styles():
+    """Paragraph styles, built once per process."""
+    global _styles
+    if _styles is None:
+        sample = getSampleStyleSheet()
+        _styles = {
+            'title': ParagraphStyle('ReportTitle', parent=sample['Heading1'], alignment=TA_CENTER),
+            'subtitle': ParagraphStyle('ReportSubtitle', parent=sample['Normal'], alignment=TA_CENTER),
+            'heading': sample['Heading2'],
+            'subheading': sample['Heading3'],
+            'normal': sample['Normal'],
+            'footer': ParagraphStyle('ReportFooter', parent=sample['Normal'], alignment=TA_CENTER, fontSize=8),
+        }
+    return _styles
+
+
+def money(value):
+    return f"KSh {value or 0:.2f}"
+
+
+def percent(part, whole):
+    return f"{(part or 0) / whole * 100:.1f}%" if whole else "0.0%"
+
+
+def fit_text(text, width, font=FONT, size=FONT_SIZE):
+    """``text`` cut short with an ellipsis so it fits in ``width`` points."""
+    text = str(text)
+    if stringWidth(text, font, size) <= width:
+        return text
+    # Longest prefix that fits together with the ellipsis
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if stringWidth(text[:middle] + ELLIPSIS, font, size) <= width:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low].rstrip() + ELLIPSIS
+
+
+class StreamingTable(Flowable):
+    """
+    A table whose rows come from an iterator.
+
+    Each time the frame runs out of room the table splits off a page-sized
+    :class:`Table` (header row repeated) and a remainder that carries on
+    with the same iterator, so rows are only materialised a page at a time.
+    Rows have a fixed height, so text too wide for its column is cut short
+    with an ellipsis rather than wrapped.
+    """
+
+    def __init__(self, headers, rows, col_widths, total_row=None, buffer=None):
+        super().__init__()
+        self.headers = headers
+        self.rows = iter(rows)
+        self.col_widths = col_widths
+        self.total_row = total_row
+        self.buffer = buffer or []
+
+    def _fill(self, count):
+        while len(self.buffer) < count:
+            try:
+                self.buffer.append(next(self.rows))
+            except StopIteration:
+                break
+
+    def _capacity(self, avail_height):
+        # Body rows that fit under the header row
+        return int(avail_height // ROW_HEIGHT) - 1
+
+    def _fit(self, row, font=FONT):
+        return [fit_text(cell, width - CELL_PADDING, font) for cell, width in zip(row, self.col_widths)]
+
+    def _table(self, rows, total_row=None):
+        data = [self._fit(self.headers, BOLD_FONT)] + [self._fit(row) for row in rows]
+        commands = list(BASE_TABLE_COMMANDS)
+        if total_row is not None:
+            data.append(self._fit(total_row, BOLD_FONT))
+            commands += TOTAL_ROW_COMMANDS
+        return Table(data, colWidths=self.col_widths, rowHeights=ROW_HEIGHT, style=TableStyle(commands))
+
+    def wrap(self, availWidth, availHeight):
+        self._fill(self._capacity(availHeight) + 1)
+        row_count = len(self.buffer) + (1 if self.total_row is not None else 0)
+        self.width = sum(self.col_widths)
+        self.height = (row_count + 1) * ROW_HEIGHT
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        capacity = self._capacity(availHeight)
+        if capacity < 1:
+            return []
+        self._fill(capacity + 1)
+        page = self._table(self.buffer[:capacity])
+        rest = StreamingTable(self.headers, self.rows, self.col_widths, self.total_row, self.buffer[capacity:])
+        return [page, rest]
+
+    def draw(self):
+        table = self._table(self.buffer, self.total_row)
+        table.wrapOn(self.canv, self.width, self.height)
+        table.drawOn(self.canv, 0, 0)
+
+
+class StreamingSections(Flowable):
+    """
+    A run of report sections whose content comes from an iterator.
+
+    ``render(section)`` returns the flowables of one section. The sections
+    are only rendered as layout reaches them: while any are left this
+    flowable reports more height than the frame has, so platypus asks it to
+    split, and it splits into the next section's flowables followed by
+    itself.
+    """
+
+    def __init__(self, sections, render):
+        super().__init__()
+        self.sections = iter(sections)
+        self.render = render
+        self.pending = []
+
+    def _has_next(self):
+        if not self.pending:
+            self.pending = list(islice(self.sections, 1))
+        return bool(self.pending)
+
+    def wrap(self, availWidth, availHeight):
+        if not self._has_next():
+            return 0, 0
+        return availWidth, availHeight + 1
+
+    def split(self, availWidth, availHeight):
+        if not self._has_next():
+            return []
+        # A no-op lead flowable puts the whole section back on the story,
+        # so its first flowable can still move on to the next page
+        return [NullActionFlowable(), *self.render(self.pending.pop()), self]
+
+    def draw(self):
+        pass
+
+
+class ReportPDF:
+    """Title block, body flowables and footer of one summary report."""
+
+    def __init__(self, title, context):
+        self.styles = get_styles()
+        self.buffer = BytesIO()
+        self.doc = SimpleDocTemplate(
+            self.buffer, pagesize=A4, title=title,
+            leftMargin=PAGE_MARGIN, rightMargin=PAGE_MARGIN,
+            topMargin=PAGE_MARGIN, bottomMargin=PAGE_MARGIN,
+        )
+        self.width = self.doc.width
+        self.generated_date = context['generated_date']
+        # Parts of a merged report leave the title block to the first part
+        # and the footer to the last
+        self.footer = not context.get('omit_footer')
+        self.elements = []
+        if not context.get('omit_header'):
+            self.title_block(title, context)
+
+    def title_block(self, title, context):
+        self.elements += [
+            Paragraph(escape(title), self.styles['title']),
+            Paragraph(
+                f"Period: {context['start_date'].strftime('%B %d, %Y')} - {context['end_date'].strftime('%B %d, %Y')}",
+                self.styles['subtitle'],
+            ),
+        ]
+        department = context.get('department')
+        if department and department != 'All Departments':
+            self.elements.append(Paragraph(f"Department: {escape(department)}", self.styles['subtitle']))
+        self.elements.append(Spacer(1, 12))
+
+    def columns(self, *fractions):
+        return [self.width * fraction for fraction in fractions]
+
+    def paragraph(self, text, style='normal'):
+        self.elements.append(Paragraph(escape(text), self.styles[style]))
+
+    def table(self, data, col_widths, total=False):
+        self.elements.append(make_table(data, col_widths, total))
+        self.elements.append(Spacer(1, 12))
+
+    def streaming_table(self, headers, rows, col_widths, total_row=None):
+        self.elements.append(StreamingTable(headers, rows, col_widths, total_row))
+        self.elements.append(Spacer(1, 12))
+
+    def streaming_sections(self, sections, render):
+        self.elements.append(StreamingSections(sections, render))
+
+    def build(self):
+        if self.footer:
+            self.elements.append(Spacer(1, 12))
+            self.elements.append(Paragraph(
+                f"Generated on: {self.generated_date.strftime('%B %d, %Y %H:%M')}", self.styles['footer'],
+            ))
+        self.doc.build(self.elements)
+        return self.buffer.getvalue()
+
+
+def _payment_statuses():
+    return dict(Payroll.PAYMENT_STATUS_CHOICES)
+
+
+def payroll_report(context):
+    pdf = ReportPDF('Payroll Report', context)
+    departments = dict(Employee.DEPARTMENT_CHOICES)
+    statuses = _payment_statuses()
+    rows = (
+        context['payrolls']
+        .order_by('employee__first_name', 'employee__last_name', 'pay_period', 'id')
+        .values_list(
+            'employee__first_name', 'employee__last_name', 'employee__department', 'pay_period',
+            'gross_salary', 'total_deductions', 'net_salary', 'payment_status',
+        )
+        .iterator(chunk_size=FETCH_CHUNK_SIZE)
+    )
+    pdf.streaming_table(
+        ['Employee', 'Department', 'Pay Period', 'Gross Salary', 'Deductions', 'Net Salary', 'Status'],
+        (
+            [f"{first} {last}", departments.get(department, ''), pay_period.strftime('%b %Y'),
+             money(gross), money(deductions), money(net), statuses.get(status, status)]
+            for first, last, department, pay_period, gross, deductions, net, status in rows
+        ),
+        pdf.columns(0.22, 0.14, 0.1, 0.15, 0.14, 0.15, 0.1),
+        total_row=['Total', '', '', money(context['total_gross']), money(context['total_deductions']),
+                   money(context['total_net']), ''],
+    )
+    return pdf.build()
+
+
+def tax_report(context):
+    pdf = ReportPDF('Tax Deduction Report', context)
+    total_gross = context['total_gross']
+
+    pdf.paragraph('Tax Summary', 'heading')
+    pdf.table([
+        ['Description', 'Amount', '% of Gross'],
+        ['Total Gross Income', money(total_gross), '100%'],
+        ['Total Tax Deducted', money(context['total_tax']), percent(context['total_tax'], total_gross)],
+        ['Total Net Income', money(context['total_net']), percent(context['total_net'], total_gross)],
+    ], pdf.columns(0.4, 0.35, 0.25))
+
+    pdf.paragraph('Employee Tax Details', 'heading')
+    departments = dict(Employee.DEPARTMENT_CHOICES)
+    rows = (
+        context['employee_tax_data']
+        .values_list('first_name', 'last_name', 'department', 'gross', 'tax_rate', 'tax', 'net')
+        .iterator(chunk_size=FETCH_CHUNK_SIZE)
+    )
+    pdf.streaming_table(
+        ['Employee', 'Department', 'Gross Income', 'Tax Rate', 'Tax Amount', 'Net Income'],
+        (
+            [f"{first} {last}", departments.get(department, ''), money(gross),
+             f"{tax_rate or 0:.1f}%", money(tax), money(net)]
+            for first, last, department, gross, tax_rate, tax, net in rows
+        ),
+        pdf.columns(0.24, 0.16, 0.16, 0.1, 0.17, 0.17),
+    )
+    return pdf.build()
+
+
+def employee_report(context):
+    pdf = ReportPDF('Employee Performance Report', context)
+    styles = pdf.styles
+    columns = pdf.columns(0.2, 0.2, 0.2, 0.2, 0.2)
+    metric_columns = pdf.columns(0.5, 0.5)
+
+    def employee_section(data):
+        return [
+            Paragraph(escape(f"{data['first_name']} {data['last_name']}"), styles['heading']),
+            Paragraph(escape(f"Department: {data['department']}"), styles['normal']),
+            make_table([
+                ['Pay Period', 'Gross Salary', 'Deductions', 'Net Salary', 'Status'],
+                *(
+                    [payroll['pay_period'].strftime('%b %Y'), money(payroll['gross_salary']),
+                     money(payroll['total_deductions']), money(payroll['net_salary']), payroll['status']]
+                    for payroll in data['payrolls']
+                ),
+                ['Period Total', money(data['total_gross']), money(data['total_deductions']),
+                 money(data['total_net']), ''],
+            ], columns, total=True),
+            Spacer(1, 12),
+            Paragraph('Performance Metrics', styles['subheading']),
+            make_table([
+                ['Metric', 'Value'],
+                ['Average Monthly Gross', money(data['avg_gross'])],
+                ['Average Monthly Net', money(data['avg_net'])],
+            ], metric_columns),
+            Spacer(1, 12),
+        ]
+
+    pdf.streaming_sections(context['employee_data'], employee_section)
+    return pdf.build()
+
+
+def department_report(context):
+    pdf = ReportPDF('Department Summary Report', context)
+    active_statuses = dict(Employee.ACTIVE_STATUS)
+    columns = pdf.columns(0.26, 0.3, 0.16, 0.16, 0.12)
+
+    for dept_name, dept_data in context['departments'].items():
+        pdf.paragraph(dept_name, 'heading')
+        pdf.paragraph(f"Total Employees: {dept_data['employee_count']}")
+        rows = (
+            dept_data['payrolls']
+            .order_by('employee__first_name', 'employee__last_name', 'pay_period', 'id')
+            .values_list(
+                'employee__first_name', 'employee__last_name', 'employee__email',
+                'gross_salary', 'net_salary', 'employee__is_active',
+            )
+            .iterator(chunk_size=FETCH_CHUNK_SIZE)
+        )
+        pdf.streaming_table(
+            ['Employee', 'Email', 'Gross Salary', 'Net Salary', 'Status'],
+            (
+                [f"{first} {last}", email, money(gross), money(net), active_statuses.get(status, status)]
+                for first, last, email, gross, net, status in rows
+            ),
+            columns,
+            total_row=['Department Total', '', money(dept_data['total_gross']), money(dept_data['total_net']), ''],
+        )
+    return pdf.build()
+
+
+# Template each renderer replaces
+RENDERERS = {
+    'payroll/pdf_templates/payroll_report.html': payroll_report,
+    'payroll/pdf_templates/tax_report.html': tax_report,
+    'payroll/pdf_templates/employee_report.html': employee_report,
+    'payroll/pdf_templates/department_report.html': department_report,
+}
@@ -1,218 +1,250 @@
-from django.shortcuts import render, redirect, get_object_or_404
-from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.core.files.base import ContentFile
 from django.template.loader import get_template
 from xhtml2pdf import pisa
 from io import BytesIO
 from datetime import datetime
+from itertools import chain, groupby
+from operator import itemgetter
+from django.conf import settings
+from django.db.models import Count, F, Sum, Window
+from . import pdf_engine
 from .models import Payroll, Employee
+from .parallel_reports import map_parts, merge_pdfs, report_workers, split_parts, with_ends
+from .report_data import employee_tax_totals, report_payrolls, report_totals
+from .summaries import department_employee_counts, department_totals
+
+
+class PDFRenderError(Exception):
+    """Raised when xhtml2pdf cannot render a report template."""
+
 
 def render_to_pdf(template_src, context_dict={}):
+    """Renders a template to PDF bytes, or returns None if rendering failed."""
     template = get_template(template_src)
     html = template.render(context_dict)
     result = BytesIO()
     pdf = pisa.pisaDocument(BytesIO(html.encode("ISO-8859-1")), result)
     if not pdf.err:
-        return HttpResponse(result.getvalue(), content_type='application/pdf')
+        return result.getvalue()
     return None
 
-@login_required
-def generate_payroll_pdf_report(request, start_date, end_date, department=None):
-    # Convert string dates to datetime objects
-    if isinstance(start_date, str):
-        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-    if isinstance(end_date, str):
-        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
 
-    # Query payroll records
-    payrolls = Payroll.objects.filter(
-        pay_period__range=[start_date, end_date]
-    ).select_related('employee')
+def department_display(department):
+    if not department:
+        return 'All Departments'
+    return dict(Employee.DEPARTMENT_CHOICES).get(department, department)
+
+
+def render_report_pdf(report, template_src, context):
+    """
+    Renders ``template_src`` for ``report`` and returns the PDF bytes.
+
+    Uses the native ReportLab renderer for the template unless
+    ``REPORT_PDF_ENGINE`` is ``'html'``, which renders through xhtml2pdf.
+    """
+    context.update({
+        'start_date': report.period_start,
+        'end_date': report.period_end,
+        'generated_date': datetime.now(),
+    })
+    renderer = pdf_engine.RENDERERS.get(template_src)
+    if renderer and settings.REPORT_PDF_ENGINE == 'reportlab':
+        return renderer(context)
+
+    pdf = render_to_pdf(template_src, context)
+    if pdf is None:
+        raise PDFRenderError("Error Rendering PDF")
+    return pdf
+
+
+def save_pdf_to_report(report, template_src, context):
+    """Renders ``template_src`` and stores the PDF in ``report.file``."""
+    pdf = render_report_pdf(report, template_src, context)
+    report.file.save(report.name, ContentFile(pdf), save=False)
+    return True
+
+
+def save_pdf_parts_to_report(report, parts):
+    """Merges rendered parts into one PDF in ``report.file``. Returns False if every part was empty."""
+    parts = [part for part in parts if part]
+    if not parts:
+        return False
+    report.file.save(report.name, ContentFile(merge_pdfs(parts)), save=False)
+    return True
+
 
-    if department and department != 'all':
-        payrolls = payrolls.filter(employee__department=department)
+def build_payroll_pdf(report):
+    """Writes the payroll PDF for ``report``. Returns False if there is no data."""
+    payrolls = report_payrolls(report)
+    totals = report_totals(payrolls)
 
-    if not payrolls.exists():
-        messages.warning(request, "No payroll records found for the selected criteria.")
-        return redirect('reports')
+    if not totals['payroll_count']:
+        return False
 
-    # Prepare context for PDF
     context = {
-        'payrolls': payrolls,
-        'start_date': start_date,
-        'end_date': end_date,
-        'department': dict(Employee.DEPARTMENT_CHOICES).get(department) if department != 'all' else 'All Departments',
-        'generated_date': datetime.now()
+        'payrolls': payrolls.select_related('employee'),
+        'department': department_display(report.department),
+        **totals,
     }
-    
-    # Generate PDF
-    pdf = render_to_pdf('payroll/pdf_templates/payroll_report.html', context)
-    if pdf:
-        filename = f"Payroll_Report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
-        if department and department != 'all':
-            filename += f"_{department}"
-        filename += ".pdf"
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-    return HttpResponse("Error Rendering PDF", status=400)
-
-@login_required
-def generate_department_pdf_report(request, start_date, end_date, department=None):
-    if isinstance(start_date, str):
-        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-    if isinstance(end_date, str):
-        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+    return save_pdf_to_report(report, 'payroll/pdf_templates/payroll_report.html', context)
 
+
+def part_context(first, last):
+    """Context that leaves the title block to the first part of a report and the footer to the last."""
+    return {'omit_header': not first, 'omit_footer': not last}
+
+
+def render_department_part(part):
+    """Renders the department report section for one group of departments."""
+    report, department_rows, first, last = part
     departments = {}
-    department_list = [department] if department and department != 'all' else [d[0] for d in Employee.DEPARTMENT_CHOICES]
-    
-    for dept in department_list:
-        employees = Employee.objects.filter(department=dept)
-        if employees.exists():
-            dept_payrolls = Payroll.objects.filter(
-                employee__in=employees,
-                pay_period__range=[start_date, end_date]
-            ).select_related('employee')
-            
-            if dept_payrolls.exists():
-                departments[dict(Employee.DEPARTMENT_CHOICES)[dept]] = {
-                    'payrolls': dept_payrolls,
-                    'total_gross': sum(p.gross_salary for p in dept_payrolls),
-                    'total_net': sum(p.net_salary for p in dept_payrolls),
-                    'employee_count': employees.count()
-                }
-
-    if not departments:
-        messages.warning(request, "No department data found for the selected criteria.")
-        return redirect('reports')
+    for dept, total_gross, total_net, employee_count in department_rows:
+        departments[dict(Employee.DEPARTMENT_CHOICES)[dept]] = {
+            'payrolls': Payroll.objects.filter(
+                employee__department=dept,
+                pay_period__range=[report.period_start, report.period_end]
+            ).select_related('employee'),
+            'total_gross': total_gross,
+            'total_net': total_net,
+            'employee_count': employee_count
+        }
 
     context = {
         'departments': departments,
-        'start_date': start_date,
-        'end_date': end_date,
-        'generated_date': datetime.now()
+        **part_context(first, last),
     }
-    
-    pdf = render_to_pdf('payroll/pdf_templates/department_report.html', context)
-    if pdf:
-        filename = f"Department_Report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
-        if department and department != 'all':
-            filename += f"_{department}"
-        filename += ".pdf"
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-    return HttpResponse("Error Rendering PDF", status=400)
-
-@login_required
-def generate_employee_pdf_report(request, start_date, end_date, department=None):
-    if isinstance(start_date, str):
-        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-    if isinstance(end_date, str):
-        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-
-    employees = Employee.objects.all()
-    if department and department != 'all':
-        employees = employees.filter(department=department)
-    
-    employee_data = []
-    for employee in employees:
-        payrolls = Payroll.objects.filter(
-            employee=employee,
-            pay_period__range=[start_date, end_date]
+    return render_report_pdf(report, 'payroll/pdf_templates/department_report.html', context)
+
+
+def build_department_pdf(report):
+    """
+    Writes the department PDF for ``report``. Returns False if there is no data.
+
+    Each department is rendered as its own part, across
+    ``REPORT_PARALLEL_WORKERS`` processes, and the parts are merged.
+    """
+    department_list = [report.department] if report.department else [d[0] for d in Employee.DEPARTMENT_CHOICES]
+
+    # Totals come from the department/month summary table
+    totals = department_totals(report.period_start, report.period_end)
+    headcounts = department_employee_counts(report.period_start, report.period_end, department=report.department)
+
+    department_rows = [
+        (dept, totals[dept]['total_gross'], totals[dept]['total_net'], headcounts.get(dept, 0))
+        for dept in department_list
+        if dept in totals
+    ]
+    if not department_rows:
+        return False
+
+    groups = split_parts(department_rows, report_workers(len(department_rows)))
+    parts = map_parts(render_department_part, [
+        (report, group, first, last) for group, first, last in with_ends(groups)
+    ])
+    return save_pdf_parts_to_report(report, parts)
+
+
+def employee_report_data(report, id_range=None):
+    """
+    Per-employee sections for the employee report, streamed from one query
+    over the period's payrolls in employee order. Window sums put each
+    employee's totals on every one of their rows, so only one employee's
+    payrolls are held at a time. ``id_range`` limits the employees to an
+    inclusive (first, last) id shard.
+    """
+    payrolls = report_payrolls(report)
+    if id_range:
+        payrolls = payrolls.filter(employee__id__range=id_range)
+
+    per_employee = {'partition_by': F('employee_id')}
+    rows = (
+        payrolls
+        .annotate(
+            period_count=Window(Count('id'), **per_employee),
+            period_gross=Window(Sum('gross_salary'), **per_employee),
+            period_net=Window(Sum('net_salary'), **per_employee),
+            period_deductions=Window(Sum('total_deductions'), **per_employee),
         )
-        if payrolls.exists():
-            total_gross = sum(p.gross_salary for p in payrolls)
-            total_net = sum(p.net_salary for p in payrolls)
-            employee_data.append({
-                'employee': employee,
-                'payrolls': payrolls,
-                'total_gross': total_gross,
-                'total_net': total_net,
-                'avg_gross': total_gross / payrolls.count(),
-                'avg_net': total_net / payrolls.count()
-            })
-
-    if not employee_data:
-        messages.warning(request, "No employee data found for the selected criteria.")
-        return redirect('reports')
+        .order_by('employee_id', 'pay_period', 'id')
+        .values(
+            'employee_id', 'employee__first_name', 'employee__last_name', 'employee__department',
+            'pay_period', 'gross_salary', 'total_deductions', 'net_salary', 'payment_status',
+            'period_count', 'period_gross', 'period_net', 'period_deductions',
+        )
+        .iterator(chunk_size=pdf_engine.FETCH_CHUNK_SIZE)
+    )
+
+    departments = dict(Employee.DEPARTMENT_CHOICES)
+    statuses = dict(Payroll.PAYMENT_STATUS_CHOICES)
+    for _, employee_rows in groupby(rows, key=itemgetter('employee_id')):
+        employee_rows = list(employee_rows)
+        for row in employee_rows:
+            row['status'] = statuses.get(row['payment_status'], row['payment_status'])
+        first = employee_rows[0]
+        yield {
+            'first_name': first['employee__first_name'],
+            'last_name': first['employee__last_name'],
+            'department': departments.get(first['employee__department'], ''),
+            'payrolls': employee_rows,
+            'total_gross': first['period_gross'],
+            'total_net': first['period_net'],
+            'total_deductions': first['period_deductions'],
+            'avg_gross': first['period_gross'] / first['period_count'],
+            'avg_net': first['period_net'] / first['period_count'],
+        }
+
+
+def render_employee_part(part):
+    """Renders the employee report section for one shard of employees. Returns None if it has no data."""
+    report, id_range, first, last = part
+    employee_data = employee_report_data(report, id_range)
+    first_section = next(employee_data, None)
+
+    if first_section is None:
+        return None
 
     context = {
-        'employee_data': employee_data,
-        'start_date': start_date,
-        'end_date': end_date,
-        'department': dict(Employee.DEPARTMENT_CHOICES).get(department) if department != 'all' else 'All Departments',
-        'generated_date': datetime.now()
+        'employee_data': chain([first_section], employee_data),
+        'department': department_display(report.department),
+        **part_context(first, last),
     }
-    
-    pdf = render_to_pdf('payroll/pdf_templates/employee_report.html', context)
-    if pdf:
-        filename = f"Employee_Report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
-        if department and department != 'all':
-            filename += f"_{department}"
-        filename += ".pdf"
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-    return HttpResponse("Error Rendering PDF", status=400)
-
-@login_required
-def generate_tax_pdf_report(request, start_date, end_date, department=None):
-    if isinstance(start_date, str):
-        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-    if isinstance(end_date, str):
-        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-
-    payrolls = Payroll.objects.filter(
-        pay_period__range=[start_date, end_date]
-    ).select_related('employee')
-
-    if department and department != 'all':
-        payrolls = payrolls.filter(employee__department=department)
-
-    if not payrolls.exists():
-        messages.warning(request, "No tax data found for the selected criteria.")
-        return redirect('reports')
-
-    # Calculate totals
-    total_gross = sum(p.gross_salary for p in payrolls)
-    total_tax = sum(p.tax_amount for p in payrolls)
-    total_net = sum(p.net_salary for p in payrolls)
-
-    employee_tax_data = {}
-    for payroll in payrolls:
-        emp_id = payroll.employee.id
-        if emp_id not in employee_tax_data:
-            employee_tax_data[emp_id] = {
-                'employee': payroll.employee,
-                'gross': 0,
-                'tax': 0,
-                'net': 0,
-                'tax_rate': payroll.tax_rate
-            }
-        employee_tax_data[emp_id]['gross'] += payroll.gross_salary
-        employee_tax_data[emp_id]['tax'] += payroll.tax_amount
-        employee_tax_data[emp_id]['net'] += payroll.net_salary
+    return render_report_pdf(report, 'payroll/pdf_templates/employee_report.html', context)
+
+
+def build_employee_pdf(report):
+    """
+    Writes the employee PDF for ``report``. Returns False if there is no data.
+
+    With more than one ``REPORT_PARALLEL_WORKERS`` the employees are split
+    into id ranges of ``REPORT_SHARD_SIZE`` that are rendered in parallel
+    and merged. Only employees paid in the period are sharded, so every
+    shard has rows and the first one carries the report's title block.
+    """
+    if settings.REPORT_PARALLEL_WORKERS <= 1:
+        return save_pdf_parts_to_report(report, [render_employee_part((report, None, True, True))])
+
+    employee_ids = list(
+        report_payrolls(report).order_by('employee_id').values_list('employee_id', flat=True).distinct()
+    )
+
+    workers = report_workers(len(employee_ids) // settings.REPORT_SHARD_SIZE + 1)
+    shards = split_parts(employee_ids, workers, settings.REPORT_SHARD_SIZE)
+    parts = map_parts(render_employee_part, [
+        (report, (shard[0], shard[-1]), first, last) for shard, first, last in with_ends(shards)
+    ])
+    return save_pdf_parts_to_report(report, parts)
+
+
+def build_tax_pdf(report):
+    """Writes the tax PDF for ``report``. Returns False if there is no data."""
+    totals = report_totals(report_payrolls(report))
+
+    if not totals['payroll_count']:
+        return False
 
     context = {
-        'employee_tax_data': employee_tax_data.values(),
-        'total_gross': total_gross,
-        'total_tax': total_tax,
-        'total_net': total_net,
-        'start_date': start_date,
-        'end_date': end_date,
-        'department': dict(Employee.DEPARTMENT_CHOICES).get(department) if department != 'all' else 'All Departments',
-        'generated_date': datetime.now()
+        'employee_tax_data': employee_tax_totals(report),
+        'department': department_display(report.department),
+        **totals,
     }
-    
-    pdf = render_to_pdf('payroll/pdf_templates/tax_report.html', context)
-    if pdf:
-        filename = f"Tax_Report_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
-        if department and department != 'all':
-            filename += f"_{department}"
-        filename += ".pdf"
-        response = HttpResponse(pdf, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-    return HttpResponse("Error Rendering PDF", status=400)
+    return save_pdf_to_report(report, 'payroll/pdf_templates/tax_report.html', context)
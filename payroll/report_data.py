@@ -0,0 +1,62 @@
+"""
+Report rows and totals shared by the PDF and Excel report builders.
+
+Totals are computed with database aggregates once per report and handed to
+templates and workbooks as plain values, so no report sums its rows in
+Python.
+"""
+from decimal import Decimal
+
+from django.db.models import Count, Max, Q, Sum
+
+from .models import Employee, Payroll
+
+# Context/total name -> Payroll column it sums
+REPORT_TOTAL_FIELDS = {
+    'total_gross': 'gross_salary',
+    'total_allowances': 'total_allowances',
+    'total_deductions': 'total_deductions',
+    'total_tax': 'tax_amount',
+    'total_net': 'net_salary',
+}
+
+
+def report_payrolls(report):
+    """Payroll rows covered by a report's period and department."""
+    payrolls = Payroll.objects.filter(pay_period__range=[report.period_start, report.period_end])
+    if report.department:
+        payrolls = payrolls.filter(employee__department=report.department)
+    return payrolls
+
+
+def report_totals(payrolls):
+    """
+    ``payroll_count`` and the ``total_*`` amounts for a payroll queryset,
+    in one aggregate query. Amounts are zero when there are no rows.
+    """
+    totals = payrolls.order_by().aggregate(
+        payroll_count=Count('id'),
+        **{name: Sum(field) for name, field in REPORT_TOTAL_FIELDS.items()},
+    )
+    for name in REPORT_TOTAL_FIELDS:
+        totals[name] = totals[name] or Decimal('0.00')
+    return totals
+
+
+def employee_tax_totals(report):
+    """
+    Employees in the tax report, annotated with their period's ``gross``,
+    ``tax``, ``net`` and ``tax_rate`` grouped in the database. The queryset
+    is lazy so the report can stream it.
+    """
+    period = Q(payrolls__pay_period__range=[report.period_start, report.period_end])
+    employees = Employee.objects.filter(period)
+    if report.department:
+        employees = employees.filter(department=report.department)
+
+    return employees.annotate(
+        gross=Sum('payrolls__gross_salary', filter=period),
+        tax=Sum('payrolls__tax_amount', filter=period),
+        net=Sum('payrolls__net_salary', filter=period),
+        tax_rate=Max('payrolls__tax_rate', filter=period),
+    ).order_by('id')
@@ -0,0 +1,272 @@
+"""
+Database-backed report job queue.
+
+``generate_report`` only creates a Report row in the ``queued`` state. Worker
+processes started with ``manage.py run_report_worker`` claim queued reports
+one at a time, build the file and record the outcome on the row, which the
+reports page polls through ``report_status``. No external broker is needed:
+claims are a conditional UPDATE on the status column, so any number of
+workers can share the table. While a worker builds a report it keeps
+moving ``started_at`` forward, and it records the outcome only if the row
+still carries its claim, so a report requeued or deleted meanwhile is never
+overwritten or recreated. Requests identical to a report already built (or
+in progress) at the current data version reuse that report.
+"""
+import hashlib
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.utils import timezone
+
+from .data_version import current_data_version
+from .excel_reports import (
+    build_department_excel,
+    build_employee_excel,
+    build_payroll_excel,
+    build_tax_excel,
+)
+from .models import Report
+from .pdf_reports import (
+    build_department_pdf,
+    build_employee_pdf,
+    build_payroll_pdf,
+    build_tax_pdf,
+)
+
+logger = logging.getLogger(__name__)
+
+REPORT_BUILDERS = {
+    ('payroll', 'excel'): build_payroll_excel,
+    ('tax', 'excel'): build_tax_excel,
+    ('employee', 'excel'): build_employee_excel,
+    ('department', 'excel'): build_department_excel,
+    ('payroll', 'pdf'): build_payroll_pdf,
+    ('tax', 'pdf'): build_tax_pdf,
+    ('employee', 'pdf'): build_employee_pdf,
+    ('department', 'pdf'): build_department_pdf,
+}
+
+REPORT_FILE_PREFIXES = {
+    'payroll': 'Payroll_Report',
+    'tax': 'Tax_Report',
+    'employee': 'Employee_Report',
+    'department': 'Department_Summary',
+}
+
+REPORT_FILE_EXTENSIONS = {
+    'excel': 'xlsx',
+    'pdf': 'pdf',
+}
+
+NO_DATA_MESSAGE = 'No data found for the selected criteria.'
+
+
+def report_file_name(report_type, report_format, start_date, end_date, department=None):
+    name = f"{REPORT_FILE_PREFIXES[report_type]}_{start_date.strftime('%Y%m%d')}_{end_date.strftime('%Y%m%d')}"
+    if department:
+        name += f"_{department}"
+    return f"{name}.{REPORT_FILE_EXTENSIONS[report_format]}"
+
+
+def report_cache_key(report_type, report_format, start_date, end_date, department, data_version):
+    """Identifies a report's contents: its parameters plus the data version it reads."""
+    parts = [report_type, report_format, start_date.isoformat(), end_date.isoformat(), department or '', str(data_version)]
+    return hashlib.sha256('|'.join(parts).encode()).hexdigest()
+
+
+def find_cached_report(cache_key):
+    """
+    A report with ``cache_key`` that is queued, being built, or generated
+    with its file still in storage. Returns None if there is none.
+    """
+    candidates = Report.objects.filter(
+        cache_key=cache_key, status__in=['queued', 'processing', 'generated'],
+    ).order_by('-generated_date', '-id')
+    for report in candidates:
+        if report.status != 'generated' or (report.file and report.file.storage.exists(report.file.name)):
+            return report
+    return None
+
+
+def enqueue_report(report_type, report_format, start_date, end_date, department=None, user=None):
+    """
+    Queue a Report for a worker to build, or reuse an identical one built
+    since the last data change. Returns ``(report, created)``. New reports
+    are built inline in eager mode.
+    """
+    data_version = current_data_version()
+    cache_key = report_cache_key(report_type, report_format, start_date, end_date, department, data_version)
+    cached = find_cached_report(cache_key)
+    if cached is not None:
+        return cached, False
+
+    report = Report.objects.create(
+        name=report_file_name(report_type, report_format, start_date, end_date, department),
+        type=report_type,
+        format=report_format,
+        period_start=start_date,
+        period_end=end_date,
+        department=department or None,
+        status='queued',
+        generated_by=user,
+        cache_key=cache_key,
+        data_version=data_version,
+    )
+    if settings.REPORT_QUEUE_EAGER:
+        claim_report(report)
+        run_report(report)
+    return report, True
+
+
+def claim_report(report):
+    """Move ``report`` from queued to processing. Returns False if another worker got it first."""
+    started_at = timezone.now()
+    claimed = Report.objects.filter(pk=report.pk, status='queued').update(
+        status='processing', started_at=started_at,
+    )
+    if claimed:
+        report.status = 'processing'
+        report.started_at = started_at
+    return bool(claimed)
+
+
+def claim_next_report():
+    """Claim the oldest queued report, or return None when the queue is empty."""
+    while True:
+        report = Report.objects.filter(status='queued').order_by('generated_date', 'id').first()
+        if report is None:
+            return None
+        if claim_report(report):
+            return report
+
+
+class Heartbeat:
+    """
+    Moves a claimed report's ``started_at`` forward every ``interval``
+    seconds from a background thread, so :func:`requeue_stale_reports` only
+    takes reports whose worker stopped. ``started_at`` is the stamp the row
+    carries while this worker still holds the claim.
+    """
+
+    def __init__(self, report, interval=None):
+        self.report_id = report.pk
+        self.started_at = report.started_at
+        self.interval = settings.REPORT_JOB_TIMEOUT / 4 if interval is None else interval
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def beat(self):
+        """Refresh the claim. Returns False once the report was requeued or deleted."""
+        now = timezone.now()
+        if not Report.objects.filter(pk=self.report_id, status='processing', started_at=self.started_at).update(
+            started_at=now,
+        ):
+            return False
+        self.started_at = now
+        return True
+
+    def _run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                if not self.beat():
+                    return
+        except Exception:
+            logger.exception("Heartbeat for report %s failed", self.report_id)
+        finally:
+            # The thread's own connection
+            connection.close()
+
+
+def run_report(report):
+    """
+    Build a claimed report and record whether it was generated or failed.
+    The outcome is dropped, with the file just written, if the report lost
+    its claim (requeued to another worker, or deleted) while it was built.
+    """
+    builder = REPORT_BUILDERS.get((report.type, report.format))
+    with Heartbeat(report) as heartbeat:
+        try:
+            if builder is None:
+                raise ValueError(f"Unsupported report: {report.type} ({report.format})")
+            if builder(report):
+                report.status = 'generated'
+                report.error_message = ''
+            else:
+                report.status = 'failed'
+                report.error_message = NO_DATA_MESSAGE
+        except Exception as e:
+            logger.error("Error generating report %s: %s", report.pk, e, exc_info=True)
+            report.status = 'failed'
+            report.error_message = str(e)
+    report.completed_at = timezone.now()
+    report.started_at = heartbeat.started_at
+    recorded = Report.objects.filter(pk=report.pk, status='processing', started_at=heartbeat.started_at).update(
+        status=report.status,
+        error_message=report.error_message,
+        completed_at=report.completed_at,
+        file=report.file.name or '',
+    )
+    if not recorded:
+        logger.warning("Report %s was requeued or deleted while it was built; discarding this build", report.pk)
+        if report.file:
+            report.file.delete(save=False)
+    return report
+
+
+def process_next_report():
+    """Claim and build one queued report. Returns it, or None if the queue was empty."""
+    report = claim_next_report()
+    if report is not None:
+        run_report(report)
+    return report
+
+
+def requeue_stale_reports(timeout=None):
+    """Return reports stuck in processing (e.g. after a worker crash) to the queue."""
+    timeout = settings.REPORT_JOB_TIMEOUT if timeout is None else timeout
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Report.objects.filter(status='processing', started_at__lt=cutoff).update(
+        status='queued', started_at=None,
+    )
+
+
+def run_worker(poll_interval=2.0, max_jobs=None, burst=False):
+    """
+    Process queued reports until stopped.
+
+    ``burst`` stops once the queue is empty; ``max_jobs`` stops after that
+    many reports. Returns the number of reports processed.
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info("Report worker %s started", worker)
+    processed = 0
+    last_requeue = 0.0
+    while max_jobs is None or processed < max_jobs:
+        close_old_connections()
+        if time.monotonic() - last_requeue > poll_interval * 30:
+            requeue_stale_reports()
+            last_requeue = time.monotonic()
+
+        report = process_next_report()
+        if report is None:
+            if burst:
+                break
+            time.sleep(poll_interval)
+            continue
+        processed += 1
+        logger.info("Report worker %s finished report %s (%s)", worker, report.pk, report.status)
+    return processed
@@ -0,0 +1,170 @@
+"""
+Indexed employee search.
+
+Terms match the start of any word in an employee's first name, last name or
+the part of their email before the @ ("jan do" finds "Jane Doe"). On SQLite
+the words live in the ``payroll_employee_search`` FTS5 table, kept in step
+with ``payroll_employee`` by triggers. On PostgreSQL a GIN index over the
+``simple`` tsvector of the same columns answers ``to_tsquery`` prefix
+queries. Other databases fall back to ``icontains``.
+
+Results whose first or last name starts with the first term rank first,
+then by name. :func:`install_search_index` is idempotent; it runs from the
+migration and again after every ``migrate``, because SQLite drops the
+triggers whenever a migration rebuilds the employee table.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Employee
+
+SEARCH_TABLE = 'payroll_employee_search'
+
+# Results per autocomplete request
+AUTOCOMPLETE_LIMIT = 20
+AUTOCOMPLETE_MAX_PAGE = 10
+
+# Only the part of the email before the @ is indexed: the domain is shared by
+# everyone and would make every employee match its first letters
+POSTGRES_DOCUMENT = "to_tsvector('simple', first_name || ' ' || last_name || ' ' || split_part(email, '@', 1))"
+SQLITE_EMAIL_NAME = "substr({0}.email, 1, instr({0}.email || '@', '@') - 1)"
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        first_name, last_name, email_name,
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON payroll_employee BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, first_name, last_name, email_name)
+        VALUES (new.id, new.first_name, new.last_name, {SQLITE_EMAIL_NAME.format('new')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON payroll_employee BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update
+        AFTER UPDATE OF first_name, last_name, email ON payroll_employee BEGIN
+        DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id;
+        INSERT INTO {SEARCH_TABLE}(rowid, first_name, last_name, email_name)
+        VALUES (new.id, new.first_name, new.last_name, {SQLITE_EMAIL_NAME.format('new')});
+    END""",
+]
+
+SQLITE_REBUILD = [
+    f"DELETE FROM {SEARCH_TABLE}",
+    f"""INSERT INTO {SEARCH_TABLE}(rowid, first_name, last_name, email_name)
+        SELECT id, first_name, last_name, {SQLITE_EMAIL_NAME.format('payroll_employee')} FROM payroll_employee""",
+]
+
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {SEARCH_TABLE}_update",
+    f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+]
+
+POSTGRES_INSTALL = [
+    f"CREATE INDEX IF NOT EXISTS employee_search_idx ON payroll_employee USING gin ({POSTGRES_DOCUMENT})",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS employee_search_idx",
+]
+
+
+def search_terms(text):
+    """Lower-cased words of a search box entry."""
+    return re.findall(r'\w+', (text or '').lower())
+
+
+def _sqlite_triggers(cursor):
+    cursor.execute(
+        "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'payroll_employee' "
+        "AND name LIKE %s",
+        [f'{SEARCH_TABLE}_%'],
+    )
+    return cursor.fetchone()[0]
+
+
+def install_search_index(connection):
+    """Creates the search index for ``connection`` if it is missing."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            if _sqlite_triggers(cursor) == len(SQLITE_INSTALL) - 1:
+                return
+            # Rows written while the triggers were missing are picked up by the rebuild
+            for statement in SQLITE_INSTALL + SQLITE_REBUILD:
+                cursor.execute(statement)
+        elif connection.vendor == 'postgresql':
+            for statement in POSTGRES_INSTALL:
+                cursor.execute(statement)
+
+
+def uninstall_search_index(connection):
+    statements = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def ensure_search_index(using='default', **kwargs):
+    """``post_migrate`` handler."""
+    install_search_index(connections[using])
+
+
+def _match_ids(vendor, terms):
+    """Subquery of the ids of employees matching every term."""
+    if vendor == 'sqlite':
+        # Each term is quoted and prefix-matched; \w+ terms contain no quotes
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [match])
+    query = ' & '.join(f'{term}:*' for term in terms)
+    return RawSQL(
+        f"SELECT id FROM payroll_employee WHERE {POSTGRES_DOCUMENT} @@ to_tsquery('simple', %s)", [query],
+    )
+
+
+def filter_employees(queryset, text):
+    """``queryset`` narrowed to employees matching the search box entry ``text``."""
+    terms = search_terms(text)
+    if not terms:
+        return queryset
+    vendor = connections[queryset.db].vendor
+    if vendor in ('sqlite', 'postgresql'):
+        return queryset.filter(id__in=_match_ids(vendor, terms))
+    for term in terms:
+        queryset = queryset.filter(
+            Q(first_name__icontains=term) | Q(last_name__icontains=term) | Q(email__icontains=term)
+        )
+    return queryset
+
+
+def rank_employees(queryset, text):
+    """Orders ``queryset`` with names starting with the first term first, then by name."""
+    terms = search_terms(text)
+    if not terms:
+        return queryset.order_by('first_name', 'last_name', 'id')
+    name_prefix = Q(first_name__istartswith=terms[0]) | Q(last_name__istartswith=terms[0])
+    return queryset.annotate(
+        search_rank=Case(When(name_prefix, then=Value(0)), default=Value(1), output_field=IntegerField()),
+    ).order_by('search_rank', 'first_name', 'last_name', 'id')
+
+
+def autocomplete_employees(text, page=1, limit=AUTOCOMPLETE_LIMIT):
+    """
+    ``(results, more)`` for one page of an employee picker: ``results`` are
+    ``{'id', 'text'}`` dicts and ``more`` says whether another page follows.
+    """
+    if not search_terms(text):
+        return [], False
+    page = min(max(page, 1), AUTOCOMPLETE_MAX_PAGE)
+    start = (page - 1) * limit
+    rows = list(
+        rank_employees(filter_employees(Employee.objects.all(), text), text)
+        .values_list('id', 'first_name', 'last_name')[start:start + limit + 1]
+    )
+    more = len(rows) > limit and page < AUTOCOMPLETE_MAX_PAGE
+    results = [{'id': pk, 'text': f"{first_name} {last_name}"} for pk, first_name, last_name in rows[:limit]]
+    return results, more
@@ -0,0 +1,122 @@
+"""
+Bulk settlement of pending payrolls.
+
+Marks every due pending row matching a filter as paid with one conditional
+``UPDATE ... WHERE payment_status = 'pending' AND pay_period <= today``
+instead of loading and saving each row. The matching rows are read (and
+locked, where the database supports it) first so every row gets an outcome.
+The UPDATE skips model signals, so the summary buckets it moved rows between
+are recomputed afterwards, which also bumps the report data version and
+drops the cached dashboard totals.
+"""
+import logging
+import time
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Payroll
+from .summaries import bucket_key, month_start, next_month, refresh_buckets
+
+logger = logging.getLogger(__name__)
+
+PAID = 'paid'
+ALREADY_PAID = 'already_paid'
+NOT_DUE = 'not_due'
+NOT_FOUND = 'not_found'
+
+OUTCOMES = (PAID, ALREADY_PAID, NOT_DUE, NOT_FOUND)
+
+
+class SettlementResult:
+    """Outcome of a bulk settlement: the payroll ids in each outcome."""
+
+    def __init__(self, settled_on):
+        self.settled_on = settled_on
+        self.outcomes = {outcome: [] for outcome in OUTCOMES}
+        self.elapsed = 0.0
+
+    @property
+    def paid(self):
+        return len(self.outcomes[PAID])
+
+    def outcome_of(self, payroll_id):
+        for outcome, ids in self.outcomes.items():
+            if payroll_id in ids:
+                return outcome
+        return None
+
+    def as_dict(self):
+        return {
+            'settled_on': self.settled_on.isoformat(),
+            'counts': {outcome: len(ids) for outcome, ids in self.outcomes.items()},
+            'outcomes': self.outcomes,
+            'elapsed_seconds': round(self.elapsed, 3),
+        }
+
+
+def settlement_queryset(pay_period=None, department=None, payroll_ids=None):
+    """Payrolls matching the settlement filter: the month of ``pay_period``, a department, ids."""
+    payrolls = Payroll.objects.all()
+    if pay_period:
+        start = month_start(pay_period)
+        payrolls = payrolls.filter(pay_period__gte=start, pay_period__lt=next_month(start))
+    if department:
+        payrolls = payrolls.filter(employee__department=department)
+    if payroll_ids is not None:
+        payrolls = payrolls.filter(id__in=payroll_ids)
+    return payrolls
+
+
+def settle_payrolls(pay_period=None, department=None, payroll_ids=None, settled_on=None):
+    """
+    Mark the due pending payrolls matching the filter as paid on
+    ``settled_on`` (default today). Returns a :class:`SettlementResult`.
+    """
+    settled_on = settled_on or timezone.now().date()
+    result = SettlementResult(settled_on)
+    started = time.perf_counter()
+    if payroll_ids is not None:
+        payroll_ids = sorted(set(payroll_ids))
+
+    with transaction.atomic():
+        payrolls = settlement_queryset(pay_period, department, payroll_ids)
+        rows = list(
+            payrolls.select_for_update(of=('self',)).order_by('id')
+            .values_list('id', 'payment_status', 'pay_period', 'employee__department')
+        )
+
+        touched = set()
+        for payroll_id, status, period, payroll_department in rows:
+            if status != 'pending':
+                result.outcomes[ALREADY_PAID].append(payroll_id)
+            elif period > settled_on:
+                result.outcomes[NOT_DUE].append(payroll_id)
+            else:
+                result.outcomes[PAID].append(payroll_id)
+                touched.add((payroll_department, period))
+        if payroll_ids is not None:
+            found = {row[0] for row in rows}
+            result.outcomes[NOT_FOUND] = [pk for pk in payroll_ids if pk not in found]
+
+        if result.paid:
+            updated = payrolls.filter(payment_status='pending', pay_period__lte=settled_on).update(
+                payment_status='paid', payment_date=settled_on, updated_at=timezone.now(),
+            )
+            if updated != result.paid:
+                logger.warning("Settlement expected to mark %d payrolls paid, updated %d", result.paid, updated)
+
+            # The UPDATE skips the signals that maintain the summary table
+            refresh_buckets({
+                bucket_key(payroll_department, period, status)
+                for payroll_department, period in touched
+                for status in ('pending', 'paid')
+            })
+
+    result.elapsed = time.perf_counter() - started
+    logger.info(
+        "Settled payrolls on %s: %d paid, %d already paid, %d not due, %d not found (%.2fs)",
+        settled_on, result.paid, len(result.outcomes[ALREADY_PAID]), len(result.outcomes[NOT_DUE]),
+        len(result.outcomes[NOT_FOUND]), result.elapsed,
+    )
+    return result
@@ -0,0 +1,190 @@
+"""
+Signal handlers that keep derived payroll data in sync with Employee and
+Payroll writes. Connected in ``PayrollConfig.ready()``.
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .autocomplete import index_employee, unindex_employee
+from .company import invalidate_company
+from .dashboard import invalidate_employee_aggregates, invalidate_payroll_aggregates
+from .data_version import bump_data_version_on_commit
+from .models import Company, Employee, Payroll
+from .summaries import SUMMED_FIELDS, apply_delta, bucket_key, refresh_employee_buckets
+
+SUMMARY_SOURCE_FIELDS = ['employee_id', 'pay_period', 'payment_status', *SUMMED_FIELDS.values()]
+EMPLOYEE_FIELDS = [field.attname for field in Employee._meta.concrete_fields if not field.primary_key]
+
+
+def _payroll_department(payroll):
+    if Payroll.employee.is_cached(payroll):
+        return payroll.employee.department
+    return Employee.objects.filter(pk=payroll.employee_id).values_list('department', flat=True).first()
+
+
+def _payroll_values(payroll):
+    return {field: getattr(payroll, field) for field in SUMMED_FIELDS.values()}
+
+
+@receiver(pre_save, sender=Payroll)
+def remember_previous_payroll(sender, instance, raw=False, **kwargs):
+    """Keep the row as stored before this save so its totals can be removed."""
+    instance._summary_previous = None
+    if raw or instance.pk is None:
+        return
+    loaded = getattr(instance, '_loaded_values', None)
+    if loaded is not None and all(field in loaded for field in SUMMARY_SOURCE_FIELDS):
+        # The snapshot Payroll.from_db took; the department is looked up
+        # only if the save changes anything the summary counts
+        instance._summary_previous = {field: loaded[field] for field in SUMMARY_SOURCE_FIELDS}
+        return
+    instance._summary_previous = (
+        Payroll.objects.filter(pk=instance.pk)
+        .values('employee__department', *SUMMARY_SOURCE_FIELDS)
+        .first()
+    )
+
+
+def _previous_department(previous, instance, department):
+    if 'employee__department' in previous:
+        return previous['employee__department']
+    if previous['employee_id'] == instance.employee_id:
+        return department
+    return Employee.objects.filter(pk=previous['employee_id']).values_list('department', flat=True).first()
+
+
+@receiver(post_save, sender=Payroll)
+def update_summary_on_payroll_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_summary_previous', None)
+    values = _payroll_values(instance)
+    if (
+        previous
+        and previous['employee_id'] == instance.employee_id
+        and bucket_key('', previous['pay_period'], previous['payment_status'])
+        == bucket_key('', instance.pay_period, instance.payment_status)
+        and all(previous[field] == value for field, value in values.items())
+    ):
+        # Nothing the summary counts changed
+        return
+
+    if previous and 'employee__department' in previous and previous['employee_id'] == instance.employee_id:
+        department = previous['employee__department']
+    else:
+        department = _payroll_department(instance)
+    current_key = bucket_key(department, instance.pay_period, instance.payment_status)
+    if previous:
+        previous_key = bucket_key(
+            _previous_department(previous, instance, department), previous['pay_period'], previous['payment_status'],
+        )
+        apply_delta(previous_key, -1, previous)
+    apply_delta(current_key, 1, values)
+
+
+@receiver(post_delete, sender=Payroll)
+def update_summary_on_payroll_delete(sender, instance, **kwargs):
+    apply_delta(
+        bucket_key(_payroll_department(instance), instance.pay_period, instance.payment_status),
+        -1,
+        _payroll_values(instance),
+    )
+
+
+@receiver(pre_save, sender=Employee)
+def remember_previous_department(sender, instance, raw=False, **kwargs):
+    instance._previous_values = None
+    instance._previous_department = None
+    instance._previous_search_fields = None
+    if raw or instance.pk is None:
+        return
+    previous = Employee.objects.filter(pk=instance.pk).values(*EMPLOYEE_FIELDS).first()
+    if previous:
+        instance._previous_values = previous
+        instance._previous_department = previous['department']
+        instance._previous_search_fields = (previous['first_name'], previous['last_name'], previous['email'])
+
+
+@receiver(post_save, sender=Employee)
+def move_summary_on_department_change(sender, instance, created, raw=False, **kwargs):
+    if raw or created:
+        return
+    previous = getattr(instance, '_previous_department', None) or ''
+    if previous != (instance.department or ''):
+        refresh_employee_buckets([instance.pk], {previous, instance.department or ''})
+
+
+@receiver(post_save, sender=Payroll)
+def invalidate_dashboard_on_payroll_save(sender, instance, raw=False, **kwargs):
+    previous = getattr(instance, '_summary_previous', None)
+    if instance.payment_status == 'paid' or (previous and previous['payment_status'] == 'paid'):
+        invalidate_payroll_aggregates()
+
+
+@receiver(post_delete, sender=Payroll)
+def invalidate_dashboard_on_payroll_delete(sender, instance, **kwargs):
+    if instance.payment_status == 'paid':
+        invalidate_payroll_aggregates()
+
+
+@receiver(post_save, sender=Employee)
+def invalidate_dashboard_on_employee_save(sender, instance, created, raw=False, **kwargs):
+    if not _row_changed(instance):
+        return
+    invalidate_employee_aggregates()
+    # The paid-net distribution lists active employees' departments
+    previous = getattr(instance, '_previous_values', None)
+    if created or not previous or any(
+        previous[field] != getattr(instance, field) for field in ('department', 'is_active')
+    ):
+        invalidate_payroll_aggregates()
+
+
+@receiver(post_delete, sender=Employee)
+def invalidate_dashboard_on_employee_delete(sender, instance, **kwargs):
+    invalidate_employee_aggregates()
+    invalidate_payroll_aggregates()
+
+
+@receiver(post_save, sender=Employee)
+def update_name_index_on_employee_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    fields = (instance.first_name, instance.last_name, instance.email)
+    if created or getattr(instance, '_previous_search_fields', None) != fields:
+        transaction.on_commit(lambda: index_employee(instance.pk, *fields))
+
+
+@receiver(post_delete, sender=Employee)
+def update_name_index_on_employee_delete(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: unindex_employee(pk))
+
+
+def _row_changed(instance):
+    """False when a save wrote back the row exactly as it was stored."""
+    if isinstance(instance, Payroll):
+        changed = getattr(instance, '_saved_changes', None)
+        return changed is None or bool(changed)
+    previous = getattr(instance, '_previous_values', None)
+    return previous is None or any(getattr(instance, field) != value for field, value in previous.items())
+
+
+@receiver(post_save, sender=Payroll)
+@receiver(post_save, sender=Employee)
+def bump_report_data_version_on_save(sender, instance, raw=False, **kwargs):
+    if not raw and _row_changed(instance):
+        bump_data_version_on_commit()
+
+
+@receiver(post_delete, sender=Payroll)
+@receiver(post_delete, sender=Employee)
+def bump_report_data_version_on_delete(sender, **kwargs):
+    bump_data_version_on_commit()
+
+
+@receiver(post_save, sender=Company)
+@receiver(post_delete, sender=Company)
+def invalidate_cached_company(sender, **kwargs):
+    invalidate_company()
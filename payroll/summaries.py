@@ -0,0 +1,242 @@
+"""
+Maintenance and queries for the DepartmentPayrollSummary table.
+
+Single payroll saves and deletes are applied as deltas to their summary row
+(see ``payroll/signals.py``). Bulk operations that bypass model signals call
+:func:`refresh_buckets` for the (department, month, status) buckets they
+touched (which also bumps the report data version), and
+:func:`rebuild_summaries` recomputes the whole table.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from .dashboard import invalidate_payroll_aggregates
+from .data_version import bump_data_version
+from .models import DepartmentPayrollSummary, Payroll
+
+# Summary column -> Payroll column it totals
+SUMMED_FIELDS = {
+    'total_gross': 'gross_salary',
+    'total_tax': 'tax_amount',
+    'total_retirement': 'retirement_amount',
+    'total_health_insurance': 'health_insurance',
+    'total_net': 'net_salary',
+}
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    return (day.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+def bucket_key(department, pay_period, payment_status):
+    """Normalised summary key for a payroll row."""
+    return (department or '', month_start(pay_period), payment_status)
+
+
+def _aggregates():
+    aggregates = {'payroll_count': Count('id')}
+    for summary_field, payroll_field in SUMMED_FIELDS.items():
+        aggregates[summary_field] = Sum(payroll_field)
+    return aggregates
+
+
+def _department_q(departments, field='employee__department'):
+    """Filter matching a set of summary department keys ('' means none)."""
+    named = [d for d in departments if d]
+    q = Q(**{f'{field}__in': named})
+    if '' in departments:
+        q |= Q(**{f'{field}__isnull': True}) | Q(**{field: ''})
+    return q
+
+
+def apply_delta(key, sign, values):
+    """
+    Add (``sign=1``) or remove (``sign=-1``) one payroll's amounts from its
+    summary row. ``values`` maps Payroll field names to amounts.
+    """
+    department, pay_month, payment_status = key
+    bucket = DepartmentPayrollSummary.objects.filter(
+        department=department, pay_month=pay_month, payment_status=payment_status,
+    )
+    changes = {'payroll_count': F('payroll_count') + sign}
+    for summary_field, payroll_field in SUMMED_FIELDS.items():
+        changes[summary_field] = F(summary_field) + sign * Decimal(values[payroll_field] or 0)
+
+    if bucket.update(**changes):
+        if sign < 0:
+            bucket.filter(payroll_count=0).delete()
+        return
+
+    if sign < 0:
+        # Nothing to subtract from; the table is out of sync, so recompute
+        refresh_buckets([key])
+        return
+
+    try:
+        with transaction.atomic():
+            DepartmentPayrollSummary.objects.create(
+                department=department,
+                pay_month=pay_month,
+                payment_status=payment_status,
+                payroll_count=1,
+                **{s: Decimal(values[p] or 0) for s, p in SUMMED_FIELDS.items()},
+            )
+    except IntegrityError:
+        # Another writer created the row first
+        bucket.update(**changes)
+
+
+def refresh_buckets(keys):
+    """Recompute the given (department, pay_month, payment_status) buckets."""
+    by_month = {}
+    for department, pay_month, payment_status in keys:
+        by_month.setdefault(month_start(pay_month), set()).add((department or '', payment_status))
+
+    with transaction.atomic():
+        for pay_month, month_keys in by_month.items():
+            departments = {k[0] for k in month_keys}
+            statuses = {k[1] for k in month_keys}
+            rows = (
+                Payroll.objects.filter(
+                    _department_q(departments),
+                    pay_period__gte=pay_month,
+                    pay_period__lt=next_month(pay_month),
+                    payment_status__in=statuses,
+                )
+                .order_by()
+                .values('employee__department', 'payment_status')
+                .annotate(**_aggregates())
+            )
+            fresh = []
+            for row in rows:
+                department = row.pop('employee__department') or ''
+                if (department, row['payment_status']) in month_keys:
+                    fresh.append(DepartmentPayrollSummary(department=department, pay_month=pay_month, **row))
+
+            stale = Q()
+            for department, payment_status in month_keys:
+                stale |= Q(department=department, payment_status=payment_status)
+            DepartmentPayrollSummary.objects.filter(stale, pay_month=pay_month).delete()
+            DepartmentPayrollSummary.objects.bulk_create(fresh)
+    bump_data_version()
+    invalidate_payroll_aggregates()
+
+
+def refresh_employee_buckets(employee_ids, departments):
+    """
+    Recompute every bucket holding payrolls of ``employee_ids`` under any of
+    ``departments`` (used when employees move between departments).
+    """
+    periods = (
+        Payroll.objects.filter(employee_id__in=employee_ids)
+        .annotate(pay_month=TruncMonth('pay_period'))
+        .order_by()
+        .values_list('pay_month', 'payment_status')
+        .distinct()
+    )
+    refresh_buckets({
+        (department, pay_month, payment_status)
+        for pay_month, payment_status in periods
+        for department in departments
+    })
+
+
+def rebuild_summaries():
+    """Recompute the whole summary table from Payroll. Returns the row count."""
+    rows = (
+        Payroll.objects.annotate(pay_month=TruncMonth('pay_period'))
+        .order_by()
+        .values('employee__department', 'pay_month', 'payment_status')
+        .annotate(**_aggregates())
+    )
+    summaries = []
+    for row in rows:
+        row['department'] = row.pop('employee__department') or ''
+        summaries.append(DepartmentPayrollSummary(**row))
+
+    with transaction.atomic():
+        DepartmentPayrollSummary.objects.all().delete()
+        DepartmentPayrollSummary.objects.bulk_create(summaries, batch_size=1000)
+    invalidate_payroll_aggregates()
+    return len(summaries)
+
+
+def department_totals(start_date, end_date, department=None, payment_status=None):
+    """
+    Payroll totals per department code for ``start_date``..``end_date``.
+
+    Whole months inside the range are read from the summary table; partial
+    months at either edge are aggregated from Payroll directly. Returns a dict
+    keyed by department code ('' for unassigned) of dicts with
+    ``payroll_count`` and the ``total_*`` amounts.
+    """
+    totals = {}
+
+    def add(department_code, row):
+        entry = totals.setdefault(department_code or '', dict.fromkeys(['payroll_count', *SUMMED_FIELDS], 0))
+        for field in entry:
+            entry[field] += row[field] or 0
+
+    first_full = start_date if start_date.day == 1 else next_month(start_date)
+    after_full = month_start(end_date + timedelta(days=1))
+
+    if first_full < after_full:
+        summaries = DepartmentPayrollSummary.objects.filter(pay_month__gte=first_full, pay_month__lt=after_full)
+        if department:
+            summaries = summaries.filter(department=department)
+        if payment_status:
+            summaries = summaries.filter(payment_status=payment_status)
+        rows = summaries.order_by().values('department').annotate(
+            payroll_count=Sum('payroll_count'),
+            **{field: Sum(field) for field in SUMMED_FIELDS},
+        )
+        for row in rows:
+            add(row['department'], row)
+        edges = [(start_date, min(first_full, end_date + timedelta(days=1))), (max(after_full, start_date), end_date + timedelta(days=1))]
+    else:
+        edges = [(start_date, end_date + timedelta(days=1))]
+
+    for edge_start, edge_end in edges:
+        if edge_start >= edge_end:
+            continue
+        payrolls = Payroll.objects.filter(pay_period__gte=edge_start, pay_period__lt=edge_end)
+        if department:
+            payrolls = payrolls.filter(employee__department=department)
+        if payment_status:
+            payrolls = payrolls.filter(payment_status=payment_status)
+        for row in payrolls.order_by().values('employee__department').annotate(**_aggregates()):
+            add(row['employee__department'], row)
+
+    return totals
+
+
+def department_employee_counts(start_date, end_date, department=None):
+    """
+    Number of distinct employees paid in ``start_date``..``end_date`` per
+    department code, from one grouped query.
+    """
+    payrolls = Payroll.objects.filter(pay_period__range=[start_date, end_date])
+    if department:
+        payrolls = payrolls.filter(employee__department=department)
+    rows = payrolls.order_by().values('employee__department').annotate(count=Count('employee', distinct=True))
+    counts = {}
+    for row in rows:
+        key = row['employee__department'] or ''
+        counts[key] = counts.get(key, 0) + row['count']
+    return counts
+
+
+def payroll_count(payment_status=None):
+    """Number of payrolls (optionally with one status), summed from the summary table."""
+    summaries = DepartmentPayrollSummary.objects.all()
+    if payment_status:
+        summaries = summaries.filter(payment_status=payment_status)
+    return summaries.aggregate(count=Sum('payroll_count'))['count'] or 0
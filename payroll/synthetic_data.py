@@ -0,0 +1,366 @@
+"""
+Seeded synthetic employees and payroll history for load tests and benchmarks.
+
+Employees are generated in chunks with NumPy. Chunk ``k`` draws from
+``numpy.random.default_rng([seed, k])``, so a dataset depends only on the
+seed, the sizes and the chunk size, not on how many worker processes
+generated it. Employee ids are assigned up front, after the current
+maximum, so a chunk's payroll history (one row per pay day since the hire
+date, amounts from :func:`calculate_payroll_batch`) can be computed before
+anything is written. The NumPy columns are turned straight into row tuples
+and written with batched ``executemany`` INSERTs, without building a model
+instance per row, either in the calling process or by ``workers`` processes
+in parallel, each with its own connection. Workers need a database the
+processes share, so not SQLite's in-memory test database.
+
+The raw INSERTs skip the model signals, so the summary table is rebuilt and
+the cached aggregates, employee name index and report data version are
+invalidated at the end.
+"""
+import logging
+import multiprocessing
+import time
+from datetime import date
+from functools import partial
+from itertools import islice
+
+import django
+import numpy as np
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .autocomplete import invalidate_name_index
+from .calculations import HEALTH_INSURANCE, RETIREMENT_RATE, TAX_RATE, calculate_payroll_batch
+from .dashboard import invalidate_employee_aggregates
+from .data_version import bump_data_version
+from .models import Employee, Payroll
+from .summaries import rebuild_summaries
+
+logger = logging.getLogger(__name__)
+
+# Employees generated (and written) per chunk
+DEFAULT_CHUNK_SIZE = 5000
+# Rows per executemany batch (and transaction)
+DEFAULT_BATCH_SIZE = 10000
+
+PAY_DAY = 25
+
+FIRST_NAMES = [
+    'James', 'Mary', 'John', 'Patricia', 'Robert', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+    'William', 'Susan', 'Richard', 'Jessica', 'Joseph', 'Sarah', 'Thomas', 'Karen', 'Daniel', 'Nancy',
+    'Wanjiru', 'Otieno', 'Achieng', 'Kamau', 'Njeri', 'Mwangi', 'Akinyi', 'Kiptoo', 'Atieno', 'Kibet',
+    'Wambui', 'Omondi', 'Chebet', 'Mutua', 'Nyambura', 'Ochieng', 'Jepkosgei', 'Kariuki', 'Moraa', 'Barasa',
+]
+LAST_NAMES = [
+    'Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Wilson', 'Anderson',
+    'Taylor', 'Thomas', 'Moore', 'Jackson', 'Martin', 'Lee', 'Thompson', 'White', 'Harris', 'Clark',
+    'Rotich', 'Kiprono', 'Ochieng', 'Mutua', 'Wambui', 'Chebet', 'Kariuki', 'Odhiambo', 'Njoroge', 'Cheruiyot',
+    'Kimani', 'Onyango', 'Wekesa', 'Kiplagat', 'Maina', 'Owino', 'Langat', 'Muthoni', 'Korir', 'Nyaga',
+]
+
+DEPARTMENTS = [key for key, _ in Employee.DEPARTMENT_CHOICES]
+DEPARTMENT_WEIGHTS = [0.30, 0.12, 0.20, 0.08, 0.15, 0.15]
+# Salary range per department, the same as populate_employees.py
+SALARY_RANGES = {
+    'engineering': (60000, 150000),
+    'marketing': (45000, 120000),
+    'sales': (40000, 100000),
+    'human_resource': (45000, 110000),
+    'finance': (50000, 130000),
+    'design': (45000, 115000),
+}
+STATUSES = [key for key, _ in Employee.ACTIVE_STATUS]
+STATUS_WEIGHTS = [0.7, 0.2, 0.1]
+
+# Share of payroll rows carrying an allowance (1-10% of gross) or another deduction (1-5%)
+ALLOWANCE_SHARE = 0.3
+DEDUCTION_SHARE = 0.1
+# Employees are hired up to this many days before the first pay day
+HIRING_LEAD_DAYS = 3 * 365
+
+
+def pay_periods(end, months):
+    """Pay days of the ``months`` months up to and including ``end``'s month, oldest first."""
+    periods = []
+    year, month = end.year, end.month
+    for _ in range(months):
+        periods.append(date(year, month, PAY_DAY))
+        year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+    return periods[::-1]
+
+
+class FixturePlan:
+    """What to generate: everything :func:`write_chunk` needs, picklable for worker processes."""
+
+    def __init__(self, employees, periods, first_id, seed=0, pending_months=1, late_share=0.02,
+                 chunk_size=DEFAULT_CHUNK_SIZE):
+        self.employees = employees
+        self.periods = list(periods)
+        self.first_id = first_id
+        self.seed = seed
+        self.pending_months = pending_months
+        self.late_share = late_share
+        self.chunk_size = chunk_size
+
+    @property
+    def chunk_count(self):
+        return -(-self.employees // self.chunk_size)
+
+    def chunk_bounds(self, index):
+        start = index * self.chunk_size
+        return self.first_id + start, min(self.chunk_size, self.employees - start)
+
+
+def generate_chunk(plan, index):
+    """
+    Columns of chunk ``index``: ``employees`` and ``payrolls``, each a dict
+    of equal-length NumPy arrays (amounts in cents, dates as ordinals).
+    """
+    rng = np.random.default_rng([plan.seed, index])
+    first_id, count = plan.chunk_bounds(index)
+
+    department = rng.choice(len(DEPARTMENTS), size=count, p=DEPARTMENT_WEIGHTS)
+    low = np.array([SALARY_RANGES[name][0] for name in DEPARTMENTS], dtype=np.int64)[department]
+    high = np.array([SALARY_RANGES[name][1] for name in DEPARTMENTS], dtype=np.int64)[department]
+    salary = (low * 100 + (rng.random(count) * (high - low) * 100)).astype(np.int64)
+
+    period_days = np.array([period.toordinal() for period in plan.periods], dtype=np.int64)
+    hire_date = rng.integers(period_days[0] - HIRING_LEAD_DAYS, period_days[-1], size=count, endpoint=True)
+
+    employees = {
+        'id': np.arange(first_id, first_id + count, dtype=np.int64),
+        'first_name': rng.integers(0, len(FIRST_NAMES), size=count),
+        'last_name': rng.integers(0, len(LAST_NAMES), size=count),
+        'phone_number': rng.integers(0, 10 ** 8, size=count),
+        'hire_date': hire_date,
+        'department': department,
+        'salary': salary,
+        'is_active': rng.choice(len(STATUSES), size=count, p=STATUS_WEIGHTS),
+    }
+
+    # One payroll per employee per pay day on or after their hire date
+    employee_index, period_index = np.nonzero(hire_date[:, None] <= period_days[None, :])
+    rows = len(employee_index)
+    gross = salary[employee_index]
+    allowances = np.where(
+        rng.random(rows) < ALLOWANCE_SHARE, gross * rng.integers(1, 11, size=rows) // 10000 * 100, 0,
+    )
+    deductions = np.where(
+        rng.random(rows) < DEDUCTION_SHARE, gross * rng.integers(1, 6, size=rows) // 10000 * 100, 0,
+    )
+    amounts = calculate_payroll_batch(gross, allowances, deductions)
+    keep = ~amounts['below_minimum_net']
+
+    # The latest months are still pending, as are a few late rows before them
+    pending = (period_index >= len(plan.periods) - plan.pending_months) | (rng.random(rows) < plan.late_share)
+    payment_date = np.where(pending, 0, period_days[period_index] + rng.integers(0, 6, size=rows))
+
+    payrolls = {
+        'employee_id': employees['id'][employee_index],
+        'period': period_index,
+        'gross_salary': gross,
+        'total_allowances': allowances,
+        'total_deductions': deductions,
+        'tax_amount': amounts['tax_amount'],
+        'retirement_amount': amounts['retirement_amount'],
+        'net_salary': amounts['net_salary'],
+        'pending': pending,
+        'payment_date': payment_date,
+        'reference': rng.integers(0, 16 ** 6, size=rows),
+    }
+    return {
+        'employees': employees,
+        'payrolls': {name: column[keep] for name, column in payrolls.items()},
+    }
+
+
+EMPLOYEE_COLUMNS = [
+    'id', 'first_name', 'last_name', 'email', 'phone_number', 'hire_date', 'department', 'salary', 'is_active',
+]
+PAYROLL_COLUMNS = [
+    'reference_id', 'employee_id', 'pay_period', 'gross_salary', 'total_allowances', 'total_deductions',
+    'tax_rate', 'health_insurance', 'retirement_rate', 'tax_amount', 'retirement_amount', 'net_salary',
+    'payment_status', 'payment_date', 'created_at', 'updated_at',
+]
+
+
+def _amounts(cents):
+    """Two-place decimal strings for an array of cents, as the DecimalField columns store them."""
+    return [
+        f"{c // 100}.{c % 100:02d}" if c >= 0 else f"-{-c // 100}.{-c % 100:02d}"
+        for c in cents.tolist()
+    ]
+
+
+def _dates(ordinals):
+    """ISO dates for an array of day ordinals; 0 stands for no date."""
+    days = {day: date.fromordinal(day).isoformat() for day in np.unique(ordinals).tolist() if day}
+    return [days.get(day) for day in ordinals.tolist()]
+
+
+def employee_rows(columns):
+    """Row tuples in :data:`EMPLOYEE_COLUMNS` order."""
+    ids = columns['id'].tolist()
+    first_names = [FIRST_NAMES[i] for i in columns['first_name'].tolist()]
+    last_names = [LAST_NAMES[i] for i in columns['last_name'].tolist()]
+    return zip(
+        ids,
+        first_names,
+        last_names,
+        [f"{first.lower()}.{last.lower()}.{pk}@example.com" for pk, first, last in zip(ids, first_names, last_names)],
+        [f"07{phone:08d}" for phone in columns['phone_number'].tolist()],
+        _dates(columns['hire_date']),
+        [DEPARTMENTS[i] for i in columns['department'].tolist()],
+        _amounts(columns['salary']),
+        [STATUSES[i] for i in columns['is_active'].tolist()],
+    )
+
+
+def payroll_rows(columns, periods, created_at):
+    """Row tuples in :data:`PAYROLL_COLUMNS` order; ``created_at`` as adapted for the database."""
+    period_dates = [period.isoformat() for period in periods]
+    prefixes = [f"PAY-{period.year}{period.month:02d}-" for period in periods]
+    employee_ids = columns['employee_id'].tolist()
+    period_index = columns['period'].tolist()
+    count = len(employee_ids)
+    return zip(
+        [
+            f"{prefixes[period]}{str(employee_id).zfill(4)}-{reference:06x}"
+            for period, employee_id, reference in zip(period_index, employee_ids, columns['reference'].tolist())
+        ],
+        employee_ids,
+        [period_dates[period] for period in period_index],
+        _amounts(columns['gross_salary']),
+        _amounts(columns['total_allowances']),
+        _amounts(columns['total_deductions']),
+        [str(TAX_RATE)] * count,
+        [str(HEALTH_INSURANCE)] * count,
+        [str(RETIREMENT_RATE)] * count,
+        _amounts(columns['tax_amount']),
+        _amounts(columns['retirement_amount']),
+        _amounts(columns['net_salary']),
+        ['pending' if pending else 'paid' for pending in columns['pending'].tolist()],
+        _dates(columns['payment_date']),
+        [created_at] * count,
+        [created_at] * count,
+    )
+
+
+class FixtureResult:
+    """Outcome of a fixture build."""
+
+    def __init__(self):
+        self.employees = 0
+        self.payrolls = 0
+        self.pending = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        if not self.elapsed:
+            return 0.0
+        return (self.employees + self.payrolls) / self.elapsed
+
+    def as_dict(self):
+        return {
+            'employees': self.employees,
+            'payrolls': self.payrolls,
+            'pending': self.pending,
+            'elapsed_seconds': round(self.elapsed, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+def _insert_rows(model, columns, rows, batch_size):
+    """
+    INSERTs ``rows`` (tuples in ``columns`` order) into ``model``'s table
+    with one ``executemany`` per batch.
+    """
+    quote = connection.ops.quote_name
+    sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} "
+        f"({', '.join(quote(model._meta.get_field(name).column) for name in columns)}) "
+        f"VALUES ({', '.join(['%s'] * len(columns))})"
+    )
+    # One transaction per batch: concurrent workers only hold SQLite's
+    # write lock while a batch is inserted
+    rows = iter(rows)
+    while batch := list(islice(rows, batch_size)):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, batch)
+
+
+def _init_worker():
+    django.setup()
+    if connection.vendor == 'sqlite':
+        # Take the write lock when a batch's transaction begins, so workers
+        # queue for it instead of failing to upgrade a read lock
+        connection.settings_dict['OPTIONS'].setdefault('transaction_mode', 'IMMEDIATE')
+        connection.settings_dict['OPTIONS'].setdefault('timeout', 60)
+
+
+def write_chunk(plan, index, batch_size=DEFAULT_BATCH_SIZE):
+    """Generates and inserts chunk ``index``; returns its employee, payroll and pending counts."""
+    chunk = generate_chunk(plan, index)
+    created_at = connection.ops.adapt_datetimefield_value(timezone.now())
+    _insert_rows(Employee, EMPLOYEE_COLUMNS, employee_rows(chunk['employees']), batch_size)
+    _insert_rows(Payroll, PAYROLL_COLUMNS, payroll_rows(chunk['payrolls'], plan.periods, created_at), batch_size)
+    return len(chunk['employees']['id']), len(chunk['payrolls']['employee_id']), int(chunk['payrolls']['pending'].sum())
+
+
+def written_chunks(plan, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    """Writes every chunk of ``plan``, ``workers`` processes at a time, yielding their counts."""
+    write = partial(write_chunk, plan, batch_size=batch_size)
+    if workers <= 1:
+        for index in range(plan.chunk_count):
+            yield write(index)
+        return
+
+    # Each worker opens its own connection; don't hand them the parent's
+    connections.close_all()
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        yield from pool.imap_unordered(write, range(plan.chunk_count))
+
+
+def clear_payroll_data():
+    """Deletes every payroll and employee without loading them."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in (Payroll, Employee):
+            cursor.execute(f"DELETE FROM {connection.ops.quote_name(model._meta.db_table)}")
+
+
+def build_fixtures(employees, months, end, seed=0, pending_months=1, late_share=0.02,
+                   chunk_size=DEFAULT_CHUNK_SIZE, batch_size=DEFAULT_BATCH_SIZE, workers=1):
+    """
+    Add ``employees`` synthetic employees with payroll history for the
+    ``months`` pay days up to ``end``. Returns a :class:`FixtureResult`.
+    """
+    result = FixtureResult()
+    started = time.perf_counter()
+    first_id = (Employee.objects.aggregate(last=Max('id'))['last'] or 0) + 1
+    plan = FixturePlan(employees, pay_periods(end, months), first_id, seed, pending_months, late_share, chunk_size)
+
+    for chunk_employees, chunk_payrolls, chunk_pending in written_chunks(plan, batch_size, workers):
+        result.employees += chunk_employees
+        result.payrolls += chunk_payrolls
+        result.pending += chunk_pending
+        logger.debug("Fixture build: %d/%d employees written", result.employees, employees)
+
+    # Employee ids were chosen here rather than by the database
+    with connection.cursor() as cursor:
+        for statement in connection.ops.sequence_reset_sql(no_style(), [Employee]):
+            cursor.execute(statement)
+
+    rebuild_summaries()
+    invalidate_employee_aggregates()
+    invalidate_name_index()
+    bump_data_version()
+
+    result.elapsed = time.perf_counter() - started
+    logger.info(
+        "Fixture build: %d employees, %d payrolls (%d pending) in %.1fs (%.0f rows/sec)",
+        result.employees, result.payrolls, result.pending, result.elapsed, result.rows_per_second,
+    )
+    return result
@@ -1,9 +1,8 @@
 from django import template
-from payroll.models import Company
+from payroll.company import get_company_name as cached_company_name
 
 register = template.Library()
 
 @register.simple_tag
 def get_company_name():
-    company = Company.objects.first()
-    return company.name if company else "PayPulse"
+    return cached_company_name()
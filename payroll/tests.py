@@ -1,3 +1,1624 @@
-from django.test import TestCase
+import csv
+import os
+import random
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta
+from io import BytesIO, StringIO
+from unittest import mock
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import F
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import openpyxl
+from PyPDF2 import PdfReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from .autocomplete import NAME_INDEX_DATA, EmployeeNameIndex, autocomplete, build_name_index, get_name_index
+from .calculations import TAX_RATE, calculate_payroll, calculate_payroll_batch, from_cents, to_cents_array
+from .company import COMPANY_DATA, get_company_name
+from .dashboard import get_employee_stats
+from .data_version import bump_data_version, current_data_version, forget_data_versions
+from .employee_import import EmployeeImportError, import_employees
+from .excel_reports import build_department_excel, create_streaming_workbook, save_workbook_to_report
+from .models import Company, DataVersion, DepartmentPayrollSummary, Employee, Payroll, Report
+from .pagination import keyset_paginate
+from .parallel_reports import map_parts, merge_pdfs, split_parts, with_ends
+from .payroll_runs import run_payroll
+from .payslips import pay_run_payrolls, render_payslips
+from .pdf_engine import fit_text
+from .pdf_reports import build_employee_pdf, employee_report_data, render_department_part, render_report_pdf
+from .report_data import employee_tax_totals, report_payrolls, report_totals
+from .report_jobs import (
+    REPORT_BUILDERS,
+    Heartbeat,
+    claim_report,
+    enqueue_report,
+    process_next_report,
+    requeue_stale_reports,
+)
+from .search import autocomplete_employees, filter_employees, install_search_index, uninstall_search_index
+from .settlement import settle_payrolls
+from .summaries import department_employee_counts, department_totals, rebuild_summaries
+from .synthetic_data import build_fixtures, clear_payroll_data, pay_periods
+
+
+def make_employee(**kwargs):
+    defaults = {
+        'first_name': 'Jane',
+        'last_name': 'Doe',
+        'email': 'jane.doe@example.com',
+        'hire_date': date(2020, 1, 1),
+        'department': 'engineering',
+        'salary': Decimal('90000.00'),
+        'is_active': 'active',
+    }
+    defaults.update(kwargs)
+    return Employee.objects.create(**defaults)
+
+
+class PayrollRunTests(TestCase):
+    def test_run_creates_one_row_per_employee(self):
+        first = make_employee()
+        make_employee(first_name='John', department='sales', salary=Decimal('55000.00'))
+
+        result = run_payroll(date(2030, 5, 31))
+
+        self.assertEqual(result.created, 2)
+        payroll = Payroll.objects.get(employee=first)
+        self.assertEqual(payroll.payment_status, 'pending')
+        self.assertEqual(payroll.tax_amount, Decimal('14400.00'))
+        self.assertEqual(payroll.retirement_amount, Decimal('4500.00'))
+        self.assertEqual(payroll.net_salary, Decimal('69100.00'))
+        self.assertTrue(payroll.reference_id.startswith(f'PAY-203005-{str(first.id).zfill(4)}-'))
+
+    def test_run_skips_employees_paid_in_same_month(self):
+        employee = make_employee()
+        make_employee(first_name='John')
+        Payroll.objects.create(employee=employee, pay_period=date(2030, 5, 1), gross_salary=employee.salary)
+
+        result = run_payroll(date(2030, 5, 31))
+
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.skipped_existing, 1)
+        self.assertEqual(Payroll.objects.filter(employee=employee).count(), 1)
+
+    def test_run_skips_net_below_a_third_of_gross(self):
+        make_employee(salary=Decimal('3000.00'))
+
+        result = run_payroll(date(2030, 5, 31))
+
+        self.assertEqual(result.created, 0)
+        self.assertEqual(result.skipped_min_net, 1)
+
+    def test_dry_run_writes_nothing(self):
+        make_employee()
+
+        result = run_payroll(date(2030, 5, 31), dry_run=True)
+
+        self.assertEqual(result.created, 1)
+        self.assertFalse(Payroll.objects.exists())
+
+
+class CalculationTests(SimpleTestCase):
+    def decimal_reference(self, gross, allowances, deductions):
+        """The amounts Payroll.save() stored before the kernel existed."""
+        tax_rate, health_insurance, retirement_rate = Decimal('16.00'), Decimal('2000.00'), Decimal('5.00')
+        tax_amount = (gross * tax_rate / Decimal('100'))
+        retirement_amount = (gross * retirement_rate / Decimal('100'))
+        net_salary = gross + allowances - deductions - tax_amount - health_insurance - retirement_amount
+        # As read back from the two-place DecimalField columns
+        field = Payroll._meta.get_field('net_salary')
+        return tuple(
+            value.quantize(Decimal('0.01'), context=field.context)
+            for value in (tax_amount, retirement_amount, net_salary)
+        )
+
+    def test_batch_matches_decimal_path_to_the_cent(self):
+        rng = random.Random(42)
+        rows = [
+            (
+                Decimal(rng.randint(100000, 20000000)).scaleb(-2),
+                Decimal(rng.randint(0, 500000)).scaleb(-2),
+                Decimal(rng.randint(0, 100000)).scaleb(-2),
+            )
+            for _ in range(5000)
+        ]
+        amounts = calculate_payroll_batch(
+            to_cents_array(r[0] for r in rows),
+            to_cents_array(r[1] for r in rows),
+            to_cents_array(r[2] for r in rows),
+        )
+        for i, (gross, allowances, deductions) in enumerate(rows):
+            tax, retirement, net = self.decimal_reference(gross, allowances, deductions)
+            self.assertEqual(from_cents(amounts['tax_amount'][i]), tax)
+            self.assertEqual(from_cents(amounts['retirement_amount'][i]), retirement)
+            self.assertEqual(from_cents(amounts['net_salary'][i]), net)
+            self.assertEqual(calculate_payroll(gross, allowances, deductions)['net_salary'], net)
+
+    def test_half_cents_round_to_even_from_unrounded_amounts(self):
+        # 50000.10 * 5% = 2500.005; net = 37500.079 before rounding
+        amounts = calculate_payroll(Decimal('50000.10'))
+        self.assertEqual(amounts['retirement_amount'], Decimal('2500.00'))
+        self.assertEqual(amounts['net_salary'], Decimal('37500.08'))
+        # 33333.30 * 5% = 1666.665; net = 24333.307 before rounding
+        amounts = calculate_payroll(Decimal('33333.30'))
+        self.assertEqual(amounts['retirement_amount'], Decimal('1666.66'))
+        self.assertEqual(amounts['net_salary'], Decimal('24333.31'))
+        self.assertEqual(calculate_payroll(Decimal('0.50'), tax_rate=Decimal('1.00'))['tax_amount'], Decimal('0.00'))
+        self.assertEqual(calculate_payroll(Decimal('1.50'), tax_rate=Decimal('1.00'))['tax_amount'], Decimal('0.02'))
+
+        batch = calculate_payroll_batch(to_cents_array([Decimal('50000.10'), Decimal('33333.30')]))
+        self.assertEqual(batch['retirement_amount'].tolist(), [250000, 166666])
+        self.assertEqual(batch['net_salary'].tolist(), [3750008, 2433331])
+
+    def test_minimum_net_check(self):
+        self.assertTrue(calculate_payroll(Decimal('3000.00'))['below_minimum_net'])
+        self.assertFalse(calculate_payroll(Decimal('90000.00'))['below_minimum_net'])
+
+
+class DashboardQueryTests(TestCase):
+    # Employee stats, department chart, paid net per department,
+    # recent payrolls and upcoming payrolls
+    DASHBOARD_QUERY_BUDGET = 5
+    PAYROLL_TABLES = ('"payroll_employee"', '"payroll_payroll"', '"payroll_departmentpayrollsummary"')
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('admin', password='secret')
+        self.client.force_login(self.user)
+
+    def make_payrolls(self, count):
+        departments = [d[0] for d in Employee.DEPARTMENT_CHOICES]
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(count):
+                employee = make_employee(first_name=f'Emp{i}', department=departments[i % len(departments)])
+                Payroll.objects.create(
+                    employee=employee, pay_period=date(2030, 1, 31), gross_salary=employee.salary,
+                    payment_status='paid' if i % 2 else 'pending',
+                )
+
+    def payroll_queries(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('index'))
+        self.assertEqual(response.status_code, 200)
+        return [
+            q['sql'] for q in context.captured_queries
+            if any(table in q['sql'] for table in self.PAYROLL_TABLES)
+        ]
+
+    def test_dashboard_stays_within_query_budget(self):
+        self.make_payrolls(3)
+        small = self.payroll_queries()
+        self.make_payrolls(30)
+        large = self.payroll_queries()
+
+        self.assertLessEqual(len(large), self.DASHBOARD_QUERY_BUDGET)
+        self.assertEqual(len(small), len(large))
+
+    def test_repeat_dashboard_load_skips_aggregates(self):
+        self.make_payrolls(6)
+        self.payroll_queries()
+
+        queries = self.payroll_queries()
+
+        # Only the recent and upcoming payroll lists remain
+        self.assertEqual(len(queries), 2)
+        self.assertFalse(any('COUNT(' in sql or 'SUM(' in sql for sql in queries))
+
+    def test_writes_invalidate_cached_aggregates(self):
+        self.make_payrolls(2)
+        self.client.get(reverse('index'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_employee(first_name='New', is_active='probation')
+            payroll = Payroll.objects.filter(payment_status='pending').first()
+            payroll.payment_status = 'paid'
+            payroll.save()
+            # A dashboard request before the commit caches the old totals;
+            # the invalidation only runs once the writes are visible
+            self.assertEqual(get_employee_stats()['total'], 2)
+        response = self.client.get(reverse('index'))
+
+        self.assertEqual(response.context['total_employees'], 3)
+        self.assertEqual(response.context['probation_employees'], 1)
+        self.assertEqual(response.context['department_data']['Engineering'], Decimal('90000.00'))
+
+        # Only active employees' payments count
+        employee = payroll.employee
+        employee.is_active = 'on_leave'
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.save()
+        response = self.client.get(reverse('index'))
+        self.assertNotIn('Engineering', response.context['department_data'])
+
+    def test_dashboard_totals(self):
+        self.make_payrolls(12)
+        response = self.client.get(reverse('index'))
+
+        self.assertEqual(response.context['total_employees'], 12)
+        self.assertEqual(response.context['active_employees'], 12)
+        self.assertEqual(response.context['status_counts']['on_leave'], 0)
+        # Odd employees are paid: both marketing payrolls, no engineering ones
+        self.assertEqual(response.context['department_data']['Marketing'], Decimal('180000.00'))
+        self.assertEqual(response.context['department_data']['Engineering'], 0)
+
+
+class SummaryAssertionsMixin:
+    def summary_rows(self):
+        return sorted(
+            DepartmentPayrollSummary.objects.values_list(
+                'department', 'pay_month', 'payment_status', 'payroll_count', 'total_gross', 'total_net',
+            )
+        )
+
+    def assertSummaryMatchesRebuild(self):
+        incremental = self.summary_rows()
+        rebuild_summaries()
+        self.assertEqual(incremental, self.summary_rows())
+
+
+class DepartmentSummaryTests(SummaryAssertionsMixin, TestCase):
+    def test_saves_and_deletes_are_applied_incrementally(self):
+        employee = make_employee()
+        payroll = Payroll.objects.create(employee=employee, pay_period=date(2030, 1, 15), gross_salary=employee.salary)
+        Payroll.objects.create(employee=employee, pay_period=date(2030, 2, 15), gross_salary=employee.salary)
+        self.assertSummaryMatchesRebuild()
+
+        payroll.payment_status = 'paid'
+        payroll.save()
+        self.assertSummaryMatchesRebuild()
+        self.assertTrue(DepartmentPayrollSummary.objects.filter(payment_status='paid', payroll_count=1).exists())
+
+        payroll.delete()
+        self.assertSummaryMatchesRebuild()
+        self.assertFalse(DepartmentPayrollSummary.objects.filter(payment_status='paid').exists())
+
+    def test_department_change_moves_totals(self):
+        employee = make_employee()
+        Payroll.objects.create(employee=employee, pay_period=date(2030, 1, 15), gross_salary=employee.salary)
+
+        employee.department = 'finance'
+        employee.save()
+
+        self.assertEqual(list(DepartmentPayrollSummary.objects.values_list('department', flat=True)), ['finance'])
+        self.assertSummaryMatchesRebuild()
+
+        employee.delete()
+        self.assertFalse(DepartmentPayrollSummary.objects.exists())
+
+    def test_payroll_run_refreshes_summary(self):
+        make_employee()
+        make_employee(first_name='John', department='sales')
+
+        run_payroll(date(2030, 5, 31))
+
+        self.assertEqual(DepartmentPayrollSummary.objects.count(), 2)
+        self.assertSummaryMatchesRebuild()
+
+    def test_department_totals_combines_summary_and_partial_months(self):
+        employee = make_employee()
+        for pay_period in [date(2030, 1, 10), date(2030, 2, 10), date(2030, 3, 10), date(2030, 3, 25)]:
+            Payroll.objects.create(employee=employee, pay_period=pay_period, gross_salary=employee.salary)
+
+        totals = department_totals(date(2030, 1, 15), date(2030, 3, 20))
+
+        self.assertEqual(totals['engineering']['payroll_count'], 2)
+        self.assertEqual(totals['engineering']['total_gross'], Decimal('180000.00'))
+
+    def test_employee_counts_cover_the_range_only(self):
+        jane = make_employee()
+        john = make_employee(first_name='John', email='john@example.com')
+        make_employee(first_name='Amos', email='amos@example.com')
+        for pay_period in [date(2030, 1, 31), date(2030, 2, 28)]:
+            Payroll.objects.create(employee=jane, pay_period=pay_period, gross_salary=jane.salary)
+        Payroll.objects.create(employee=john, pay_period=date(2030, 3, 31), gross_salary=john.salary)
+
+        self.assertEqual(department_employee_counts(date(2030, 1, 1), date(2030, 2, 28)), {'engineering': 1})
+        self.assertEqual(department_employee_counts(date(2030, 1, 1), date(2030, 3, 31)), {'engineering': 2})
+        self.assertEqual(department_employee_counts(date(2030, 1, 1), date(2030, 3, 31), 'sales'), {})
+
+
+class CompanyCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        forget_data_versions()
+        self.client.force_login(User.objects.create_user('admin', password='secret'))
+
+    def company_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [q['sql'] for q in context.captured_queries if '"payroll_company"' in q['sql']]
+
+    def test_pages_reuse_cached_company(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Company.objects.create(name='Acme Ltd')
+        self.company_queries(reverse('payroll_list'))
+
+        self.assertEqual(self.company_queries(reverse('payroll_list')), [])
+        self.assertEqual(get_company_name(), 'Acme Ltd')
+
+    def test_company_settings_save_invalidates_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Company.objects.create(id=1, name='Acme Ltd')
+        self.assertEqual(get_company_name(), 'Acme Ltd')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post(reverse('company_settings'), {'name': 'Globex'})
+            # Not until the save commits
+            self.assertEqual(get_company_name(), 'Acme Ltd')
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(get_company_name(), 'Globex')
+        response = self.client.get(reverse('payroll_list'))
+        self.assertContains(response, 'Globex')
+
+    def test_other_processes_see_the_version_move(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Company.objects.create(id=1, name='Acme Ltd')
+        self.assertEqual(get_company_name(), 'Acme Ltd')
+
+        # Another process renamed the company and bumped the counter
+        Company.objects.filter(pk=1).update(name='Globex')
+        DataVersion.objects.filter(name=COMPANY_DATA).update(version=F('version') + 1)
+        with override_settings(DATA_VERSION_CHECK_INTERVAL=60):
+            self.assertEqual(get_company_name(), 'Acme Ltd')
+        with override_settings(DATA_VERSION_CHECK_INTERVAL=0):
+            self.assertEqual(get_company_name(), 'Globex')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ExcelReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('admin', password='secret'))
+
+    def generate(self, report_type):
+        response = self.client.post(reverse('generate_report'), {
+            'report_type': report_type,
+            'start_date': '2030-01-01',
+            'end_date': '2030-12-31',
+            'report_format': 'excel',
+        })
+        process_next_report()
+        return response
+
+    def test_payroll_report_streams_every_row(self):
+        for i in range(25):
+            employee = make_employee(first_name=f'Emp{i}')
+            Payroll.objects.create(employee=employee, pay_period=date(2030, 3, 31), gross_salary=employee.salary)
+
+        response = self.generate('payroll')
+
+        self.assertEqual(response.status_code, 202)
+        report = Report.objects.get()
+        self.assertEqual(report.status, 'generated')
+        workbook = openpyxl.load_workbook(report.file.path, read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[0][0], 'Payroll Detail Report')
+        self.assertEqual(rows[2][0], 'Employee ID')
+        self.assertEqual(len(rows), 3 + 25 + 1)
+        self.assertEqual(rows[3][6], 90000)
+        self.assertEqual(rows[-1][:4], ('Total', None, None, 25 * 90000))
+
+    def test_department_report_reads_summary(self):
+        employee = make_employee()
+        Payroll.objects.create(employee=employee, pay_period=date(2030, 3, 31), gross_salary=employee.salary)
+
+        self.generate('department')
+
+        workbook = openpyxl.load_workbook(Report.objects.get().file.path, read_only=True)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        self.assertEqual(rows[3], ('Engineering', 1, 90000, 90000))
+        self.assertEqual(workbook.sheetnames, ['Department Summary Report', 'Engineering'])
+        detail = list(workbook['Engineering'].iter_rows(values_only=True))
+        self.assertEqual(detail[3][1:3], ('Jane Doe', 'jane.doe@example.com'))
+
+    def test_reports_with_the_same_name_keep_separate_files(self):
+        reports = []
+        for title in ('First', 'Second'):
+            wb, ws = create_streaming_workbook(title, ['Column'])
+            report = Report(name='same.xlsx', type='payroll', period_start=date(2030, 1, 1),
+                            period_end=date(2030, 1, 31))
+            reports.append(save_workbook_to_report(wb, report))
+
+        self.assertNotEqual(reports[0].file.name, reports[1].file.name)
+        for report, title in zip(reports, ('First', 'Second')):
+            workbook = openpyxl.load_workbook(report.file.path, read_only=True)
+            self.assertEqual(next(workbook.active.iter_rows(values_only=True))[0], title)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ReportJobTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('admin', password='secret')
+        self.client.force_login(self.user)
+
+    def test_generate_report_only_queues(self):
+        employee = make_employee()
+        Payroll.objects.create(employee=employee, pay_period=date(2030, 3, 31), gross_salary=employee.salary)
+
+        response = self.client.post(reverse('generate_report'), {
+            'report_type': 'tax',
+            'report_format': 'pdf',
+            'start_date': '2030-01-01',
+            'end_date': '2030-12-31',
+        })
+
+        self.assertEqual(response.status_code, 202)
+        report = Report.objects.get()
+        self.assertEqual(response.json()['job_id'], report.id)
+        self.assertEqual(report.status, 'queued')
+        self.assertFalse(report.file)
+
+        process_next_report()
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status['status'], 'generated')
+        self.assertEqual(status['download_url'], reverse('download_report', args=[report.id]))
+
+    def test_report_without_data_fails(self):
+        report, _ = enqueue_report('payroll', 'excel', date(2030, 1, 1), date(2030, 1, 31), user=self.user)
+
+        process_next_report()
+
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'failed')
+        self.assertEqual(report.error_message, 'No data found for the selected criteria.')
+        self.assertIsNotNone(report.completed_at)
+        self.assertIsNone(process_next_report())
+
+    def test_report_is_claimed_once(self):
+        report, _ = enqueue_report('employee', 'excel', date(2030, 1, 1), date(2030, 1, 31))
+        stale_copy = Report.objects.get(pk=report.pk)
+
+        self.assertTrue(claim_report(report))
+        self.assertFalse(claim_report(stale_copy))
+
+    def test_stale_reports_are_requeued(self):
+        report, _ = enqueue_report('employee', 'excel', date(2030, 1, 1), date(2030, 1, 31))
+        claim_report(report)
+
+        self.assertEqual(requeue_stale_reports(timeout=3600), 0)
+        self.assertEqual(requeue_stale_reports(timeout=-1), 1)
+        report.refresh_from_db()
+        self.assertEqual(report.status, 'queued')
+
+    def test_heartbeat_keeps_the_claim_fresh(self):
+        report, _ = enqueue_report('employee', 'excel', date(2030, 1, 1), date(2030, 1, 31))
+        claim_report(report)
+        Report.objects.filter(pk=report.pk).update(started_at=timezone.now() - timedelta(hours=2))
+        report.refresh_from_db()
+
+        heartbeat = Heartbeat(report)
+        self.assertTrue(heartbeat.beat())
+        self.assertEqual(requeue_stale_reports(timeout=3600), 0)
+
+        requeue_stale_reports(timeout=-1)
+        self.assertFalse(heartbeat.beat())
+
+    def test_build_that_lost_its_claim_is_discarded(self):
+        written = []
+
+        def requeue_while_building(report):
+            report.file.save(report.name, ContentFile(b'data'), save=False)
+            written.append(report.file.path)
+            requeue_stale_reports(timeout=-1)
+            return True
+
+        def delete_while_building(report):
+            Report.objects.filter(pk=report.pk).delete()
+            return True
+
+        report, _ = enqueue_report('employee', 'excel', date(2030, 1, 1), date(2030, 1, 31))
+        with mock.patch.dict(REPORT_BUILDERS, {('employee', 'excel'): requeue_while_building}):
+            process_next_report()
+        report.refresh_from_db()
+        self.assertEqual((report.status, report.file.name, report.completed_at), ('queued', '', None))
+        self.assertFalse(os.path.exists(written[0]))
+
+        with mock.patch.dict(REPORT_BUILDERS, {('employee', 'excel'): delete_while_building}):
+            process_next_report()
+        self.assertFalse(Report.objects.exists())
+
+    def test_identical_request_reuses_generated_report(self):
+        employee = make_employee()
+        Payroll.objects.create(employee=employee, pay_period=date(2030, 1, 31), gross_salary=employee.salary)
+        report, created = enqueue_report('payroll', 'excel', date(2030, 1, 1), date(2030, 1, 31))
+        process_next_report()
+
+        with self.assertNumQueries(2):
+            again, created_again = enqueue_report('payroll', 'excel', date(2030, 1, 1), date(2030, 1, 31))
+
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.pk, report.pk)
+        self.assertEqual(Report.objects.count(), 1)
+
+    def test_data_changes_and_parameters_miss_the_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = make_employee()
+            Payroll.objects.create(employee=employee, pay_period=date(2030, 1, 31), gross_salary=employee.salary)
+        report, _ = enqueue_report('payroll', 'excel', date(2030, 1, 1), date(2030, 1, 31))
+
+        _, other_department = enqueue_report('payroll', 'excel', date(2030, 1, 1), date(2030, 1, 31), 'sales')
+        _, other_format = enqueue_report('payroll', 'pdf', date(2030, 1, 1), date(2030, 1, 31))
+        self.assertTrue(other_department)
+        self.assertTrue(other_format)
+
+        employee.salary = Decimal('1')
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.save()
+        fresh, created = enqueue_report('payroll', 'excel', date(2030, 1, 1), date(2030, 1, 31))
+        self.assertTrue(created)
+        self.assertGreater(fresh.data_version, report.data_version)
+
+    def test_bulk_payroll_run_bumps_data_version(self):
+        make_employee()
+        before = current_data_version()
+
+        run_payroll(date(2030, 5, 31))
+
+        self.assertGreater(current_data_version(), before)
+
+    def test_writes_bump_data_version_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = make_employee()
+            payroll = Payroll.objects.create(
+                employee=employee, pay_period=date(2030, 1, 31), gross_salary=employee.salary,
+            )
+        before = current_data_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            payroll.total_allowances = Decimal('100.00')
+            payroll.save()
+            employee.last_name = 'Smith'
+            employee.save()
+            self.assertEqual(current_data_version(), before)
+
+        self.assertEqual(current_data_version(), before + 2)
+
+    def test_unchanged_saves_keep_data_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            employee = make_employee()
+            Payroll.objects.create(employee=employee, pay_period=date(2030, 1, 31), gross_salary=employee.salary)
+        payroll = Payroll.objects.get()
+        employee = Employee.objects.get()
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            payroll.save()
+            employee.save()
+
+        self.assertEqual(callbacks, [])
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ParallelReportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_single_worker_builds_one_part(self):
+        self.assertEqual(split_parts(['a', 'b', 'c'], 1), [['a', 'b', 'c']])
+        self.assertEqual(split_parts(['a', 'b', 'c'], 2), [['a'], ['b'], ['c']])
+        self.assertEqual(split_parts(range(5), 4, size=2), [[0, 1], [2, 3], [4]])
+        self.assertEqual(split_parts([], 4), [])
+        self.assertEqual(with_ends(['a', 'b', 'c']), [('a', True, False), ('b', False, False), ('c', False, True)])
+        self.assertEqual(with_ends(['a']), [('a', True, True)])
+
+    @override_settings(REPORT_PARALLEL_WORKERS=2)
+    def test_parts_are_built_serially_inside_a_transaction(self):
+        make_employee()
+        with mock.patch('payroll.parallel_reports.ProcessPoolExecutor') as pool:
+            self.assertEqual(map_parts(abs, [-3, -2, -1, 0]), [3, 2, 1, 0])
+
+        pool.assert_not_called()
+        self.assertTrue(connection.in_atomic_block)
+        self.assertEqual(Employee.objects.count(), 1)
+
+    @override_settings(REPORT_PARALLEL_WORKERS=2)
+    def test_department_excel_streams_every_sheet(self):
+        for department in ('engineering', 'marketing'):
+            employee = make_employee(department=department)
+            Payroll.objects.create(employee=employee, pay_period=date(2030, 3, 31), gross_salary=employee.salary)
+        report = Report(name='departments.xlsx', period_start=date(2030, 1, 1), period_end=date(2030, 12, 31))
+
+        with mock.patch('payroll.parallel_reports.ProcessPoolExecutor') as pool:
+            self.assertTrue(build_department_excel(report))
+
+        pool.assert_not_called()
+        workbook = openpyxl.load_workbook(report.file.path, read_only=True)
+        self.assertEqual(workbook.sheetnames, ['Department Summary Report', 'Engineering', 'Marketing'])
+        self.assertEqual(len(list(workbook['Marketing'].iter_rows(values_only=True))), 4)
+
+    def test_department_parts_merge_into_one_pdf(self):
+        for department in ('engineering', 'marketing'):
+            employee = make_employee(department=department)
+            Payroll.objects.create(employee=employee, pay_period=date(2030, 3, 31), gross_salary=employee.salary)
+        report = Report(period_start=date(2030, 1, 1), period_end=date(2030, 12, 31))
+
+        groups = [[('engineering', 90000, 90000, 1)], [('marketing', 90000, 90000, 1)]]
+        parts = [render_department_part((report, group, first, last)) for group, first, last in with_ends(groups)]
+
+        merged = PdfReader(BytesIO(merge_pdfs(parts)))
+        page_counts = [len(PdfReader(BytesIO(part)).pages) for part in parts]
+        self.assertEqual(len(merged.pages), sum(page_counts))
+        pages = [page.extract_text() for page in merged.pages]
+        self.assertIn('Marketing', pages[-1])
+        self.assertEqual(sum(text.count('Department Summary Report') for text in pages), 1)
+        self.assertIn('Department Summary Report', pages[0])
+        self.assertEqual(sum(text.count('Generated on') for text in pages), 1)
+        self.assertIn('Generated on', pages[-1])
+
+    @override_settings(REPORT_PARALLEL_WORKERS=2, REPORT_SHARD_SIZE=1)
+    def test_employee_shards_share_one_title_block(self):
+        make_employee(first_name='Unpaid')
+        for name in ('Ada', 'Grace', 'Linus'):
+            employee = make_employee(first_name=name)
+            Payroll.objects.create(employee=employee, pay_period=date(2030, 3, 31), gross_salary=employee.salary)
+        report = Report(name='employees.pdf', period_start=date(2030, 1, 1), period_end=date(2030, 12, 31))
+
+        self.assertTrue(build_employee_pdf(report))
+
+        pages = [page.extract_text() for page in PdfReader(report.file.path).pages]
+        text = '\n'.join(pages)
+        self.assertEqual(text.count('Employee Performance Report'), 1)
+        self.assertIn('Employee Performance Report', pages[0])
+        self.assertEqual(text.count('Generated on'), 1)
+        self.assertEqual(text.count('Performance Metrics'), 3)
+        self.assertNotIn('Unpaid', text)
+
+
+class ProcessPoolTests(SimpleTestCase):
+    @override_settings(REPORT_PARALLEL_WORKERS=2)
+    def test_pool_results_keep_part_order(self):
+        self.assertEqual(map_parts(abs, [-3, -2, -1, 0]), [3, 2, 1, 0])
+
+
+class EmployeeReportDataTests(TestCase):
+    def test_employee_data_streams_from_one_query(self):
+        for i in range(10):
+            employee = make_employee(first_name=f'Emp{i}', salary=Decimal('60000') + i)
+            for month in (1, 2, 3):
+                Payroll.objects.create(employee=employee, pay_period=date(2030, month, 28), gross_salary=employee.salary)
+        make_employee(first_name='Unpaid')
+        report = Report(period_start=date(2030, 1, 1), period_end=date(2030, 2, 28))
+
+        with self.assertNumQueries(1):
+            employee_data = list(employee_report_data(report))
+
+        self.assertEqual(len(employee_data), 10)
+        first = employee_data[0]
+        self.assertEqual(first['first_name'], 'Emp0')
+        self.assertEqual(len(first['payrolls']), 2)
+        self.assertEqual(first['total_gross'], Decimal('120000'))
+        self.assertEqual(first['avg_gross'], Decimal('60000'))
+        self.assertEqual(first['total_net'], sum(p['net_salary'] for p in first['payrolls']))
+        self.assertEqual(employee_data[-1]['total_gross'], Decimal('120018'))
+
+        first_id = Employee.objects.order_by('id').values_list('id', flat=True)[0]
+        shard = list(employee_report_data(report, (first_id, first_id + 1)))
+        self.assertEqual([data['first_name'] for data in shard], ['Emp0', 'Emp1'])
+
+
+class ReportTotalsTests(TestCase):
+    def setUp(self):
+        for department, salary in (('engineering', Decimal('90000')), ('marketing', Decimal('45000'))):
+            employee = make_employee(department=department, salary=salary)
+            for month in (1, 2):
+                Payroll.objects.create(employee=employee, pay_period=date(2030, month, 28), gross_salary=salary)
+        self.report = Report(period_start=date(2030, 1, 1), period_end=date(2030, 12, 31))
+
+    def test_totals_come_from_one_aggregate(self):
+        payrolls = report_payrolls(self.report)
+        with self.assertNumQueries(1):
+            totals = report_totals(payrolls)
+
+        self.assertEqual(totals['payroll_count'], 4)
+        self.assertEqual(totals['total_gross'], Decimal('270000'))
+        self.assertEqual(totals['total_tax'], sum(p.tax_amount for p in payrolls))
+        self.assertEqual(totals['total_net'], sum(p.net_salary for p in payrolls))
+
+    def test_empty_period_totals_are_zero(self):
+        self.report.period_start = self.report.period_end = date(2031, 1, 1)
+        totals = report_totals(report_payrolls(self.report))
+        self.assertEqual(totals['payroll_count'], 0)
+        self.assertEqual(totals['total_gross'], Decimal('0.00'))
+
+    def test_tax_totals_grouped_per_employee(self):
+        self.report.department = 'marketing'
+        with self.assertNumQueries(1):
+            rows = list(employee_tax_totals(self.report))
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0].department, 'marketing')
+        self.assertEqual(rows[0].gross, Decimal('90000'))
+
+
+class PayslipBatchTests(TestCase):
+    def setUp(self):
+        for i in range(3):
+            employee = make_employee(first_name=f'Emp{i}', last_name=f'Doe{i}')
+            Payroll.objects.create(employee=employee, pay_period=date(2030, 1, 31), gross_salary=employee.salary,
+                                   payment_status='paid' if i else 'pending')
+
+    def test_batch_writes_one_pdf(self):
+        output = BytesIO()
+        result = render_payslips(pay_run_payrolls(date(2030, 1, 1)), output, chunk_size=2)
+
+        self.assertEqual(result.count, 3)
+        pages = PdfReader(BytesIO(output.getvalue())).pages
+        self.assertGreaterEqual(len(pages), 3)
+        self.assertIn('Doe0', pages[0].extract_text())
+
+    def test_batch_writes_zip_of_payslips(self):
+        output = BytesIO()
+        render_payslips(pay_run_payrolls(date(2030, 1, 15)), output, output_format='zip')
+
+        names = zipfile.ZipFile(output).namelist()
+        self.assertEqual(len(names), 3)
+        self.assertTrue(all(name.endswith('_2030_01.pdf') for name in names))
+
+    def test_single_payslip_view(self):
+        self.client.force_login(User.objects.create_user('admin', password='secret'))
+        payroll = Payroll.objects.first()
+
+        response = self.client.get(reverse('generate_payroll_pdf', args=[payroll.id]))
+
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.content.startswith(b'%PDF'))
+
+
+class PdfEngineTests(TestCase):
+    def setUp(self):
+        employees = [make_employee(first_name=f'Emp{i:03d}') for i in range(120)]
+        for employee in employees:
+            Payroll.objects.create(employee=employee, pay_period=date(2030, 1, 31), gross_salary=employee.salary)
+        self.report = Report(period_start=date(2030, 1, 1), period_end=date(2030, 1, 31))
+
+    def render_payroll_report(self):
+        payrolls = report_payrolls(self.report)
+        context = {'payrolls': payrolls, 'department': 'All Departments', **report_totals(payrolls)}
+        return PdfReader(BytesIO(render_report_pdf(self.report, 'payroll/pdf_templates/payroll_report.html', context)))
+
+    def test_native_tables_repeat_header_on_every_page(self):
+        pages = [page.extract_text() for page in self.render_payroll_report().pages]
+
+        self.assertGreater(len(pages), 1)
+        for text in pages:
+            self.assertIn('Gross Salary', text)
+        self.assertIn('Emp000', pages[0])
+        self.assertIn('Emp119', pages[-1])
+        self.assertIn('KSh 10800000.00', pages[-1])
+
+    def test_employee_sections_flow_across_pages(self):
+        context = {'employee_data': employee_report_data(self.report), 'department': 'All Departments'}
+        pdf = render_report_pdf(self.report, 'payroll/pdf_templates/employee_report.html', context)
+        pages = [page.extract_text() for page in PdfReader(BytesIO(pdf)).pages]
+
+        self.assertGreater(len(pages), 1)
+        self.assertEqual(sum(text.count('Performance Metrics') for text in pages), 120)
+        self.assertIn('Emp000', pages[0])
+        self.assertIn('Emp119', pages[-1])
+
+    def test_long_cells_are_cut_to_the_column(self):
+        self.assertEqual(fit_text('Short', 100), 'Short')
+        clipped = fit_text('Bartholomew Featherstonehaugh-Cholmondeley', 60)
+        self.assertTrue(clipped.endswith('\u2026'))
+        self.assertLessEqual(stringWidth(clipped, 'Helvetica', 8), 60)
+        self.assertTrue('Bartholomew Featherstonehaugh-Cholmondeley'.startswith(clipped[:-1]))
+
+    @override_settings(REPORT_PDF_ENGINE='html')
+    def test_html_engine_fallback(self):
+        Payroll.objects.exclude(employee__first_name='Emp000').delete()
+
+        text = self.render_payroll_report().pages[0].extract_text()
+
+        self.assertIn('Payroll Report', text)
+        self.assertIn('Emp000', text)
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ReportDownloadTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('admin', password='secret'))
+        self.report = Report(
+            name='Tax_Report.pdf', type='tax', format='pdf', status='generated',
+            period_start=date(2030, 1, 1), period_end=date(2030, 1, 31), completed_at=timezone.now(),
+        )
+        self.content = bytes(range(256)) * 4
+        self.report.file.save('Tax_Report.pdf', ContentFile(self.content))
+        self.url = reverse('download_report', args=[self.report.id])
+
+    def test_full_download_streams_with_validators(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=-4')
+        self.assertEqual(b''.join(response.streaming_content), self.content[-4:])
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_stale_if_range_returns_whole_file(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(b''.join(response.streaming_content)), 1024)
+
+    @override_settings(REPORT_DOWNLOAD_OFFLOAD='x-accel-redirect', REPORT_ACCEL_REDIRECT_PREFIX='/protected-media/')
+    def test_offload_to_front_end_server(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.report.file.name}')
+        self.assertEqual(response.content, b'')
+
+
+class QueryPlanTests(TestCase):
+    """
+    The list and report query shapes must be answered from an index. On
+    PostgreSQL sequential scans are disabled for the EXPLAIN so the tiny
+    test tables don't make the planner prefer them.
+    """
+
+    def setUp(self):
+        employee = make_employee()
+        Payroll.objects.create(employee=employee, pay_period=date(2030, 1, 31), gross_salary=employee.salary)
+
+    def assertUsesIndex(self, queryset, *index_names):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        elif connection.vendor != 'sqlite':
+            self.skipTest(f'No query plan expectations for {connection.vendor}')
+        plan = queryset.explain()
+        self.assertTrue(any(name in plan for name in index_names), f'Expected one of {index_names} in:\n{plan}')
+
+    def test_pending_payroll_list(self):
+        self.assertUsesIndex(
+            Payroll.objects.filter(payment_status='pending').order_by('-pay_period', '-id'),
+            'payroll_pending_period_idx',
+        )
+
+    def test_paid_payroll_list(self):
+        self.assertUsesIndex(
+            Payroll.objects.filter(payment_status='paid').order_by(F('payment_date').desc(nulls_first=True), '-id'),
+            'payroll_paid_paydate_idx',
+        )
+
+    def test_payroll_list(self):
+        self.assertUsesIndex(Payroll.objects.order_by('-pay_period', '-id'), 'payroll_period_id_idx')
+
+    def test_report_period(self):
+        report = Report(period_start=date(2030, 1, 1), period_end=date(2030, 1, 31))
+        self.assertUsesIndex(report_payrolls(report), 'payroll_period_employee_idx', 'payroll_period_id_idx')
+
+        report.department = 'sales'
+        self.assertUsesIndex(
+            report_payrolls(report),
+            'payroll_period_employee_idx', 'payroll_period_id_idx', 'employee_dept_status_idx',
+            'payroll_employee_id_pay_period',
+        )
+
+    def test_employee_list_filters(self):
+        employees = Employee.objects.order_by('first_name', 'last_name', 'id')
+        self.assertUsesIndex(employees, 'employee_name_idx')
+        self.assertUsesIndex(employees.filter(is_active='active'), 'employee_status_name_idx')
+        self.assertUsesIndex(employees.filter(department='sales'), 'employee_dept_status_idx')
+        self.assertUsesIndex(
+            employees.filter(department='sales', is_active='active'),
+            'employee_dept_status_idx', 'employee_status_name_idx',
+        )
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('admin', password='secret'))
+        departments = ['engineering', 'sales']
+        for i in range(7):
+            employee = make_employee(
+                first_name=f'Emp{i % 3}', email=f'emp{i}@example.com', department=departments[i % 2],
+            )
+            for month in range(1, 6):
+                Payroll.objects.create(
+                    employee=employee, pay_period=date(2030, month, 28), gross_salary=employee.salary,
+                    payment_status='paid' if (i + month) % 2 else 'pending',
+                )
+        # Paid rows without a payment date sort as the newest
+        Payroll.objects.filter(payment_status='paid', pay_period__month=3).update(payment_date=None)
+
+    def walk(self, queryset, ordering, per_page=4):
+        page = keyset_paginate(queryset, ordering, per_page=per_page)
+        pages = [page]
+        while page.has_next:
+            page = keyset_paginate(queryset, ordering, cursor=page.next_cursor, per_page=per_page)
+            pages.append(page)
+        return pages
+
+    def test_forward_and_back_visit_every_row_once_in_order(self):
+        cases = [
+            (Payroll.objects.all(), ('-pay_period', '-id')),
+            (Payroll.objects.filter(payment_status='pending'), ('-pay_period', '-id')),
+            (Employee.objects.all(), ('first_name', 'last_name', 'id')),
+        ]
+        for queryset, ordering in cases:
+            expected = list(queryset.order_by(*ordering).values_list('id', flat=True))
+            pages = self.walk(queryset, ordering)
+            self.assertEqual([obj.id for page in pages for obj in page], expected)
+            self.assertFalse(pages[0].has_previous)
+
+            backwards = []
+            page = pages[-1]
+            while True:
+                backwards[:0] = [obj.id for obj in page]
+                if not page.has_previous:
+                    break
+                page = keyset_paginate(queryset, ordering, cursor=page.previous_cursor, per_page=4)
+            self.assertEqual(backwards, expected)
+
+    def test_nullable_sort_field(self):
+        paid = Payroll.objects.filter(payment_status='paid')
+        rows = list(paid.values_list('id', 'payment_date'))
+        undated = sorted((pk for pk, paid_on in rows if paid_on is None), reverse=True)
+        dated = [pk for pk, _ in sorted(((pk, d) for pk, d in rows if d is not None), reverse=True,
+                                         key=lambda row: (row[1], row[0]))]
+        pages = self.walk(paid, ('-payment_date', '-id'), per_page=3)
+        self.assertEqual([obj.id for page in pages for obj in page], undated + dated)
+
+    def test_invalid_cursor_gives_first_page(self):
+        first = keyset_paginate(Payroll.objects.all(), ('-pay_period', '-id'), per_page=5)
+        for cursor in ('not-a-cursor', 'WyJ4IiwxXQ', 'WyJuIl0'):
+            page = keyset_paginate(Payroll.objects.all(), ('-pay_period', '-id'), cursor=cursor, per_page=5)
+            self.assertEqual([p.id for p in page], [p.id for p in first])
+
+    def test_deep_pages_cost_the_same_as_the_first(self):
+        def page_queries(query):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse('payroll_list') + query)
+            self.assertEqual(response.status_code, 200)
+            return response, [q['sql'] for q in context.captured_queries]
+
+        # 35 rows: the first two pages are full. The first request warms the per-process caches.
+        page_queries('')
+        response, first_queries = page_queries('')
+        self.assertEqual(response.context['payrolls'].count, 35)
+        response, deep_queries = page_queries('?' + response.context['payrolls'].next_query)
+        self.assertTrue(response.context['payrolls'].has_previous)
+        self.assertEqual(len(response.context['payrolls']), 15)
+        self.assertEqual(len(deep_queries), len(first_queries))
+        for sql in deep_queries:
+            self.assertNotIn('OFFSET', sql)
+            self.assertFalse('COUNT(' in sql and '"payroll_payroll"' in sql, sql)
+
+    def test_list_views_keep_filters_in_cursor_links(self):
+        response = self.client.get(reverse('employee_list'), {'department': 'sales', 'page': '3'})
+        employees = response.context['employees']
+        self.assertEqual(employees.count, 3)
+        self.assertEqual(len(employees), 3)
+
+        for i in range(5):
+            make_employee(first_name=f'New{i}', email=f'new{i}@example.com')
+        response = self.client.get(reverse('employee_list'), {'status': 'active'})
+        page = response.context['employees']
+        self.assertIn('status=active', page.next_query)
+        self.assertEqual(page.count, 12)
+
+        for name, key in (('paid_payroll_list', 'paid_payrolls'), ('pending_payroll_list', 'pending_payrolls'),
+                          ('reports', 'reports')):
+            response = self.client.get(reverse(name))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn(key, response.context)
+        self.assertEqual(self.client.get(reverse('paid_payroll_list')).context['paid_payrolls'].count,
+                         Payroll.objects.filter(payment_status='paid').count())
+
+
+class ListViewQueryBudgetTests(TestCase):
+    """
+    Every list view renders a full page within a fixed number of queries,
+    however many rows it shows. A lazy relation load in a template shows up
+    as one extra query per row and fails the budget.
+    """
+
+    # Session and user lookups, the page of rows, its total and the session save (3 queries)
+    QUERY_BUDGETS = {
+        'payroll_list': 7,
+        'paid_payroll_list': 7,
+        'pending_payroll_list': 7,
+        'employee_list': 7,
+        'reports': 7,
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('admin', password='secret'))
+        self.employee_count = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            i = self.employee_count
+            self.employee_count += 1
+            employee = make_employee(first_name=f'Emp{i}', email=f'emp{i}@example.com')
+            for month in (1, 2):
+                Payroll.objects.create(
+                    employee=employee, pay_period=date(2030, month, 28), gross_salary=employee.salary,
+                    payment_status='paid' if month == 1 else 'pending',
+                )
+            Report.objects.create(
+                name=f'Report {i}', type='payroll', period_start=date(2030, 1, 1),
+                period_end=date(2030, 1, 31), status='generated',
+            )
+
+    def query_count(self, name):
+        # Warm the per-process caches so only the page's own queries are counted
+        self.client.get(reverse(name))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse(name))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list_views_stay_within_query_budget(self):
+        # Both sizes fill more than one page, so both show the pagination total
+        self.add_rows(20)
+        few = {name: self.query_count(name) for name in self.QUERY_BUDGETS}
+        self.add_rows(20)
+        for name, budget in self.QUERY_BUDGETS.items():
+            with self.subTest(view=name):
+                queries = self.query_count(name)
+                self.assertLessEqual(queries, budget)
+                self.assertEqual(queries, few[name], 'Query count grows with the number of rows')
+
+    def test_list_rows_defers_unrendered_columns(self):
+        self.add_rows(1)
+        with self.assertNumQueries(1):
+            payroll = Payroll.objects.list_rows().get(payment_status='paid')
+            self.assertEqual(payroll.employee.get_department_display(), 'Engineering')
+            self.assertEqual(payroll.get_payment_status_display(), 'Paid')
+        self.assertIn('tax_amount', payroll.get_deferred_fields())
+        self.assertIn('salary', payroll.employee.get_deferred_fields())
+
+
+class EmployeeSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        forget_data_versions()
+        self.jane = make_employee(first_name='Jane', last_name='Doe', email='jdoe@paypulse.example')
+        self.john = make_employee(first_name='John', last_name='Janssen', email='jj@paypulse.example')
+        self.amos = make_employee(first_name='Amos', last_name='Kiprono', email='amos.k@paypulse.example')
+
+    def search(self, text):
+        return set(filter_employees(Employee.objects.all(), text).values_list('first_name', flat=True))
+
+    def test_matches_word_prefixes_of_names_and_email(self):
+        self.assertEqual(self.search('jan'), {'Jane', 'John'})
+        self.assertEqual(self.search('JAN do'), {'Jane'})
+        self.assertEqual(self.search('kipr'), {'Amos'})
+        self.assertEqual(self.search('jdoe'), {'Jane'})
+        # Shared email domains are not indexed
+        self.assertEqual(self.search('paypulse'), set())
+        self.assertEqual(self.search('  '), {'Jane', 'John', 'Amos'})
+
+    def test_index_follows_writes(self):
+        self.amos.last_name = 'Rotich'
+        self.amos.save()
+        self.jane.delete()
+        Employee.objects.filter(pk=self.john.pk).update(first_name='Jonah')
+        self.assertEqual(self.search('kipr'), set())
+        self.assertEqual(self.search('rot'), {'Amos'})
+        self.assertEqual(self.search('jane'), set())
+        self.assertEqual(self.search('jonah'), {'Jonah'})
+
+    def test_install_rebuilds_rows_written_without_the_index(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('Only SQLite keeps the index in triggers')
+        uninstall_search_index(connection)
+        make_employee(first_name='Wanjiru', email='wanjiru@paypulse.example')
+        install_search_index(connection)
+        install_search_index(connection)
+        self.assertEqual(self.search('wanj'), {'Wanjiru'})
+        self.assertEqual(self.search('jan'), {'Jane', 'John'})
+
+    def test_autocomplete_ranks_name_prefixes_first_and_pages(self):
+        results, more = autocomplete_employees('jan')
+        # John Janssen matches on his last name, Jane on her first; both rank by name
+        self.assertEqual([r['text'] for r in results], ['Jane Doe', 'John Janssen'])
+        self.assertFalse(more)
+
+        for i in range(5):
+            make_employee(first_name=f'Zed{i}', last_name='Jansen', email=f'zed{i}@paypulse.example')
+        results, more = autocomplete_employees('jans', limit=4)
+        self.assertEqual(len(results), 4)
+        self.assertTrue(more)
+        rest, more = autocomplete_employees('jans', page=2, limit=4)
+        self.assertEqual(len(rest), 2)
+        self.assertFalse(more)
+        self.assertFalse({r['id'] for r in results} & {r['id'] for r in rest})
+
+    def test_select2_endpoint(self):
+        self.client.force_login(User.objects.create_user('admin', password='secret'))
+        response = self.client.get(reverse('search_employees'), {'q': 'kip', 'page': 'x'})
+        self.assertEqual(response.json(), {
+            'results': [{'id': self.amos.id, 'text': 'Amos Kiprono'}],
+            'pagination': {'more': False},
+        })
+        response = self.client.get(reverse('employee_list'), {'search': 'doe'})
+        self.assertEqual([e.id for e in response.context['employees']], [self.jane.id])
+
+
+class EmployeeNameIndexTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        forget_data_versions()
+        self.index = EmployeeNameIndex([
+            (1, 'Jane', 'Doe', 'jane.doe@example.com'),
+            (2, 'John', 'Janssen', 'jj@example.com'),
+            (3, 'Amos', 'Kiprono', 'amos.k@example.com'),
+            (4, 'José', 'Mary-Jane', 'jose@example.com'),
+        ])
+
+    def texts(self, text, **kwargs):
+        results, more = self.index.search(text, **kwargs)
+        return [r['text'] for r in results], more
+
+    def test_prefix_queries(self):
+        # Names starting with the term first, then by name
+        self.assertEqual(self.texts('jan'), (['Jane Doe', 'John Janssen', 'José Mary-Jane'], False))
+        self.assertEqual(self.texts('jj'), (['John Janssen'], False))
+        self.assertEqual(self.texts('JOSE'), (['José Mary-Jane'], False))
+        self.assertEqual(self.texts('jan d'), (['Jane Doe'], False))
+        self.assertEqual(self.texts('mary jan'), (['José Mary-Jane'], False))
+        self.assertEqual(self.texts('x'), ([], False))
+        self.assertEqual(self.texts(' '), ([], False))
+
+    def test_pages(self):
+        self.assertEqual(self.texts('j', limit=2), (['Jane Doe', 'John Janssen'], True))
+        self.assertEqual(self.texts('j', page=2, limit=2), (['José Mary-Jane'], False))
+
+    def test_add_rename_and_remove(self):
+        self.index.add(5, 'Janet', 'Otieno')
+        self.index.add(2, 'Jonah', 'Kamau')
+        self.index.remove(1)
+        self.assertEqual(self.texts('ja')[0], ['Janet Otieno', 'José Mary-Jane'])
+        self.assertEqual(self.texts('kam')[0], ['Jonah Kamau'])
+        self.assertEqual(len(self.index), 4)
+        for entries in (self.index.word_list, self.index.first_names, self.index.last_names):
+            self.assertEqual(len(entries.keys), len(entries.ids))
+        self.assertEqual(len(self.index.first_names), 4)
+
+    def test_autocomplete_uses_the_index_and_follows_commits(self):
+        jane = make_employee(first_name='Jane', last_name='Doe')
+        # The version read, then the build
+        with self.assertNumQueries(2):
+            self.assertEqual(autocomplete('jan')[0], [{'id': jane.id, 'text': 'Jane Doe'}])
+        # The version was checked moments ago
+        with self.assertNumQueries(0):
+            autocomplete('do')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jane.first_name = 'Wanjiru'
+            jane.save()
+            amos = make_employee(first_name='Amos', last_name='Kiprono', email='amos@example.com')
+        with self.captureOnCommitCallbacks(execute=True):
+            amos.delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(autocomplete('wan')[0], [{'id': jane.id, 'text': 'Wanjiru Doe'}])
+            # Found by her unchanged email, ranked like any other match
+            self.assertEqual(autocomplete('jane')[0], [{'id': jane.id, 'text': 'Wanjiru Doe'}])
+            self.assertEqual(autocomplete('kip')[0], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            jane.email = 'wanjiru@example.com'
+            jane.save()
+        self.assertEqual(autocomplete('jane')[0], [])
+
+    def test_warm_and_cold_answers_match(self):
+        for first_name, last_name, email in [
+            ('Jane', 'Doe', 'jane.doe@example.com'),
+            ('John', 'Janssen', 'jdoe@example.com'),
+            ('Amos', 'Kiprono', 'amos@example.com'),
+            ('José', 'Mary-Jane', 'jose@example.com'),
+            ('Doris', 'Jansen', 'doris@example.com'),
+        ]:
+            make_employee(first_name=first_name, last_name=last_name, email=email)
+        index = build_name_index()
+
+        for text in ['jan', 'jdoe', 'do', 'j', 'jan do', 'kip', 'jos', 'example', 'mary jan']:
+            for page in (1, 2):
+                self.assertEqual(
+                    index.search(text, page=page, limit=2), autocomplete_employees(text, page=page, limit=2), text,
+                )
+
+    def test_falls_back_to_the_database_while_cold(self):
+        jane = make_employee(first_name='Jane', last_name='Doe')
+        with override_settings(EMPLOYEE_NAME_INDEX=False):
+            self.assertEqual(autocomplete('jan')[0], [{'id': jane.id, 'text': 'Jane Doe'}])
+        self.assertIsNotNone(get_name_index())
+        # Another process changed an employee, with its own cache: this one
+        # sees the database counter move and rebuilds on the next query
+        cache.clear()
+        Employee.objects.filter(pk=jane.pk).update(first_name='Janet')
+        self.assertEqual(autocomplete('janet')[0], [])
+        bump_data_version(NAME_INDEX_DATA)
+        self.assertEqual(autocomplete('janet')[0], [{'id': jane.id, 'text': 'Janet Doe'}])
+
+
+class SettlementTests(SummaryAssertionsMixin, TestCase):
+    settled_on = date(2030, 2, 28)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(User.objects.create_user('admin', password='secret'))
+        self.payrolls = {}
+        for i, department in enumerate(['engineering', 'sales', 'sales']):
+            employee = make_employee(first_name=f'Emp{i}', email=f'emp{i}@example.com', department=department)
+            for month in (1, 2, 3):
+                self.payrolls[(i, month)] = Payroll.objects.create(
+                    employee=employee, pay_period=date(2030, month, 25), gross_salary=employee.salary,
+                )
+        first = self.payrolls[(0, 1)]
+        first.payment_status = 'paid'
+        first.save()
+
+    def status(self, key):
+        return Payroll.objects.values_list('payment_status', 'payment_date').get(pk=self.payrolls[key].pk)
+
+    def test_settles_due_pending_rows_in_one_update(self):
+        version = current_data_version()
+        with CaptureQueriesContext(connection) as context:
+            result = settle_payrolls(settled_on=self.settled_on)
+        updates = [q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE "payroll_payroll"')]
+        self.assertEqual(len(updates), 1)
+
+        self.assertEqual(result.paid, 5)
+        self.assertEqual(result.outcome_of(self.payrolls[(0, 1)].pk), 'already_paid')
+        self.assertEqual(result.outcome_of(self.payrolls[(1, 3)].pk), 'not_due')
+        self.assertEqual(self.status((1, 2)), ('paid', self.settled_on))
+        self.assertEqual(self.status((1, 3)), ('pending', None))
+        self.assertGreater(current_data_version(), version)
+        self.assertSummaryMatchesRebuild()
+
+    def test_filters_and_unknown_ids(self):
+        ids = [self.payrolls[(0, 2)].pk, self.payrolls[(1, 1)].pk, self.payrolls[(0, 1)].pk, 999999]
+        result = settle_payrolls(department='engineering', payroll_ids=ids, settled_on=self.settled_on)
+        self.assertEqual(result.outcomes, {
+            'paid': [self.payrolls[(0, 2)].pk],
+            'already_paid': [self.payrolls[(0, 1)].pk],
+            'not_due': [],
+            'not_found': sorted([self.payrolls[(1, 1)].pk, 999999]),
+        })
+
+        result = settle_payrolls(pay_period=date(2030, 1, 1), settled_on=self.settled_on)
+        self.assertEqual(result.paid, 2)
+        self.assertEqual(self.status((2, 1))[0], 'paid')
+        self.assertEqual(self.status((2, 2))[0], 'pending')
+        self.assertSummaryMatchesRebuild()
+
+    def test_settle_endpoint(self):
+        url = reverse('settle_payrolls')
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertEqual(self.client.post(url, {'ids': '1,x'}).status_code, 400)
+        self.assertEqual(self.client.post(url, {'department': 'nowhere'}).status_code, 400)
+
+        # Every 2030 pay period is still in the future
+        ids = f"{self.payrolls[(1, 1)].pk},{self.payrolls[(0, 1)].pk}"
+        response = self.client.post(url, {'pay_period': '2030-01-10', 'ids': ids})
+        self.assertEqual(response.status_code, 200)
+        counts = response.json()['result']['counts']
+        self.assertEqual(counts, {'paid': 0, 'already_paid': 1, 'not_due': 1, 'not_found': 0})
+
+    def test_mark_payroll_paid_goes_through_settlement(self):
+        payroll = self.payrolls[(2, 1)]
+        Payroll.objects.filter(pk=payroll.pk).update(pay_period=date(2020, 1, 25))
+        rebuild_summaries()
+        url = reverse('mark_payroll_paid', args=[payroll.pk])
+        self.assertEqual(self.client.post(url).json()['status'], 'success')
+        self.assertEqual(self.status((2, 1))[0], 'paid')
+        self.assertEqual(self.client.post(url).status_code, 400)
+        self.assertSummaryMatchesRebuild()
+
+
+class PayrollDirtyFieldTests(SummaryAssertionsMixin, TestCase):
+    def setUp(self):
+        employee = make_employee()
+        created = Payroll.objects.create(
+            employee=employee, pay_period=date(2030, 1, 25), gross_salary=employee.salary, tax_rate=Decimal('10'),
+        )
+        self.payroll = Payroll.objects.get(pk=created.pk)
+
+    def payroll_updates(self, context):
+        return [q['sql'] for q in context.captured_queries if q['sql'].startswith('UPDATE "payroll_payroll"')]
+
+    def test_status_flip_writes_only_changed_columns(self):
+        self.payroll.payment_status = 'paid'
+        with mock.patch('payroll.models.calculate_payroll') as calculate:
+            with CaptureQueriesContext(connection) as context:
+                self.payroll.save()
+        calculate.assert_not_called()
+
+        [update] = self.payroll_updates(context)
+        assignments = update.split(' SET ')[1].split(' WHERE ')[0]
+        self.assertEqual(
+            sorted(column.split(' = ')[0].strip('"') for column in assignments.split(', ')),
+            ['payment_date', 'payment_status', 'updated_at'],
+        )
+        self.assertEqual(self.payroll.get_dirty_fields(), set())
+        stored = Payroll.objects.get(pk=self.payroll.pk)
+        self.assertEqual((stored.payment_status, stored.net_salary), ('paid', self.payroll.net_salary))
+        self.assertSummaryMatchesRebuild()
+
+    def test_loaded_rows_skip_the_previous_row_select(self):
+        self.payroll.payment_status = 'paid'
+        with CaptureQueriesContext(connection) as context:
+            self.payroll.save(update_fields=['payment_status'])
+
+        selects = [q['sql'] for q in context.captured_queries if q['sql'].startswith('SELECT')]
+        self.assertFalse(any('FROM "payroll_payroll"' in sql for sql in selects), selects)
+        self.assertSummaryMatchesRebuild()
+
+        # Rows loaded without the summary columns still read the stored row
+        partial = Payroll.objects.only('id', 'reference_id').get(pk=self.payroll.pk)
+        partial.payment_status = 'pending'
+        with CaptureQueriesContext(connection) as context:
+            partial.save()
+        self.assertTrue(any('"payroll_employee"."department"' in q['sql'] for q in context.captured_queries))
+        self.assertSummaryMatchesRebuild()
+
+    def test_input_change_recalculates_amounts(self):
+        self.payroll.tax_rate = Decimal('20')
+        self.payroll.save()
+
+        expected = calculate_payroll(
+            self.payroll.gross_salary,
+            allowances=self.payroll.total_allowances,
+            deductions=self.payroll.total_deductions,
+            tax_rate=Decimal('20'),
+            health_insurance=self.payroll.health_insurance,
+            retirement_rate=self.payroll.retirement_rate,
+        )
+        stored = Payroll.objects.get(pk=self.payroll.pk)
+        self.assertEqual(stored.tax_amount, expected['tax_amount'])
+        self.assertEqual(stored.net_salary, expected['net_salary'])
+        self.assertSummaryMatchesRebuild()
+
+    def test_unchanged_save_leaves_summary_alone(self):
+        with CaptureQueriesContext(connection) as context:
+            self.payroll.save()
+        self.assertIn('"updated_at"', self.payroll_updates(context)[0])
+        self.assertFalse(any('payroll_departmentpayrollsummary' in q['sql'] for q in context.captured_queries))
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class EmployeeImportTests(SummaryAssertionsMixin, TestCase):
+    header = 'First Name,Last Name,Email,Hire Date,Department,Salary,Phone Number\n'
+
+    def setUp(self):
+        cache.clear()
+        forget_data_versions()
+        self.existing = make_employee(phone_number='0700000000')
+        Payroll.objects.create(employee=self.existing, pay_period=date(2030, 1, 25), gross_salary=self.existing.salary)
+
+    def run_import(self, content, filename='employees.csv', **kwargs):
+        errors = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_employees(BytesIO(content), filename, errors, **kwargs)
+        return result, list(csv.reader(StringIO(errors.getvalue())))
+
+    def test_csv_rows_are_upserted_by_email(self):
+        get_name_index()
+        content = (
+            self.header
+            + 'Jane,Doe,jane.doe@example.com,2020-01-01,Finance,95000,\n'
+            + 'Ada,Lovelace,ada@example.com,2021-03-01,engineering,120000,0711111111\n'
+            + 'Bad,Salary,bad@example.com,2021-03-01,sales,lots,\n'
+            + ',,,,,,\n'
+            + 'Ada,Byron,ada@example.com,2021-03-01,Human Resource,110000,\n'
+        ).encode()
+
+        result, errors = self.run_import(content, batch_size=2)
+
+        # Ada's second row lands in the next batch and updates the row the first one created
+        self.assertEqual(
+            (result.rows, result.created, result.updated, result.rejected, result.duplicates), (4, 1, 2, 1, 0),
+        )
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.department, self.existing.salary), ('finance', Decimal('95000.00')))
+        # Blank cells keep the stored value
+        self.assertEqual(self.existing.phone_number, '0700000000')
+        ada = Employee.objects.get(email='ada@example.com')
+        self.assertEqual((ada.last_name, ada.department, ada.is_active), ('Byron', 'human_resource', 'active'))
+
+        self.assertEqual(errors[0], ['row', 'email', 'errors'])
+        self.assertEqual(errors[1][:2], ['4', 'bad@example.com'])
+        self.assertIn('salary', errors[1][2])
+
+        # The payroll moved with its employee and the name index was rebuilt
+        self.assertSummaryMatchesRebuild()
+        self.assertEqual(DepartmentPayrollSummary.objects.get().department, 'finance')
+        self.assertEqual(autocomplete('byr')[0], [{'id': ada.pk, 'text': 'Ada Byron'}])
+
+    def test_duplicate_emails_in_a_batch_keep_the_last_row(self):
+        content = (
+            self.header
+            + 'Ada,Lovelace,ada@example.com,2021-03-01,,120000,\n'
+            + 'Ada,Byron,ada@example.com,2021-03-01,,110000,\n'
+        ).encode()
+
+        result, _ = self.run_import(content)
+
+        self.assertEqual((result.created, result.duplicates), (1, 1))
+        self.assertEqual(Employee.objects.get(email='ada@example.com').last_name, 'Byron')
+
+    def test_emails_match_ignoring_case(self):
+        content = (
+            self.header
+            + 'Jane,Doe,Jane.Doe@Example.com,2020-01-01,engineering,99000,\n'
+            + 'Ada,Lovelace,Ada@example.com,2021-03-01,,120000,\n'
+            + 'Ada,Byron,ada@EXAMPLE.com,2021-03-01,,110000,\n'
+        ).encode()
+
+        result, _ = self.run_import(content)
+
+        self.assertEqual((result.created, result.updated, result.duplicates), (1, 1, 1))
+        self.assertEqual(Employee.objects.count(), 2)
+        self.existing.refresh_from_db()
+        self.assertEqual((self.existing.email, self.existing.salary), ('jane.doe@example.com', Decimal('99000.00')))
+        self.assertEqual(Employee.objects.exclude(pk=self.existing.pk).get().last_name, 'Byron')
+
+    def test_unchanged_rows_are_not_written(self):
+        content = (self.header + 'Jane,Doe,jane.doe@example.com,2020-01-01,engineering,90000,\n').encode()
+        with CaptureQueriesContext(connection) as context:
+            result, _ = self.run_import(content)
+        self.assertEqual(result.unchanged, 1)
+        self.assertFalse(any(q['sql'].startswith('UPDATE "payroll_employee"') for q in context.captured_queries))
+
+    def test_xlsx_import(self):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['first_name', 'last_name', 'email', 'hire_date', 'salary', 'is_active'])
+        sheet.append(['Grace', 'Hopper', 'grace@example.com', datetime(2019, 6, 1), 130000.5, 'On Leave'])
+        buffer = BytesIO()
+        workbook.save(buffer)
+
+        result, _ = self.run_import(buffer.getvalue(), 'staff.xlsx')
+
+        self.assertEqual(result.created, 1)
+        grace = Employee.objects.get(email='grace@example.com')
+        self.assertEqual((grace.hire_date, grace.salary, grace.is_active), (date(2019, 6, 1), Decimal('130000.50'), 'on_leave'))
+
+    def test_unreadable_files_are_refused(self):
+        with self.assertRaises(EmployeeImportError):
+            self.run_import(b'first_name,email\nJane,jane@example.com\n')
+        with self.assertRaises(EmployeeImportError):
+            self.run_import(b'', 'employees.txt')
+
+    def test_import_endpoint(self):
+        self.client.force_login(User.objects.create_user('admin', password='secret'))
+        url = reverse('import_employees')
+        self.assertEqual(self.client.post(url).status_code, 400)
+
+        upload = SimpleUploadedFile(
+            'new_staff.csv', (self.header + 'Bad,Row,bad@example.com,soon,sales,1,\n').encode(),
+        )
+        response = self.client.post(url, {'file': upload})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['result']['rejected'], 1)
+        error_report_url = response.json()['error_report_url']
+        self.assertNotIn('new_staff', error_report_url)
+
+        download = self.client.get(error_report_url)
+        self.assertEqual(download['Content-Type'], 'text/csv')
+        self.assertIn('bad@example.com', b''.join(download.streaming_content).decode())
+        self.client.logout()
+        self.assertEqual(self.client.get(error_report_url).status_code, 302)
+        self.client.force_login(User.objects.get(username='admin'))
+        self.assertEqual(self.client.get(reverse('import_error_report', args=['missing'])).status_code, 404)
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'staff.csv')
+            with open(path, 'w') as file:
+                file.write(self.header + 'Ada,Lovelace,ada@example.com,2021-03-01,,120000,\n')
+            out = StringIO()
+            call_command('import_employees', path, stdout=out)
+        self.assertIn('1 created', out.getvalue())
+        self.assertTrue(Employee.objects.filter(email='ada@example.com').exists())
+
+
+class SyntheticDataTests(SummaryAssertionsMixin, TestCase):
+    end = date(2030, 6, 30)
+
+    def setUp(self):
+        cache.clear()
+        forget_data_versions()
+
+    def test_builds_payroll_history_from_hire_dates(self):
+        get_name_index()
+        result = build_fixtures(30, 6, self.end, seed=3, chunk_size=7, batch_size=25)
+
+        self.assertEqual(result.employees, Employee.objects.count())
+        self.assertEqual(result.payrolls, Payroll.objects.count())
+        periods = pay_periods(self.end, 6)
+        self.assertEqual(periods[0], date(2030, 1, 25))
+        self.assertEqual(periods[-1], date(2030, 6, 25))
+        for employee in Employee.objects.prefetch_related('payrolls'):
+            expected = [period for period in periods if period >= employee.hire_date]
+            self.assertEqual(sorted(payroll.pay_period for payroll in employee.payrolls.all()), expected)
+
+        latest = Payroll.objects.filter(pay_period=periods[-1])
+        self.assertFalse(latest.exclude(payment_status='pending').exists())
+        self.assertFalse(Payroll.objects.filter(payment_status='paid', payment_date__isnull=True).exists())
+
+        payroll = Payroll.objects.order_by('id').first()
+        amounts = calculate_payroll(
+            payroll.gross_salary, allowances=payroll.total_allowances, deductions=payroll.total_deductions,
+        )
+        self.assertEqual(payroll.net_salary, amounts['net_salary'])
+        self.assertSummaryMatchesRebuild()
+        self.assertEqual(len(get_name_index()), 30)
+
+    def test_same_seed_gives_the_same_data(self):
+        def snapshot():
+            return list(Employee.objects.order_by('id').values_list('first_name', 'hire_date', 'salary', 'department'))
+
+        build_fixtures(20, 3, self.end, seed=5, chunk_size=8)
+        first = snapshot()
+        clear_payroll_data()
+        build_fixtures(20, 3, self.end, seed=5, chunk_size=8)
+
+        self.assertEqual(snapshot(), first)
+        self.assertFalse(Payroll.objects.exclude(employee_id__in=Employee.objects.values('id')).exists())
+
+    def test_raw_rows_read_back_as_model_values(self):
+        build_fixtures(10, 2, self.end, seed=1)
+
+        for payroll in Payroll.objects.select_related('employee'):
+            # Saving through the model writes the same values back
+            before = Payroll.objects.filter(pk=payroll.pk).values().get()
+            payroll.save()
+            after = Payroll.objects.filter(pk=payroll.pk).values().get()
+            self.assertEqual({**after, 'updated_at': None}, {**before, 'updated_at': None})
+            self.assertIsNotNone(payroll.created_at.tzinfo)
+            self.assertIsInstance(payroll.employee.hire_date, date)
+            self.assertEqual(payroll.tax_rate, TAX_RATE)
+
+    def test_build_fixtures_command(self):
+        make_employee()
+        out = StringIO()
+        call_command('build_fixtures', '--employees', '5', '--months', '2', '--end', '2030-01-31', '--clear', stdout=out)
+        self.assertIn('Created 5 employees', out.getvalue())
+        self.assertEqual(Employee.objects.count(), 5)
+        # Ids chosen by the builder don't collide with later inserts
+        self.assertGreater(make_employee(email='next@example.com').pk, Employee.objects.order_by('-id')[1].pk)
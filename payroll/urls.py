@@ -8,14 +8,18 @@ urlpatterns = [
     path('edit_employee/<int:employee_id>/', views.edit_employee, name='edit_employee'),
     path('remove_employee/<int:employee_id>/', views.remove_employee, name='remove_employee'),
     path('employee/<int:employee_id>/update-status/', views.update_employee_status, name='update_employee_status'),
+    path('employees/import/', views.import_employees_view, name='import_employees'),
+    path('employees/import/errors/<slug:token>/', views.download_import_errors, name='import_error_report'),
     path('payroll/', views.payroll, name='payroll'),
     path('generate-payroll/', views.generate_payroll, name='generate_payroll'),
+    path('payroll/run/', views.run_payroll_batch, name='run_payroll_batch'),
     path('payroll/<int:payroll_id>/pdf/', views.generate_payroll_pdf, name='generate_payroll_pdf'),
     path('payroll/<int:payroll_id>/', views.payroll_detail, name='payroll_detail'),
     path('payrolls/', views.payroll_list, name='payroll_list'),
     path('payrolls/paid/', views.paid_payroll_list, name='paid_payroll_list'),
     path('payrolls/pending/', views.pending_payroll_list, name='pending_payroll_list'),
     path('payroll/<int:payroll_id>/mark_paid/', views.mark_payroll_paid, name='mark_payroll_paid'),
+    path('payroll/settle/', views.settle_payrolls_view, name='settle_payrolls'),
     path('delete_report/<int:report_id>/', views.delete_report, name='delete_report'),
     path('get-employee-salary/<int:employee_id>/', views.get_employee_salary, name='get_employee_salary'),
     path('search-employees/', views.search_employees, name='search_employees'),
@@ -24,6 +28,7 @@ urlpatterns = [
     # Reports URLs
     path('reports/', views.reports, name='reports'),
     path('generate-report/', views.generate_report, name='generate_report'),
+    path('reports/<int:report_id>/status/', views.report_status, name='report_status'),
     path('reports/<int:report_id>/download/', views.download_report, name='download_report'), # Added download URL
     path('reports/<int:report_id>/delete/', views.delete_report, name='delete_report'),     # Added delete URL
     
@@ -3,11 +3,14 @@ from django.contrib.auth.decorators import login_required
 from django.contrib.auth import logout
 from django.contrib import messages
 from django.db import models
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_http_methods
 from .models import Employee, Payroll, Report, Profile, Company
 from .forms import EmployeeForm, CompanyForm, PayrollForm
+from .calculations import calculate_payroll, TAX_RATE, HEALTH_INSURANCE, RETIREMENT_RATE
+from .company import get_company_name
+from .payslips import generated_line, payslip_filename, render_payslip
 from django.views.decorators.csrf import csrf_protect
-from django.http import JsonResponse, HttpResponse, Http404
+from django.http import JsonResponse, HttpResponse
 
 @login_required
 def profile(request):
@@ -61,8 +64,7 @@ def settings(request):
     
     return render(request, 'payroll/settings.html')
 import time  # Add for simulating loading delays
-from django.db.models import Q
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from functools import partial
 from decimal import Decimal, InvalidOperation  # Add InvalidOperation
 from django.utils import timezone
 from datetime import datetime, timedelta
@@ -79,12 +81,6 @@ from django.contrib.auth import logout
 
 # Replace WeasyPrint imports with ReportLab
 from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import letter # Keep letter for potential reference, but remove landscape
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-# Remove ReportLab platypus imports
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak 
-from io import BytesIO
 from django.core.files.base import ContentFile  # Add this import
 import logging # Add logging import
 
@@ -99,76 +95,51 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 
 # Removed ajax_loading_delay decorator
 
+from .dashboard import get_department_chart_data, get_employee_stats, get_paid_net_by_department
+from .downloads import serve_stored_file
+from .employee_import import EmployeeImportError, error_report_name, import_employees, save_error_report
+from .pagination import paginate_request
+from .autocomplete import autocomplete
+from .search import filter_employees
+from .settlement import settle_payrolls
+from .summaries import payroll_count
+
 @login_required
 def index(request):
-    # Get counts for all employee statuses
-    total_employees = Employee.objects.count()
-    active_employees = Employee.objects.filter(is_active='active').count()
-    on_leave_employees = Employee.objects.filter(is_active='on_leave').count()
-    probation_employees = Employee.objects.filter(is_active='probation').count()
+    # Get counts for all employee statuses in a single query
+    employee_stats = get_employee_stats()
+    status_counts = employee_stats['status_counts']
 
     # Get the 5 most recently PAID payroll records, ordered by payment date
     recent_payrolls = Payroll.objects.filter(payment_status='paid').select_related('employee').order_by('-payment_date')[:5]
 
-    # Get the 6 nearest upcoming PENDING payrolls
+    # Get the 5 nearest upcoming PENDING payrolls
     today = timezone.now().date()
     upcoming_pending_payrolls = Payroll.objects.filter(
         payment_status='pending',
         pay_period__gte=today  # Filter for pay periods today or in the future
-    ).exclude(payment_status='paid').select_related('employee').order_by('pay_period')[:5]
+    ).select_related('employee').order_by('pay_period')[:5]
+
+    # Departmental payroll distribution and chart data, one GROUP BY each
+    chart_data = get_department_chart_data()
 
     context = {
-        'total_employees': total_employees,
-        'upcoming_pending_payrolls': upcoming_pending_payrolls,  # Renamed context variable
-        'recent_payrolls': recent_payrolls,  # Add recent payrolls to context
-        'active_employees': active_employees,
-        'on_leave_employees': on_leave_employees,
-        'probation_employees': probation_employees,
+        'total_employees': employee_stats['total'],
+        'active_employees': status_counts['active'],
+        'on_leave_employees': status_counts['on_leave'],
+        'probation_employees': status_counts['probation'],
+        'upcoming_pending_payrolls': upcoming_pending_payrolls,
+        'recent_payrolls': recent_payrolls,
         'upcoming_periods': get_payroll_periods(),
+        'department_data': get_paid_net_by_department(),
+        # Chart data
+        'chart_departments': json.dumps(chart_data['departments']),
+        'payroll_by_department': json.dumps(chart_data['payroll']),
+        'employees_by_department': json.dumps(chart_data['employees']),
+        # Status counts for dropdown
+        'status_counts': status_counts,
     }
 
-    # Departmental Payroll Distribution
-    department_data = {}
-    for employee in Employee.objects.filter(is_active='active'):
-        department = employee.get_department_display()
-        payroll_records = Payroll.objects.filter(employee=employee, payment_status='paid')
-        total_salary = sum(record.net_salary for record in payroll_records)
-        if department in department_data:
-            department_data[department] += total_salary
-        else:
-            department_data[department] = total_salary
-
-    context['department_data'] = department_data
-    # Get department data for charts
-    department_data = Employee.objects.values('department').annotate(
-    total_payroll=Sum('salary'),
-    employee_count=Count('id')
-    )
-    
-    # Prepare data for charts
-    chart_departments = [dict(Employee.DEPARTMENT_CHOICES)[dept['department']] for dept in department_data]
-    payroll_by_department = [float(dept['total_payroll'] or 0) for dept in department_data]
-    employees_by_department = [dept['employee_count'] for dept in department_data]
-    
-    context.update({
-    'total_employees': total_employees,
-    'active_employees': active_employees,
-    'on_leave_employees': on_leave_employees,
-    'probation_employees': probation_employees,
-    'upcoming_pending_payrolls': upcoming_pending_payrolls,
-    'recent_payrolls': recent_payrolls,
-    'upcoming_periods': get_payroll_periods(),
-    # Add chart data to context
-    'chart_departments': json.dumps(chart_departments),
-    'payroll_by_department': json.dumps(payroll_by_department),
-    'employees_by_department': json.dumps(employees_by_department),
-    })
-
-    # Add status counts for dropdown
-    status_counts = Employee.objects.values('is_active').annotate(count=Count('id'))
-    status_counts_dict = {item['is_active']: item['count'] for item in status_counts}
-    context['status_counts'] = status_counts_dict
-
     return render(request, 'index.html', context)
 
 @login_required
@@ -177,16 +148,11 @@ def employee_list(request):
     department_filter = request.GET.get('department', '')
     search_query = request.GET.get('search', '').strip()
     sort_by = request.GET.get('sort', 'id')
-    page = request.GET.get('page', 1)
 
-    employees = Employee.objects.all().order_by('first_name', 'last_name')
+    employees = Employee.objects.all()
 
     if search_query:
-        employees = employees.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(email__icontains=search_query)
-        )
+        employees = filter_employees(employees, search_query)
 
     if status_filter:
         employees = employees.filter(is_active=status_filter)
@@ -194,13 +160,12 @@ def employee_list(request):
     if department_filter:
         employees = employees.filter(department=department_filter)
 
-    paginator = Paginator(employees, 10)
-    try:
-        employees_page = paginator.page(page)
-    except PageNotAnInteger:
-        employees_page = paginator.page(1)
-    except EmptyPage:
-        employees_page = paginator.page(paginator.num_pages)
+    count = None
+    if not search_query and not department_filter:
+        # The dashboard's cached status counts cover the unfiltered list
+        stats = get_employee_stats()
+        count = stats['status_counts'].get(status_filter, 0) if status_filter else stats['total']
+    employees_page = paginate_request(request, employees, ('first_name', 'last_name', 'id'), per_page=10, count=count)
 
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return render(request, 'payroll/partials/employee_table_body.html', {'employees': employees_page})
@@ -289,6 +254,43 @@ def update_employee_status(request, employee_id):
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
+@login_required
+@require_POST
+def import_employees_view(request):
+    """Create or update employees from an uploaded CSV or XLSX file"""
+    upload = request.FILES.get('file')
+    if not upload:
+        return JsonResponse({'status': 'error', 'message': 'Choose a CSV or XLSX file to import.'}, status=400)
+
+    try:
+        # Rejected rows are collected on disk once they outgrow memory
+        with tempfile.SpooledTemporaryFile(max_size=1024 * 1024, mode='w+', newline='', encoding='utf-8') as errors:
+            result = import_employees(upload, upload.name, errors)
+            error_report_url = None
+            if result.rejected:
+                errors.seek(0)
+                error_report_url = reverse('import_error_report', args=[save_error_report(errors)])
+    except EmployeeImportError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        logging.error(f"Error importing employees: {e}", exc_info=True)
+        return JsonResponse({'status': 'error', 'message': f"An unexpected error occurred: {str(e)}"}, status=500)
+
+    return JsonResponse({
+        'status': 'success',
+        'message': (
+            f"Imported {result.rows} rows: {result.created} created, {result.updated} updated, "
+            f"{result.rejected} rejected."
+        ),
+        'result': result.as_dict(),
+        'error_report_url': error_report_url,
+    })
+
+@login_required
+def download_import_errors(request, token):
+    """Rejected rows of an employee import, as CSV"""
+    return serve_stored_file(error_report_name(token), 'rejected-rows.csv', 'text/csv')
+
 @login_required
 def payroll(request):
     if request.method == 'POST':
@@ -296,29 +298,23 @@ def payroll(request):
         if form.is_valid():
             employee = form.cleaned_data['employee']
             allowances = form.cleaned_data['total_allowances']
+            other_deductions = Decimal('0.00')
             
             # Perform payroll calculations
-            gross_salary = Decimal(employee.salary)
-            tax_rate = Decimal('16.00')
-            health_insurance = Decimal('2000.00')
-            retirement_rate = Decimal('5.00')
-            tax_amount = gross_salary * tax_rate / Decimal('100')
-            retirement_amount = gross_salary * retirement_rate / Decimal('100')
-            other_deductions = Decimal('0.00')
-            total_deductions_sum = tax_amount + health_insurance + retirement_amount + other_deductions
-            net_salary = gross_salary + allowances - total_deductions_sum
+            amounts = calculate_payroll(employee.salary, allowances=allowances, deductions=other_deductions)
+            net_salary = amounts['net_salary']
+            min_net_salary = amounts['min_net_salary']
 
-            min_net_salary = gross_salary / 3
-            if net_salary < min_net_salary:
+            if amounts['below_minimum_net']:
                 form.add_error(None, f'Error: Net pay ({net_salary:,.2f}) is less than 1/3 of gross salary ({min_net_salary:,.2f}).')
             else:
                 payroll = form.save(commit=False)
-                payroll.gross_salary = gross_salary
-                payroll.tax_rate = tax_rate
-                payroll.health_insurance = health_insurance
-                payroll.retirement_rate = retirement_rate
-                payroll.tax_amount = tax_amount
-                payroll.retirement_amount = retirement_amount
+                payroll.gross_salary = amounts['gross_salary']
+                payroll.tax_rate = TAX_RATE
+                payroll.health_insurance = HEALTH_INSURANCE
+                payroll.retirement_rate = RETIREMENT_RATE
+                payroll.tax_amount = amounts['tax_amount']
+                payroll.retirement_amount = amounts['retirement_amount']
                 payroll.total_deductions = other_deductions
                 payroll.net_salary = net_salary
                 payroll.payment_status = 'pending'
@@ -336,19 +332,12 @@ def payroll(request):
 
 @login_required
 def search_employees(request):
-    search_term = request.GET.get('q', '')
-    employees = Employee.objects.filter(
-        Q(first_name__icontains=search_term) | Q(last_name__icontains=search_term)
-    ).values('id', 'first_name', 'last_name')
-    
-    results = []
-    for employee in employees:
-        results.append({
-            'id': employee['id'],
-            'text': f"{employee['first_name']} {employee['last_name']}"
-        })
-        
-    return JsonResponse({'results': results})
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 1
+    results, more = autocomplete(request.GET.get('q', ''), page=page)
+    return JsonResponse({'results': results, 'pagination': {'more': more}})
 
 @login_required
 def get_employee_salary(request, employee_id):
@@ -356,30 +345,18 @@ def get_employee_salary(request, employee_id):
     try:
         employee = get_object_or_404(Employee, id=employee_id)
         
-        gross_salary = Decimal(employee.salary)
-        tax_rate = Decimal('16.00')
-        health_insurance = Decimal('2000.00')
-        retirement_rate = Decimal('5.00')
-        
-        tax_amount = gross_salary * tax_rate / Decimal('100')
-        retirement_amount = gross_salary * retirement_rate / Decimal('100')
-        
-        total_statutory_deductions = tax_amount + health_insurance + retirement_amount
-        
-        net_salary_before_allowances = gross_salary - total_statutory_deductions
-        
-        min_net_salary = gross_salary / 3
+        amounts = calculate_payroll(employee.salary)
         
         data = {
-            'salary': float(gross_salary),
-            'tax_rate': float(tax_rate),
-            'health_insurance': float(health_insurance),
-            'retirement_rate': float(retirement_rate),
-            'tax_amount': float(tax_amount),
-            'retirement_amount': float(retirement_amount),
-            'total_statutory_deductions': float(total_statutory_deductions),
-            'net_salary_before_allowances': float(net_salary_before_allowances),
-            'min_net_salary': float(min_net_salary)
+            'salary': float(amounts['gross_salary']),
+            'tax_rate': float(TAX_RATE),
+            'health_insurance': float(amounts['health_insurance']),
+            'retirement_rate': float(RETIREMENT_RATE),
+            'tax_amount': float(amounts['tax_amount']),
+            'retirement_amount': float(amounts['retirement_amount']),
+            'total_statutory_deductions': float(amounts['total_statutory_deductions']),
+            'net_salary_before_allowances': float(amounts['net_salary']),
+            'min_net_salary': float(amounts['min_net_salary'])
         }
         return JsonResponse(data)
     except Employee.DoesNotExist:
@@ -410,15 +387,7 @@ def get_payroll_periods():
 
 @login_required
 def payroll_list(request):
-    payrolls_list = Payroll.objects.all().order_by('-pay_period')
-    paginator = Paginator(payrolls_list, 15)  # Show 15 payrolls per page
-    page = request.GET.get('page')
-    try:
-        payrolls = paginator.page(page)
-    except PageNotAnInteger:
-        payrolls = paginator.page(1)
-    except EmptyPage:
-        payrolls = paginator.page(paginator.num_pages)
+    payrolls = paginate_request(request, Payroll.objects.list_rows(), ('-pay_period', '-id'), count=payroll_count)
     context = {
         'payrolls': payrolls,
         'title': 'Payroll List'
@@ -427,15 +396,10 @@ def payroll_list(request):
 
 @login_required
 def paid_payroll_list(request):
-    paid_payrolls_list = Payroll.objects.filter(payment_status='paid').order_by('-payment_date')
-    paginator = Paginator(paid_payrolls_list, 15)  # Show 15 payrolls per page
-    page = request.GET.get('page')
-    try:
-        paid_payrolls = paginator.page(page)
-    except PageNotAnInteger:
-        paid_payrolls = paginator.page(1)
-    except EmptyPage:
-        paid_payrolls = paginator.page(paginator.num_pages)
+    paid_payrolls = paginate_request(
+        request, Payroll.objects.filter(payment_status='paid').list_rows(), ('-payment_date', '-id'),
+        count=partial(payroll_count, 'paid'),
+    )
     context = {
         'paid_payrolls': paid_payrolls,
         'title': 'Paid Payrolls'
@@ -444,15 +408,10 @@ def paid_payroll_list(request):
 
 @login_required
 def pending_payroll_list(request):
-    pending_payrolls_list = Payroll.objects.filter(payment_status='pending').order_by('-pay_period')
-    paginator = Paginator(pending_payrolls_list, 15)
-    page = request.GET.get('page')
-    try:
-        pending_payrolls = paginator.page(page)
-    except PageNotAnInteger:
-        pending_payrolls = paginator.page(1)
-    except EmptyPage:
-        pending_payrolls = paginator.page(paginator.num_pages)
+    pending_payrolls = paginate_request(
+        request, Payroll.objects.filter(payment_status='pending').list_rows(), ('-pay_period', '-id'),
+        count=partial(payroll_count, 'pending'),
+    )
     context = {
         'pending_payrolls': pending_payrolls,
         'title': 'Pending Payrolls'
@@ -481,113 +440,11 @@ def generate_payroll_pdf(request, payroll_id):
         payroll = get_object_or_404(Payroll.objects.select_related('employee'), id=payroll_id)
         
         response = HttpResponse(content_type='application/pdf')
-        filename = f"payroll_{payroll.employee.last_name}_{payroll.pay_period.strftime('%Y_%m')}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        
-        # Create PDF document
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter)
-        elements = []
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        title_style = styles['Heading1']
-        header_style = styles['Heading2']
-        normal_style = styles['Normal']
-        
-        # Add company header
-        company = Company.objects.first()
-        company_name = company.name if company else "PayPulse"
-        elements.append(Paragraph(company_name, title_style))
-        elements.append(Paragraph('Payroll Statement', header_style))
-        elements.append(Spacer(1, 20))
-        
-        # Employee information table
-        employee_data = [
-            ['Employee Information', '', '', ''],
-            ['Name:', f"{payroll.employee.first_name} {payroll.employee.last_name}", 'Payment Status:', 
-             f"{payroll.payment_status_display.upper()}" if not payroll.is_paid else 'PAID'],
-            ['Employee ID:', str(payroll.employee.id), 'Pay Period:', 
-             payroll.pay_period.strftime("%B %d, %Y")],
-            ['Status:', payroll.payment_status_display, 'Payment Date:', 
-             payroll.payment_date.strftime("%B %d, %Y") if payroll.payment_date else 'Pending']
-        ]
-        
-        employee_table = Table(employee_data, colWidths=[100, 150, 100, 150])
-        employee_table.setStyle(TableStyle([
-            ('GRID', (0, 1), (-1, -1), 1, colors.black),
-            ('SPAN', (0, 0), (-1, 0)),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTWEIGHT', (0, 0), (-1, 0), 'BOLD'),
-            ('PADDING', (0, 0), (-1, -1), 6),
-            ('TEXTCOLOR', (3, 1), (3, 1), colors.red if not payroll.is_paid else colors.green),
-            ('FONTWEIGHT', (3, 1), (3, 1), 'BOLD'),
-        ]))
-        elements.append(employee_table)
-        elements.append(Spacer(1, 20))
-        
-        # Salary breakdown table
-        salary_data = [
-            ['Earnings & Deductions', 'Amount'],
-            ['Basic Salary', f"KSh {payroll.gross_salary:,.2f}"],
-            ['Allowances', f"KSh {payroll.total_allowances:,.2f}"],
-            ['Subtotal (Gross)', f"KSh {(payroll.gross_salary + payroll.total_allowances):,.2f}"],
-            ['', ''],
-            ['Deductions:', ''],
-            ['Tax ({:.1f}%)'.format(float(payroll.tax_rate)), f"KSh {payroll.tax_amount:,.2f}"],
-            ['Health Insurance', f"KSh {payroll.health_insurance:,.2f}"],
-            ['Retirement ({:.1f}%)'.format(float(payroll.retirement_rate)), f"KSh {payroll.retirement_amount:,.2f}"],
-            ['Other Deductions', f"KSh {payroll.total_deductions:,.2f}"],
-            ['Total Deductions', f"KSh {(payroll.tax_amount + payroll.health_insurance + payroll.retirement_amount + payroll.total_deductions):,.2f}"],
-            ['', ''],
-            ['Net Salary', f"KSh {payroll.net_salary:,.2f}"]
-        ]
-        
-        salary_table = Table(salary_data, colWidths=[300, 200])
-        salary_table.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, 0), 1, colors.black),
-            ('GRID', (0, -1), (-1, -1), 1, colors.black),
-            ('LINEBELOW', (0, 2), (-1, 2), 1, colors.black),
-            ('LINEBELOW', (0, -3), (-1, -3), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('BACKGROUND', (0, 5), (-1, 5), colors.lightgrey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('PADDING', (0, 0), (-1, -1), 6),
-            ('ALIGN', (1, 0), (1, -1), 'RIGHT'),
-            ('FONTWEIGHT', (0, 0), (-1, 0), 'BOLD'),
-            ('FONTWEIGHT', (0, -1), (-1, -1), 'BOLD'),
-            ('NOSPLIT', (0, 0), (-1, -1)),
-        ]))
-        elements.append(salary_table)
-        
-        # Add footer
-        elements.append(Spacer(1, 30))
+        response['Content-Disposition'] = f'attachment; filename="{payslip_filename(payroll)}"'
+
+        # Styles and table formatting are shared with the batch payslip engine
         generated_by = request.user.get_full_name() or request.user.username
-        elements.append(Paragraph(f"Generated on: {timezone.now().strftime('%B %d, %Y at %I:%M %p')} by {generated_by}", normal_style))
-        
-        if not payroll.is_paid:
-            # Add a prominent watermark
-            elements.append(Paragraph(
-                "*** DRAFT - NOT YET PAID ***",
-                ParagraphStyle(
-                    'watermark',
-                    parent=normal_style,
-                    textColor=colors.red,
-                    fontSize=16,
-                    alignment=1,  # Center alignment
-                    spaceBefore=20,
-                    spaceAfter=20
-                )
-            ))
-            elements.append(Paragraph("*** This is not a payment confirmation ***", 
-                ParagraphStyle('warning', parent=normal_style, textColor=colors.red)))
-        
-        # Build and return PDF
-        doc.build(elements)
-        pdf = buffer.getvalue()
-        buffer.close()
+        pdf = render_payslip(payroll, get_company_name(), generated_line(generated_by))
         response.write(pdf)
         return response
         
@@ -609,11 +466,8 @@ def mark_payroll_paid(request, payroll_id):
                 'message': f'Cannot mark as paid before the pay date ({payroll.pay_period.strftime("%B %d, %Y")})'
             }, status=400)
             
-        if payroll.payment_status == 'pending':
-            payroll.payment_status = 'paid'
-            payroll.payment_date = today
-            payroll.save()
-            
+        result = settle_payrolls(payroll_ids=[payroll.id], settled_on=today)
+        if result.outcome_of(payroll.id) == 'paid':
             return JsonResponse({
                 'status': 'success',
                 'message': 'Payroll marked as paid successfully'
@@ -630,27 +484,57 @@ def mark_payroll_paid(request, payroll_id):
             'message': str(e)
         }, status=400)
 
+@login_required
+@require_POST
+def settle_payrolls_view(request):
+    """Mark every due pending payroll matching a period, department and/or id list as paid"""
+    pay_period_str = request.POST.get('pay_period')
+    department = request.POST.get('department') or None
+    ids = [value for value in request.POST.getlist('ids') for value in value.split(',') if value.strip()]
+
+    if not (pay_period_str or department or ids):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Give a pay period, a department or payroll ids to settle.',
+        }, status=400)
+
+    pay_period = None
+    if pay_period_str:
+        try:
+            pay_period = datetime.strptime(pay_period_str, '%Y-%m-%d').date()
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid date format. Please use YYYY-MM-DD.'}, status=400)
+
+    if department and department not in dict(Employee.DEPARTMENT_CHOICES):
+        return JsonResponse({'status': 'error', 'message': f"Invalid department: '{department}'."}, status=400)
+
+    try:
+        payroll_ids = [int(value) for value in ids] if ids else None
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Payroll ids must be whole numbers.'}, status=400)
+
+    try:
+        result = settle_payrolls(pay_period=pay_period, department=department, payroll_ids=payroll_ids)
+    except Exception as e:
+        logging.error(f"Error settling payrolls: {e}", exc_info=True)
+        return JsonResponse({'status': 'error', 'message': f"An unexpected error occurred: {str(e)}"}, status=500)
+
+    return JsonResponse({
+        'status': 'success',
+        'message': f"Marked {result.paid} payrolls as paid.",
+        'result': result.as_dict(),
+    })
+
 
 
 @login_required
 def reports(request):
     # Get all reports for display
-    reports_list = Report.objects.all().order_by('-generated_date')
     departments = Employee.DEPARTMENT_CHOICES
 
     # Number of reports per page
     per_page = 10
-    paginator = Paginator(reports_list, per_page)
-    page = request.GET.get('page')
-
-    try:
-        paginated_reports = paginator.page(page)
-    except PageNotAnInteger:
-        # If page is not an integer, deliver first page
-        paginated_reports = paginator.page(1)
-    except EmptyPage:
-        # If page is out of range, deliver last page of results
-        paginated_reports = paginator.page(paginator.num_pages)
+    paginated_reports = paginate_request(request, Report.objects.all(), ('-generated_date', '-id'), per_page=per_page)
 
     context = {
         'reports': paginated_reports,
@@ -676,24 +560,39 @@ def delete_report(request, report_id):
     
     return redirect('reports')
 
-from .excel_reports import (
-    generate_payroll_excel,
-    generate_tax_excel,
-    generate_employee_excel,
-    generate_department_excel,
-)
+from .downloads import serve_report_file
+from .report_jobs import enqueue_report, REPORT_BUILDERS
+
+def report_status_payload(report):
+    """JSON body describing a report job, shared by generate_report and report_status"""
+    payload = {
+        'job_id': report.id,
+        'status': report.status,
+        'status_url': reverse('report_status', args=[report.id]),
+    }
+    if report.status == 'generated':
+        payload['message'] = 'Report generated successfully.'
+        payload['download_url'] = reverse('download_report', args=[report.id])
+    elif report.status == 'failed':
+        payload['message'] = report.error_message or 'Report generation failed.'
+    else:
+        payload['message'] = 'Report queued for generation.'
+    return payload
 
 @login_required
 def generate_report(request):
     """
-    Handles report generation requests and calls the appropriate
-    Excel generation function based on the selected report type.
+    Validates a report request and queues it for a background worker.
+    Returns immediately with a job id and a URL to poll for its status.
     """
     if request.method == 'POST':
         report_type = request.POST.get('report_type')
         start_date_str = request.POST.get('start_date')
         end_date_str = request.POST.get('end_date')
         report_format = request.POST.get('report_format', 'excel')
+        department = request.POST.get('department') or None
+        if department == 'all':
+            department = None
 
         # --- Basic Input Validation ---
         if not all([report_type, start_date_str, end_date_str]):
@@ -708,52 +607,46 @@ def generate_report(request):
         if start_date > end_date:
             return JsonResponse({'status': 'error', 'message': 'Start date cannot be after end date.'}, status=400)
 
-        # --- Report Generation Logic ---
-        try:
-            if report_format == 'excel':
-                # Map report types to their generation functions
-                report_functions = {
-                    'payroll': generate_payroll_excel,
-                    'tax': generate_tax_excel,
-                    'employee': generate_employee_excel,
-                    'department': generate_department_excel,
-                }
-
-                # Get the appropriate function
-                generation_function = report_functions.get(report_type)
-
-                if generation_function:
-                    # Call the function, which now returns a Report object
-                    report = generation_function(request, start_date, end_date)
-                    if report and isinstance(report, Report):
-                        return JsonResponse({
-                            'status': 'success',
-                            'message': 'Report generated successfully.',
-                            'download_url': report.file.url
-                        })
-                    else:
-                        # If the generation function returned None or something else
-                        return JsonResponse({'status': 'error', 'message': 'No data found for the selected criteria.'}, status=404)
-                else:
-                    return JsonResponse({'status': 'error', 'message': f"Invalid report type: '{report_type}'."}, status=400)
-            else:
-                return JsonResponse({'status': 'error', 'message': f"Unsupported format: '{report_format}'. Only Excel is supported."}, status=400)
+        if report_format not in dict(Report.REPORT_FORMATS):
+            return JsonResponse({'status': 'error', 'message': f"Unsupported format: '{report_format}'."}, status=400)
+
+        if (report_type, report_format) not in REPORT_BUILDERS:
+            return JsonResponse({'status': 'error', 'message': f"Invalid report type: '{report_type}'."}, status=400)
+
+        if department and department not in dict(Employee.DEPARTMENT_CHOICES):
+            return JsonResponse({'status': 'error', 'message': f"Invalid department: '{department}'."}, status=400)
 
+        # --- Queue the report ---
+        try:
+            report, created = enqueue_report(report_type, report_format, start_date, end_date, department, request.user)
         except Exception as e:
-            logging.error(f"Error generating report: {e}", exc_info=True)
+            logging.error(f"Error queueing report: {e}", exc_info=True)
             return JsonResponse({'status': 'error', 'message': f"An unexpected error occurred: {str(e)}"}, status=500)
 
+        payload = report_status_payload(report)
+        payload['cached'] = not created
+        if report.status == 'generated':
+            payload['status'] = 'success'
+        elif report.status == 'failed':
+            payload['status'] = 'error'
+            return JsonResponse(payload, status=404)
+        else:
+            payload['status'] = 'queued'
+        return JsonResponse(payload, status=200 if report.is_finished else 202)
+
     return JsonResponse({'status': 'error', 'message': 'Invalid request method.'}, status=405)
 
 @login_required
+def report_status(request, report_id):
+    """Polled by the reports page until a queued report is generated or fails"""
+    report = get_object_or_404(Report, id=report_id)
+    return JsonResponse(report_status_payload(report))
+
+@login_required
+@require_http_methods(['GET', 'HEAD'])
 def download_report(request, report_id):
     report = get_object_or_404(Report, id=report_id)
-    if report.file:
-        response = HttpResponse(report.file, content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-        response['Content-Disposition'] = f'attachment; filename="{os.path.basename(report.file.name)}"'
-        return response
-    else:
-        raise Http404("File does not exist")
+    return serve_report_file(request, report)
 
     # Get all reports for display
     recent_reports = Report.objects.all().order_by('-generated_date')[:10]
@@ -772,29 +665,23 @@ def generate_payroll(request):
         if form.is_valid():
             employee = form.cleaned_data['employee']
             allowances = form.cleaned_data['total_allowances']
-            other_deductions = form.cleaned_data.get('total_deductions', Decimal('0.00'))
+            other_deductions = form.cleaned_data.get('total_deductions') or Decimal('0.00')
             
             # Perform payroll calculations
-            gross_salary = Decimal(employee.salary)
-            tax_rate = Decimal('16.00')
-            health_insurance = Decimal('2000.00')
-            retirement_rate = Decimal('5.00')
-            tax_amount = gross_salary * tax_rate / Decimal('100')
-            retirement_amount = gross_salary * retirement_rate / Decimal('100')
-            total_deductions_sum = tax_amount + health_insurance + retirement_amount + other_deductions
-            net_salary = gross_salary + allowances - total_deductions_sum
-
-            min_net_salary = gross_salary / 3
-            if net_salary < min_net_salary:
+            amounts = calculate_payroll(employee.salary, allowances=allowances, deductions=other_deductions)
+            net_salary = amounts['net_salary']
+            min_net_salary = amounts['min_net_salary']
+
+            if amounts['below_minimum_net']:
                 form.add_error(None, f'Error: Net pay ({net_salary:,.2f}) is less than 1/3 of gross salary ({min_net_salary:,.2f}).')
             else:
                 payroll = form.save(commit=False)
-                payroll.gross_salary = gross_salary
-                payroll.tax_rate = tax_rate
-                payroll.health_insurance = health_insurance
-                payroll.retirement_rate = retirement_rate
-                payroll.tax_amount = tax_amount
-                payroll.retirement_amount = retirement_amount
+                payroll.gross_salary = amounts['gross_salary']
+                payroll.tax_rate = TAX_RATE
+                payroll.health_insurance = HEALTH_INSURANCE
+                payroll.retirement_rate = RETIREMENT_RATE
+                payroll.tax_amount = amounts['tax_amount']
+                payroll.retirement_amount = amounts['retirement_amount']
                 payroll.total_deductions = other_deductions
                 payroll.net_salary = net_salary
                 payroll.payment_status = 'pending'
@@ -810,6 +697,44 @@ def generate_payroll(request):
     }
     return render(request, 'payroll/generate_payroll.html', context)
 
+from .payroll_runs import run_payroll
+
+@login_required
+@require_POST
+def run_payroll_batch(request):
+    """Create pending payroll rows for all employees for a pay period in one batch"""
+    pay_period_str = request.POST.get('pay_period')
+    department = request.POST.get('department') or None
+
+    if not pay_period_str:
+        return JsonResponse({'status': 'error', 'message': 'Missing required field: pay period.'}, status=400)
+
+    try:
+        pay_period = datetime.strptime(pay_period_str, '%Y-%m-%d').date()
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid date format. Please use YYYY-MM-DD.'}, status=400)
+
+    if department and department not in dict(Employee.DEPARTMENT_CHOICES):
+        return JsonResponse({'status': 'error', 'message': f"Invalid department: '{department}'."}, status=400)
+
+    try:
+        allowances = Decimal(request.POST.get('total_allowances') or '0.00')
+        deductions = Decimal(request.POST.get('total_deductions') or '0.00')
+    except InvalidOperation:
+        return JsonResponse({'status': 'error', 'message': 'Allowances and deductions must be numbers.'}, status=400)
+
+    try:
+        result = run_payroll(pay_period, department=department, allowances=allowances, deductions=deductions)
+    except Exception as e:
+        logging.error(f"Error running payroll batch: {e}", exc_info=True)
+        return JsonResponse({'status': 'error', 'message': f"An unexpected error occurred: {str(e)}"}, status=500)
+
+    return JsonResponse({
+        'status': 'success',
+        'message': f"Created {result.created} payroll records for {pay_period.strftime('%B %Y')}.",
+        'result': result.as_dict(),
+    })
+
 @login_required
 def generate_payroll_report(request, start_date, end_date, department=None):
     logging.info(f"Generating Full Excel Payroll Report for period {start_date} to {end_date}, department: {department}")